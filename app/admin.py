@@ -5,16 +5,108 @@ from django import forms
 from django.shortcuts import redirect
 from django.urls import path
 from django.contrib import messages
-import csv
 from io import TextIOWrapper
 from django.http import JsonResponse
-from bs4 import BeautifulSoup
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404, render
 
 from .models import *
+from .results_import import import_csv_results, import_html_results
+from .rosters import RosterImportError, export_chunks, format_from_name, import_rosters, read_rows
 
 admin.site.register(Competition)
 admin.site.register(Cyclist)
-admin.site.register(League)
+class RosterImportForm(forms.Form):
+    roster_file = forms.FileField(label="Fichier CSV ou JSON (player, rider, team, price)")
+    replace = forms.BooleanField(required=False, label="Remplacer les effectifs des équipes importées")
+    dry_run = forms.BooleanField(required=False, label="Valider seulement")
+
+@admin.register(League)
+class LeagueAdmin(admin.ModelAdmin):
+    list_display = ('name', 'competition', 'is_active', 'auction_finished')
+    actions = ['rebuild_auction_snapshot', 'export_rosters_csv', 'export_rosters_json', 'import_rosters']
+
+    def get_urls(self):
+        urls = super().get_urls()
+        custom_urls = [
+            path('<int:league_id>/import-rosters/', self.admin_site.admin_view(self.import_rosters_view), name='league_import_rosters'),
+        ]
+        return custom_urls + urls
+
+    def _single_league(self, request, queryset):
+        if queryset.count() != 1:
+            self.message_user(request, "Select exactly one league.", messages.ERROR)
+            return None
+        return queryset.first()
+
+    def _export_rosters(self, request, queryset, fmt):
+        league = self._single_league(request, queryset)
+        if league is None:
+            return None
+        content_type = 'application/json' if fmt == 'json' else 'text/csv'
+        response = StreamingHttpResponse(export_chunks(league, fmt), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="rosters_league_{league.id}.{fmt}"'
+        return response
+
+    @admin.action(description="Export rosters (CSV)")
+    def export_rosters_csv(self, request, queryset):
+        return self._export_rosters(request, queryset, 'csv')
+
+    @admin.action(description="Export rosters (JSON)")
+    def export_rosters_json(self, request, queryset):
+        return self._export_rosters(request, queryset, 'json')
+
+    @admin.action(description="Import rosters (CSV/JSON)")
+    def import_rosters(self, request, queryset):
+        league = self._single_league(request, queryset)
+        if league is None:
+            return None
+        return redirect(reverse('admin:league_import_rosters', args=[league.id]))
+
+    def import_rosters_view(self, request, league_id):
+        league = get_object_or_404(League, id=league_id)
+        errors = []
+        if request.method == "POST":
+            form = RosterImportForm(request.POST, request.FILES)
+            if form.is_valid():
+                roster_file = request.FILES['roster_file']
+                fmt = format_from_name(roster_file.name)
+                try:
+                    rows = read_rows(TextIOWrapper(roster_file.file, encoding='utf-8'), fmt)
+                    summary = import_rosters(
+                        league, rows, replace=form.cleaned_data['replace'], dry_run=form.cleaned_data['dry_run'],
+                    )
+                except (RosterImportError, ValueError, UnicodeDecodeError) as exc:
+                    errors = getattr(exc, 'errors', [str(exc)])
+                else:
+                    verb = "validés" if form.cleaned_data['dry_run'] else "importés"
+                    self.message_user(
+                        request, f"{sum(summary.values())} coureurs {verb} pour {len(summary)} joueurs.", messages.SUCCESS,
+                    )
+                    return redirect(reverse('admin:app_league_changelist'))
+        else:
+            form = RosterImportForm()
+        context = dict(
+            self.admin_site.each_context(request),
+            form=form,
+            league=league,
+            errors=errors,
+        )
+        return render(request, "admin/import_rosters.html", context)
+
+    @admin.action(description="Rebuild the auction results snapshot")
+    def rebuild_auction_snapshot(self, request, queryset):
+        rebuilt = discarded = 0
+        for league in queryset:
+            if league.auction_finished:
+                AuctionSnapshot.build(league)
+                rebuilt += 1
+            else:
+                # Enchères rouvertes par un admin : le snapshot n'est plus valable
+                AuctionSnapshot.discard(league)
+                discarded += 1
+        self.message_user(request, f"{rebuilt} snapshot(s) rebuilt, {discarded} discarded (auction not finished).")
+
 admin.site.register(Team)
 admin.site.register(TeamCyclist)
 admin.site.register(TeamCyclistAuction)
@@ -26,6 +118,26 @@ admin.site.register(StageSelectionBonus)
 admin.site.register(StageSelectionRider)
 admin.site.register(CompetitionCyclistConfirmation)
 
+admin.site.register(AuctionSnapshot)
+
+@admin.register(AuctionResolutionJob)
+class AuctionResolutionJobAdmin(admin.ModelAdmin):
+    list_display = ('league', 'round_number', 'status', 'attempts', 'updated_at', 'resolved_at')
+    list_filter = ('status', 'league')
+    readonly_fields = ('created_at', 'updated_at', 'resolved_at', 'last_error')
+    actions = ['requeue']
+
+    @admin.action(description="Requeue the selected jobs")
+    def requeue(self, request, queryset):
+        count = AuctionResolutionJob.requeue(queryset)
+        self.message_user(request, f"{count} job(s) requeued (running jobs are left alone).")
+
+@admin.register(ResultBatch)
+class ResultBatchAdmin(admin.ModelAdmin):
+    list_display = ('stage', 'kind', 'row_count', 'batch_id', 'content_hash', 'imported_at')
+    list_filter = ('kind', 'stage__competition')
+    readonly_fields = ('stage', 'kind', 'batch_id', 'content_hash', 'row_count', 'imported_at')
+
 @admin.register(Stage)
 class StageAdmin(admin.ModelAdmin):
     list_display = ('name', 'competition', 'date')
@@ -91,7 +203,7 @@ class ResultatAdmin(admin.ModelAdmin):
         return custom_urls + urls
 
     def import_csv(self, request):
-        from .models import Stage, Resultat
+        from .models import Stage
         import uuid
         if request.method == "POST":
             form = CSVImportForm(request.POST, request.FILES)
@@ -100,27 +212,11 @@ class ResultatAdmin(admin.ModelAdmin):
                 stage = form.cleaned_data['stage']
                 csv_file = request.FILES['csv_file']
                 insert_batch_id = uuid.uuid4()
-                reader = csv.DictReader(TextIOWrapper(csv_file.file, encoding='utf-8'))
-                count = 0
-                for row in reader:
-                    Resultat.objects.create(
-                        stage=stage,
-                        insert_batch_id=insert_batch_id,
-                        rnk=row.get('Rnk'),
-                        gc=row.get('GC'),
-                        timelag=row.get('Timelag'),
-                        bib=row.get('BIB'),
-                        h2h=row.get('H2H'),
-                        specialty=row.get('Specialty'),
-                        rider=row.get('Rider'),
-                        age=row.get('Age'),
-                        team=row.get('Team'),
-                        uci=row.get('UCI'),
-                        pnt=row.get('Pnt'),
-                        time=row.get('Time'),
-                    )
-                    count += 1
-                self.message_user(request, f"{count} résultats importés (batch {insert_batch_id}).", messages.SUCCESS)
+                report = import_csv_results(csv_file, stage, insert_batch_id)
+                if report.skipped:
+                    self.message_user(request, f"Fichier déjà importé pour {stage.name} : {report.summary()}.", messages.WARNING)
+                else:
+                    self.message_user(request, f"{report.rows} résultats importés (batch {insert_batch_id}) - {report.summary()}.", messages.SUCCESS)
                 return redirect("..")
         else:
             form = CSVImportForm()
@@ -135,7 +231,7 @@ class ResultatAdmin(admin.ModelAdmin):
         return render(request, "admin/import_csv.html", context)
 
     def import_html(self, request):
-        from .models import Stage, Resultat, GeneralResult, PointsResult, FinishPointsResult, KOMResult, GeneralTimeResult, YouthResult
+        from .models import Stage
         import uuid
         if request.method == "POST":
             form = HTMLImportForm(request.POST, request.FILES)
@@ -145,18 +241,18 @@ class ResultatAdmin(admin.ModelAdmin):
                 html_file = request.FILES['html_file']
                 insert_batch_id = uuid.uuid4()
                 
-                # Lit le contenu HTML
-                html_content = html_file.read().decode('utf-8')
-                
-                # Utilise la nouvelle fonction de parsing
-                counts = parse_html_results(html_content, stage, insert_batch_id)
+                # Lit le fichier par morceaux : chaque classement est écrit en masse dès que sa table est analysée
+                report = import_html_results(html_file, stage, insert_batch_id)
+                if report.skipped:
+                    self.message_user(request, f"Page déjà importée pour {stage.name} : {report.summary()}.", messages.WARNING)
+                    return redirect("..")
                 
                 # Affiche un message de succès avec les détails
-                total_count = sum(counts.values())
-                message_parts = [f"{total_count} résultats importés (batch {insert_batch_id})"]
-                for result_type, count in counts.items():
+                message_parts = [f"{report.rows} résultats importés (batch {insert_batch_id})"]
+                for result_type, count in report.counts.items():
                     if count > 0:
                         message_parts.append(f"{count} {result_type}")
+                message_parts.append(report.summary())
                 
                 self.message_user(request, " - ".join(message_parts), messages.SUCCESS)
                 return redirect("..")
@@ -179,547 +275,6 @@ class ResultatAdmin(admin.ModelAdmin):
             stages = Stage.objects.filter(competition_id=competition_id).values('id', 'name')
         return JsonResponse({'stages': list(stages)})
 
-def parse_html_results(html_content, stage, insert_batch_id):
-    """
-    Parse le contenu HTML et insère les résultats dans les modèles Django appropriés.
-    Détecte automatiquement le type de chaque table et l'insère dans le bon modèle.
-    """
-    from bs4 import BeautifulSoup
-    soup = BeautifulSoup(html_content, "html.parser")
-    
-    # Compteurs pour chaque type de résultat
-    counts = {
-        'stage_general': 0,
-        'general_time': 0,
-        'points_general': 0,
-        'points_today': 0,
-        'kom_general': 0,
-        'kom_today': 0,
-        'youth_general': 0,
-        'youth_today': 0,
-        'team_general': 0,
-        'team_today': 0
-    }
-    
-    # Trouve toutes les resTab
-    res_tabs = soup.find_all('div', class_='resTab')
-    
-    for res_tab in res_tabs:
-        # Détermine le type de classement selon la structure et le contenu
-        table_type = determine_res_tab_type(res_tab)
-        
-        if table_type == 'stage_general':
-            # Stage General - première table avec GC, timelag, etc.
-            general_div = res_tab.find('div', class_='general')
-            if general_div:
-                table = general_div.find('table')
-                if table:
-                    rows = table.find('tbody').find_all('tr')
-                    headers = [th.get('data-code') for th in table.find('thead').find_all('th')]
-                    counts['stage_general'] = insert_stage_general_results(rows, headers, stage, insert_batch_id)
-        
-        elif table_type == 'general_time':
-            # General Time - table avec time_wonlost
-            general_div = res_tab.find('div', class_='general')
-            if general_div:
-                table = general_div.find('table')
-                if table:
-                    rows = table.find('tbody').find_all('tr')
-                    headers = [th.get('data-code') for th in table.find('thead').find_all('th')]
-                    counts['general_time'] = insert_general_time_results(rows, headers, stage, insert_batch_id)
-        
-        elif table_type == 'points':
-            # Points (General + Today)
-            general_div = res_tab.find('div', class_='general')
-            if general_div:
-                table = general_div.find('table')
-                if table:
-                    rows = table.find('tbody').find_all('tr')
-                    headers = [th.get('data-code') for th in table.find('thead').find_all('th')]
-                    counts['points_general'] = insert_points_general_results(rows, headers, stage, insert_batch_id)
-            
-            today_div = res_tab.find('div', class_='today')
-            if today_div:
-                table = today_div.find('table')
-                if table:
-                    rows = table.find('tbody').find_all('tr')
-                    headers = [th.get('data-code') for th in table.find('thead').find_all('th')]
-                    counts['points_today'] = insert_points_today_results(rows, headers, stage, insert_batch_id)
-        
-        elif table_type == 'kom':
-            # KOM/Sprints (General + Today)
-            general_div = res_tab.find('div', class_='general')
-            if general_div:
-                table = general_div.find('table')
-                if table:
-                    rows = table.find('tbody').find_all('tr')
-                    headers = [th.get('data-code') for th in table.find('thead').find_all('th')]
-                    counts['kom_general'] = insert_kom_general_results(rows, headers, stage, insert_batch_id)
-            
-            today_div = res_tab.find('div', class_='today')
-            if today_div:
-                # KOM Today peut avoir plusieurs sous-tables
-                tables = today_div.find_all('table')
-                for table in tables:
-                    h4_before = table.find_previous_sibling('h4')
-                    kom_type = h4_before.get_text() if h4_before else "KOM Sprint"
-                    rows = table.find('tbody').find_all('tr')
-                    headers = [th.get('data-code') for th in table.find('thead').find_all('th')]
-                    counts['kom_today'] += insert_kom_today_results(rows, headers, stage, insert_batch_id, kom_type)
-        
-        elif table_type == 'youth':
-            # Youth (General + Today)
-            general_div = res_tab.find('div', class_='general')
-            if general_div:
-                table = general_div.find('table')
-                if table:
-                    rows = table.find('tbody').find_all('tr')
-                    headers = [th.get('data-code') for th in table.find('thead').find_all('th')]
-                    counts['youth_general'] = insert_youth_general_results(rows, headers, stage, insert_batch_id)
-            
-            today_div = res_tab.find('div', class_='today')
-            if today_div:
-                table = today_div.find('table')
-                if table:
-                    rows = table.find('tbody').find_all('tr')
-                    headers = [th.get('data-code') for th in table.find('thead').find_all('th')]
-                    counts['youth_today'] = insert_youth_today_results(rows, headers, stage, insert_batch_id)
-        
-        elif table_type == 'team':
-            # Team (General + Today)
-            general_div = res_tab.find('div', class_='general')
-            if general_div:
-                table = general_div.find('table')
-                if table:
-                    rows = table.find('tbody').find_all('tr')
-                    headers = [th.get('data-code') for th in table.find('thead').find_all('th')]
-                    counts['team_general'] = insert_team_general_results(rows, headers, stage, insert_batch_id)
-            
-            today_div = res_tab.find('div', class_='today')
-            if today_div:
-                table = today_div.find('table')
-                if table:
-                    rows = table.find('tbody').find_all('tr')
-                    headers = [th.get('data-code') for th in table.find('thead').find_all('th')]
-                    counts['team_today'] = insert_team_today_results(rows, headers, stage, insert_batch_id)
-    
-    return counts
-
-def determine_res_tab_type(res_tab):
-    """
-    Détermine le type de classement d'une resTab en analysant sa structure et son contenu.
-    """
-    # Cherche les boutons de navigation pour identifier le type
-    button_nav = res_tab.find('ul', class_='buttonNav')
-    if button_nav:
-        buttons = button_nav.find_all('a')
-        button_texts = [btn.get_text(strip=True).lower() for btn in buttons]
-        
-        # Points classification
-        if 'general' in button_texts and 'today' in button_texts:
-            # Vérifie si c'est KOM en cherchant des h4 avec "KOM" ou "Sprint"
-            today_div = res_tab.find('div', class_='today')
-            if today_div:
-                h4_elements = today_div.find_all('h4')
-                for h4 in h4_elements:
-                    h4_text = h4.get_text().lower()
-                    if 'kom' in h4_text or 'sprint' in h4_text:
-                        return 'kom'
-            
-            # Vérifie si c'est Youth en cherchant "youth" dans le contenu
-            if any('youth' in text for text in button_texts):
-                return 'youth'
-            
-            # Vérifie si c'est Team en analysant la structure de la table
-            general_div = res_tab.find('div', class_='general')
-            if general_div:
-                table = general_div.find('table')
-                if table:
-                    headers = [th.get('data-code') for th in table.find('thead').find_all('th')]
-                    # Si pas de colonnes rider/bib, c'est probablement team
-                    if 'ridername' not in headers and 'bib' not in headers:
-                        return 'team'
-            
-            # Par défaut, c'est points
-            return 'points'
-    
-    # Si pas de boutons, analyse la structure de la première table
-    general_div = res_tab.find('div', class_='general')
-    if general_div:
-        table = general_div.find('table')
-        if table:
-            headers = [th.get('data-code') for th in table.find('thead').find_all('th')]
-            
-            # Stage General - a gc, gc_timelag, uci_pnt, bonis
-            if 'gc' in headers and 'gc_timelag' in headers and 'uci_pnt' in headers:
-                return 'stage_general'
-            
-            # General Time - a time_wonlost
-            if 'time_wonlost' in headers:
-                return 'general_time'
-            
-            # Team - pas de ridername/bib
-            if 'ridername' not in headers and 'bib' not in headers:
-                return 'team'
-            
-            # Youth - vérifie le contenu pour "youth"
-            youth_div = res_tab.find('div', class_='today')
-            if youth_div:
-                h4_elements = youth_div.find_all('h4')
-                for h4 in h4_elements:
-                    h4_text = h4.get_text().lower()
-                    if 'youth' in h4_text:
-                        return 'youth'
-    
-    # Par défaut, on considère que c'est stage_general
-    return 'stage_general'
-
-def safe_int(value):
-    """Convertit une valeur en entier de manière sécurisée."""
-    if not value or value == '' or value == ',,':
-        return None
-    try:
-        return int(value)
-    except (ValueError, TypeError):
-        return None
-
-def safe_bool(value):
-    """Convertit une valeur en booléen de manière sécurisée."""
-    if not value or value == '' or value == ',,':
-        return None
-    return bool(value)
-
-def extract_rider_name(cell):
-    """Extrait le nom du coureur depuis une cellule HTML."""
-    if not cell:
-        return None
-    
-    # Si c'est déjà une chaîne, on la retourne
-    if isinstance(cell, str):
-        return cell.strip()
-    
-    # Si c'est un objet BeautifulSoup, on extrait le texte du lien
-    if hasattr(cell, 'find'):
-        link = cell.find('a')
-        if link:
-            return link.get_text(strip=True)
-        return cell.get_text(strip=True)
-    
-    return str(cell).strip()
-
-def insert_stage_general_results(rows, headers, stage, insert_batch_id):
-    """Insère les résultats du classement général de l'étape"""
-    from .models import StageGeneralResult
-    count = 0
-    for row in rows:
-        cells = row.find_all('td')
-        if len(cells) >= len(headers):
-            data = {}
-            for i, header in enumerate(headers):
-                if i < len(cells):
-                    data[header] = cells[i].get_text(strip=True)
-            
-            StageGeneralResult.objects.create(
-                stage=stage,
-                insert_batch_id=insert_batch_id,
-                rnk=safe_int(data.get('rnk')),
-                gc=data.get('gc'),
-                timelag=data.get('gc_timelag'),
-                bib=safe_int(data.get('bib')),
-                h2h=safe_bool(data.get('h2h')),
-                specialty=extract_specialty(cells[5] if len(cells) > 5 else None),
-                age=safe_int(data.get('age')),
-                rider=extract_rider_name(cells[7] if len(cells) > 7 else None),
-                team=extract_team_name(cells[8] if len(cells) > 8 else None),
-                uci=data.get('uci_pnt'),
-                pnt=data.get('pnt'),
-                bonis=data.get('bonis'),
-                time=data.get('time'),
-            )
-            count += 1
-    return count
-
-def insert_general_time_results(rows, headers, stage, insert_batch_id):
-    """Insère les résultats du classement général au temps"""
-    from .models import GeneralTimeResult
-    count = 0
-    for row in rows:
-        cells = row.find_all('td')
-        if len(cells) >= len(headers):
-            data = {}
-            for i, header in enumerate(headers):
-                if i < len(cells):
-                    data[header] = cells[i].get_text(strip=True)
-            
-            GeneralTimeResult.objects.create(
-                stage=stage,
-                insert_batch_id=insert_batch_id,
-                rnk=safe_int(data.get('rnk')),
-                bib=safe_int(data.get('bib')),
-                h2h=safe_bool(data.get('h2h')),
-                specialty=extract_specialty(cells[3] if len(cells) > 3 else None),
-                age=safe_int(data.get('age')),
-                rider=extract_rider_name(cells[5] if len(cells) > 5 else None),
-                team=extract_team_name(cells[6] if len(cells) > 6 else None),
-                uci=data.get('uci_pnt'),
-                bonis=data.get('gc_bonis'),
-                time=data.get('time'),
-                time_wonlost=data.get('time_wonlost'),
-            )
-            count += 1
-    return count
-
-def insert_points_general_results(rows, headers, stage, insert_batch_id):
-    """Insère les résultats du classement par points - General"""
-    from .models import PointsGeneralResult
-    count = 0
-    for row in rows:
-        cells = row.find_all('td')
-        if len(cells) >= len(headers):
-            data = {}
-            for i, header in enumerate(headers):
-                if i < len(cells):
-                    data[header] = cells[i].get_text(strip=True)
-            
-            PointsGeneralResult.objects.create(
-                stage=stage,
-                insert_batch_id=insert_batch_id,
-                rnk=safe_int(data.get('rnk')),
-                bib=safe_int(data.get('bib')),
-                h2h=safe_bool(data.get('h2h')),
-                specialty=extract_specialty(cells[3] if len(cells) > 3 else None),
-                age=safe_int(data.get('age')),
-                rider=extract_rider_name(cells[5] if len(cells) > 5 else None),
-                team=extract_team_name(cells[6] if len(cells) > 6 else None),
-                pnt=safe_int(data.get('pnt2')),
-                today=data.get('delta_pnt'),
-            )
-            count += 1
-    return count
-
-def insert_points_today_results(rows, headers, stage, insert_batch_id):
-    """Insère les résultats du classement par points - Today"""
-    from .models import PointsTodayResult
-    count = 0
-    for row in rows:
-        cells = row.find_all('td')
-        if len(cells) >= len(headers):
-            data = {}
-            for i, header in enumerate(headers):
-                if i < len(cells):
-                    data[header] = cells[i].get_text(strip=True)
-            
-            PointsTodayResult.objects.create(
-                stage=stage,
-                insert_batch_id=insert_batch_id,
-                rnk=safe_int(data.get('rnk')),
-                bib=safe_int(data.get('bib')),
-                h2h=safe_bool(data.get('h2h')),
-                specialty=extract_specialty(cells[3] if len(cells) > 3 else None),
-                age=safe_int(data.get('age')),
-                rider=extract_rider_name(cells[5] if len(cells) > 5 else None),
-                team=extract_team_name(cells[6] if len(cells) > 6 else None),
-                pnt=safe_int(data.get('pnt')),
-                today=data.get('delta_pnt'),
-            )
-            count += 1
-    return count
-
-def insert_kom_general_results(rows, headers, stage, insert_batch_id):
-    """Insère les résultats du classement KOM - General"""
-    from .models import KOMGeneralResult
-    count = 0
-    for row in rows:
-        cells = row.find_all('td')
-        if len(cells) >= len(headers):
-            data = {}
-            for i, header in enumerate(headers):
-                if i < len(cells):
-                    data[header] = cells[i].get_text(strip=True)
-            
-            KOMGeneralResult.objects.create(
-                stage=stage,
-                insert_batch_id=insert_batch_id,
-                rnk=safe_int(data.get('rnk')),
-                bib=safe_int(data.get('bib')),
-                h2h=safe_bool(data.get('h2h')),
-                specialty=extract_specialty(cells[3] if len(cells) > 3 else None),
-                age=safe_int(data.get('age')),
-                rider=extract_rider_name(cells[5] if len(cells) > 5 else None),
-                team=extract_team_name(cells[6] if len(cells) > 6 else None),
-                pnt=safe_int(data.get('pnt2')),
-                today=data.get('delta_pnt'),
-            )
-            count += 1
-    return count
-
-def insert_kom_today_results(rows, headers, stage, insert_batch_id, kom_type):
-    """Insère les résultats du classement KOM - Today"""
-    from .models import KOMTodayResult
-    count = 0
-    for row in rows:
-        cells = row.find_all('td')
-        if len(cells) >= len(headers):
-            data = {}
-            for i, header in enumerate(headers):
-                if i < len(cells):
-                    data[header] = cells[i].get_text(strip=True)
-            
-            KOMTodayResult.objects.create(
-                stage=stage,
-                insert_batch_id=insert_batch_id,
-                rnk=safe_int(data.get('rnk')),
-                bib=safe_int(data.get('bib')),
-                h2h=safe_bool(data.get('h2h')),
-                specialty=extract_specialty(cells[3] if len(cells) > 3 else None),
-                age=safe_int(data.get('age')),
-                rider=extract_rider_name(cells[5] if len(cells) > 5 else None),
-                team=extract_team_name(cells[6] if len(cells) > 6 else None),
-                pnt=safe_int(data.get('pnt')),
-                today=data.get('delta_pnt'),
-                kom_type=kom_type,
-            )
-            count += 1
-    return count
-
-def insert_youth_general_results(rows, headers, stage, insert_batch_id):
-    """Insère les résultats du classement jeunes - General"""
-    from .models import YouthGeneralResult
-    count = 0
-    for row in rows:
-        cells = row.find_all('td')
-        if len(cells) >= len(headers):
-            data = {}
-            for i, header in enumerate(headers):
-                if i < len(cells):
-                    data[header] = cells[i].get_text(strip=True)
-            
-            YouthGeneralResult.objects.create(
-                stage=stage,
-                insert_batch_id=insert_batch_id,
-                rnk=safe_int(data.get('rnk')),
-                bib=safe_int(data.get('bib')),
-                h2h=safe_bool(data.get('h2h')),
-                specialty=extract_specialty(cells[3] if len(cells) > 3 else None),
-                age=safe_int(data.get('age')),
-                rider=extract_rider_name(cells[5] if len(cells) > 5 else None),
-                team=extract_team_name(cells[6] if len(cells) > 6 else None),
-                time=data.get('time'),
-                time_wonlost=data.get('time_wonlost'),
-            )
-            count += 1
-    return count
-
-def insert_youth_today_results(rows, headers, stage, insert_batch_id):
-    """Insère les résultats du classement jeunes - Today"""
-    from .models import YouthTodayResult
-    count = 0
-    for row in rows:
-        cells = row.find_all('td')
-        if len(cells) >= len(headers):
-            data = {}
-            for i, header in enumerate(headers):
-                if i < len(cells):
-                    data[header] = cells[i].get_text(strip=True)
-            
-            YouthTodayResult.objects.create(
-                stage=stage,
-                insert_batch_id=insert_batch_id,
-                rnk=safe_int(data.get('rnk')),
-                bib=safe_int(data.get('bib')),
-                h2h=safe_bool(data.get('h2h')),
-                specialty=extract_specialty(cells[3] if len(cells) > 3 else None),
-                age=safe_int(data.get('age')),
-                rider=extract_rider_name(cells[5] if len(cells) > 5 else None),
-                team=extract_team_name(cells[6] if len(cells) > 6 else None),
-                time=data.get('time'),
-                time_wonlost=data.get('time_wonlost'),
-            )
-            count += 1
-    return count
-
-def insert_team_general_results(rows, headers, stage, insert_batch_id):
-    """Insère les résultats du classement par équipes - General"""
-    from .models import TeamGeneralResult
-    count = 0
-    for row in rows:
-        cells = row.find_all('td')
-        if len(cells) >= len(headers):
-            data = {}
-            for i, header in enumerate(headers):
-                if i < len(cells):
-                    data[header] = cells[i].get_text(strip=True)
-            
-            TeamGeneralResult.objects.create(
-                stage=stage,
-                insert_batch_id=insert_batch_id,
-                rnk=safe_int(data.get('rnk')),
-                team=extract_team_name(cells[1] if len(cells) > 1 else None),
-                time=data.get('time'),
-                time_wonlost=data.get('time_wonlost'),
-            )
-            count += 1
-    return count
-
-def insert_team_today_results(rows, headers, stage, insert_batch_id):
-    """Insère les résultats du classement par équipes - Today"""
-    from .models import TeamTodayResult
-    count = 0
-    for row in rows:
-        cells = row.find_all('td')
-        if len(cells) >= len(headers):
-            data = {}
-            for i, header in enumerate(headers):
-                if i < len(cells):
-                    data[header] = cells[i].get_text(strip=True)
-            
-            TeamTodayResult.objects.create(
-                stage=stage,
-                insert_batch_id=insert_batch_id,
-                rnk=safe_int(data.get('rnk')),
-                team=extract_team_name(cells[1] if len(cells) > 1 else None),
-                time=data.get('time'),
-                time_wonlost=data.get('time_wonlost'),
-            )
-            count += 1
-    return count
-
-def extract_team_name(cell):
-    """Extrait le nom de l'équipe d'une cellule"""
-    if not cell:
-        return None
-    
-    # Si c'est déjà une chaîne, on la retourne
-    if isinstance(cell, str):
-        return cell.strip()
-    
-    # Si c'est un objet BeautifulSoup, on extrait le texte du lien
-    if hasattr(cell, 'find'):
-        link = cell.find('a')
-        if link:
-            return link.get_text(strip=True)
-        return cell.get_text(strip=True)
-    
-    return str(cell).strip()
-
-def extract_specialty(cell):
-    """Extrait la spécialité d'une cellule"""
-    if not cell:
-        return None
-    
-    # Si c'est déjà une chaîne, on la retourne
-    if isinstance(cell, str):
-        return cell.strip()
-    
-    # Si c'est un objet BeautifulSoup, on extrait le texte du span
-    if hasattr(cell, 'find'):
-        span = cell.find('span', class_='fs10')
-        if span:
-            return span.get_text(strip=True)
-        return cell.get_text(strip=True)
-    
-    return str(cell).strip()
-
 @admin.register(GeneralResult)
 class GeneralResultAdmin(admin.ModelAdmin):
     list_display = ("rnk", "bib", "rider", "team", "time", "time_wonlost", "specialty", "age", "stage", "insert_batch_id", "insert_date")
@@ -0,0 +1,152 @@
+"""
+Diffusion en temps réel des événements d'enchères d'une ligue (Server-Sent Events).
+
+Le code de soumission et de résolution appelle `publish()` ; les pages abonnées reçoivent
+l'événement sans nouvelle requête SQL. Le broker est choisi par le setting
+`AUCTION_EVENTS_BROKER` :
+
+- `InProcessBroker` : diffusion en mémoire, limitée au processus courant (dev, tests, SQLite).
+- `PostgresBroker` : publie via NOTIFY et écoute via LISTEN, une connexion par processus,
+  pour relayer les événements du worker d'enchères et des autres workers uvicorn.
+"""
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+from collections import defaultdict
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+TEAM_SUBMITTED = 'team_submitted'
+ROUND_RESOLVED = 'round_resolved'
+AUCTION_FINISHED = 'auction_finished'
+
+
+class InProcessBroker:
+    """Fan-out des événements vers les flux SSE ouverts dans ce processus."""
+    queue_size = 100
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def subscribe(self, league_id):
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers[league_id].add((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, league_id, queue):
+        with self._lock:
+            subscribers = self._subscribers.get(league_id, set())
+            subscribers.difference_update({s for s in subscribers if s[1] is queue})
+            if not subscribers:
+                self._subscribers.pop(league_id, None)
+
+    def send(self, league_id, event):
+        self.deliver(league_id, event)
+
+    def deliver(self, league_id, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(league_id, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._put, queue, event)
+            except RuntimeError:
+                # Boucle fermée : le flux sera désabonné à sa fermeture
+                pass
+
+    @staticmethod
+    def _put(queue, event):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Client trop lent : on perd l'événement plutôt que de bloquer les autres
+            pass
+
+
+class PostgresBroker(InProcessBroker):
+    """Relaye les événements entre processus via LISTEN/NOTIFY."""
+    channel = 'league_events'
+    reconnect_delay = 5
+
+    def __init__(self):
+        super().__init__()
+        self._listener = None
+
+    def send(self, league_id, event):
+        payload = json.dumps({'league_id': league_id, **event})
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [self.channel, payload])
+
+    def subscribe(self, league_id):
+        self._ensure_listener()
+        return super().subscribe(league_id)
+
+    def _ensure_listener(self):
+        with self._lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(target=self._listen, name='league-events-listener', daemon=True)
+                self._listener.start()
+
+    def _listen(self):
+        while True:
+            try:
+                conn = connection.get_new_connection(connection.get_connection_params())
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute(f'LISTEN {self.channel}')
+                while True:
+                    if select.select([conn], [], [], 60) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        event = json.loads(conn.notifies.pop(0).payload)
+                        self.deliver(event.pop('league_id'), event)
+            except Exception:
+                logger.exception("League events listener lost its connection, reconnecting")
+                time.sleep(self.reconnect_delay)
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    broker_path = getattr(settings, 'AUCTION_EVENTS_BROKER', 'app.events.InProcessBroker')
+    return import_string(broker_path)()
+
+
+def publish(league_id, event_type, **data):
+    """Publie un événement pour la ligue une fois la transaction courante validée."""
+    event = {'type': event_type, **data}
+
+    def send():
+        try:
+            get_broker().send(league_id, event)
+        except Exception:
+            # La diffusion ne doit jamais faire échouer une soumission ou une résolution
+            logger.exception("Unable to publish %s for league %s", event_type, league_id)
+
+    transaction.on_commit(send)
+
+
+async def stream(league_id, heartbeat=15):
+    """Flux SSE d'une ligue ; nécessite un serveur ASGI (uvicorn) pour rester ouvert."""
+    broker = get_broker()
+    queue = broker.subscribe(league_id)
+    try:
+        yield 'retry: 5000\n\n'
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+    finally:
+        broker.unsubscribe(league_id, queue)
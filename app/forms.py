@@ -18,13 +18,17 @@ class StageSelectionForm(forms.ModelForm):
         team = kwargs.pop('team', None)
         stage = kwargs.pop('stage', None)
         competition = kwargs.pop('competition', None)
+        # Bonus configs already loaded by the view (avoids querying them again)
+        bonuses = kwargs.pop('bonuses', None)
         super().__init__(*args, **kwargs)
         if team:
             self.fields['riders'].queryset = Cyclist.objects.filter(team_cyclists__team=team)
         # Bonus fields (one int field per bonus config)
         self.bonus_fields = []
-        if competition:
-            for bonus in BonusConfig.objects.filter(competition=competition):
+        if bonuses is None and competition:
+            bonuses = BonusConfig.objects.filter(competition=competition)
+        if bonuses is not None:
+            for bonus in bonuses:
                 field_name = f'bonus_{bonus.id}'
                 self.fields[field_name] = forms.IntegerField(
                     min_value=0,
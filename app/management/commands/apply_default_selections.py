@@ -0,0 +1,36 @@
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from app.models import Stage, StageSelection
+
+
+class Command(BaseCommand):
+    help = (
+        "Valide la sélection par défaut des équipes sans sélection validée pour une étape "
+        "(toutes les ligues de la compétition). Sans argument : étapes verrouillées depuis --hours heures."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('stage_ids', nargs='*', type=int, help='ID des étapes à traiter')
+        parser.add_argument('--hours', type=float, default=24.0, help='Sans ID : fenêtre des étapes verrouillées récemment')
+
+    def handle(self, *args, **options):
+        if options['stage_ids']:
+            stages = list(Stage.objects.filter(id__in=options['stage_ids']).select_related('competition'))
+            missing = set(options['stage_ids']) - {stage.id for stage in stages}
+            if missing:
+                raise CommandError(f"Stage(s) not found: {', '.join(map(str, sorted(missing)))}.")
+        else:
+            now = timezone.now()
+            stages = list(
+                Stage.objects.filter(lock_at__lte=now, lock_at__gt=now - timedelta(hours=options['hours']))
+                .select_related('competition').order_by('lock_at')
+            )
+        total = 0
+        for stage in stages:
+            start = time.perf_counter()
+            created = StageSelection.apply_defaults(stage)
+            total += created
+            self.stdout.write(f"{stage}: {created} default selection(s) applied in {time.perf_counter() - start:.2f}s.")
+        self.stdout.write(self.style.SUCCESS(f"{total} default selection(s) applied over {len(stages)} stage(s)."))
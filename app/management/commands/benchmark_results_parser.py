@@ -0,0 +1,54 @@
+import time
+from pathlib import Path
+from statistics import median
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from app.results_parser import PARSERS, get_parser
+
+FIXTURES = ['result_stage_1.html', 'global_result.html', 'scratch_result.html']
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare les moteurs d'analyse des pages de résultats (lxml, bs4) sur des pages HTML "
+        "enregistrées, et vérifie qu'ils produisent les mêmes lignes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='*', help='Pages HTML (par défaut les pages de résultats du dépôt)')
+        parser.add_argument('--repeat', type=int, default=5, help='Nombre de mesures par fichier et par moteur')
+
+    def handle(self, *args, **options):
+        paths = [Path(name) for name in options['files']] or [Path(settings.BASE_DIR) / name for name in FIXTURES]
+        missing = [str(path) for path in paths if not path.exists()]
+        if missing:
+            raise CommandError(f"File(s) not found: {', '.join(missing)}.")
+        parsers = []
+        for name in PARSERS:
+            try:
+                parsers.append(get_parser(name))
+            except ValueError as exc:
+                self.stderr.write(self.style.WARNING(f"{name}: skipped ({exc})"))
+        repeat = max(1, options['repeat'])
+
+        self.stdout.write(f"{'file':<24} {'KB':>6} " + ' '.join(f"{p.name + ' ms':>10}" for p in parsers) + f" {'rows':>6} {'speedup':>8}")
+        for path in paths:
+            html_content = path.read_text(encoding='utf-8')
+            timings, outputs = [], []
+            for parser in parsers:
+                durations = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    parsed = parser.parse(html_content)
+                    durations.append((time.perf_counter() - start) * 1000)
+                timings.append(median(durations))
+                outputs.append(parsed)
+            rows = sum(len(rows) for rows in outputs[0].values())
+            speedup = f"{max(timings) / min(timings):.1f}x" if len(timings) > 1 and min(timings) else '-'
+            self.stdout.write(
+                f"{path.name:<24} {len(html_content.encode()) / 1024:>6.0f} "
+                + ' '.join(f"{t:>10.1f}" for t in timings) + f" {rows:>6} {speedup:>8}"
+            )
+            if any(parsed != outputs[0] for parsed in outputs[1:]):
+                raise CommandError(f"{path.name}: the parsers disagree on the extracted rows.")
+        self.stdout.write(self.style.SUCCESS("All parsers produced identical rows."))
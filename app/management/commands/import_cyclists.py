@@ -22,4 +22,5 @@ class Command(BaseCommand):
                     }
                 )
                 count += 1 if created else 0
+        Cyclist.invalidate_catalogue()
         self.stdout.write(self.style.SUCCESS(f"{count} cyclistes importés."))
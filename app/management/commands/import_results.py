@@ -0,0 +1,115 @@
+import hashlib
+import os
+import re
+import time
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from pathlib import Path
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from app.models import Competition, ResultBatch
+from app.results_import import import_parsed_results
+from app.results_parser import PARSERS, parse_results_page
+
+# stage_3.html, stage-12-results.htm, etape_7.html : numéro de l'étape dans la compétition
+STAGE_NUMBER = re.compile(r'(?:stage|etape)[_-]?(\d+)', re.IGNORECASE)
+HTML_SUFFIXES = ('.html', '.htm')
+
+
+class Command(BaseCommand):
+    help = (
+        "Importe les pages de résultats enregistrées d'un dossier ou d'une archive zip. Chaque fichier "
+        "est associé à une étape par son nom (stage_<n>.html : n-ième étape de la compétition), les pages "
+        "sont analysées en parallèle et les lignes écrites par un seul processus. Une page déjà importée "
+        "pour son étape est ignorée."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Dossier de pages HTML ou archive .zip')
+        parser.add_argument('--competition', type=int, required=True, help='ID de la compétition')
+        parser.add_argument('--workers', type=int, default=None, help="Processus d'analyse (par défaut : nombre de cœurs)")
+        parser.add_argument('--parser', choices=list(PARSERS), default=None, help="Moteur d'analyse (lxml par défaut)")
+
+    def handle(self, *args, **options):
+        try:
+            competition = Competition.objects.get(pk=options['competition'])
+        except Competition.DoesNotExist:
+            raise CommandError(f"Competition {options['competition']} not found.")
+        pages = self.read_pages(Path(options['path']))
+        stages = list(competition.stages.order_by('date', 'id'))
+
+        names, contents, targets = [], [], []
+        skipped = 0
+        for name, data in pages:
+            match = STAGE_NUMBER.search(Path(name).stem)
+            number = int(match.group(1)) if match else None
+            if number is None or not 1 <= number <= len(stages):
+                self.stderr.write(self.style.WARNING(f"{name}: no matching stage in {competition}, ignored."))
+                continue
+            stage = stages[number - 1]
+            digest = hashlib.sha256(data).hexdigest()
+            if ResultBatch.is_loaded(stage, digest):
+                self.stdout.write(f"{name} -> {stage.name}: already imported, skipped.")
+                skipped += 1
+                continue
+            names.append(name)
+            contents.append(data)
+            targets.append((stage, digest))
+        if not names:
+            self.stdout.write(self.style.SUCCESS(f"Nothing to import ({skipped} page(s) already imported)."))
+            return
+
+        workers = max(1, min(options['workers'] or os.cpu_count() or 1, len(names)))
+        start = time.perf_counter()
+        total_rows = 0
+        write_seconds = 0.0
+        if workers == 1:
+            parsed = map(parse_results_page, names, contents, repeat(options['parser']))
+            total_rows, write_seconds = self.write_pages(parsed, targets)
+        else:
+            # Les processus d'analyse n'utilisent pas la base : on ne leur laisse pas de connexion ouverte
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                # map rend les pages dans l'ordre des fichiers : deux pages d'une même étape sont
+                # écrites dans cet ordre, quelle que soit celle analysée en premier
+                parsed = executor.map(parse_results_page, names, contents, repeat(options['parser']))
+                total_rows, write_seconds = self.write_pages(parsed, targets)
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(names)} page(s) imported, {skipped} skipped: {total_rows} rows in {elapsed:.2f}s "
+            f"with {workers} parser process(es) ({total_rows / elapsed:,.0f} rows/s, {write_seconds:.2f}s writing)."
+        ))
+
+    def read_pages(self, path):
+        """(nom, octets) des pages HTML du dossier ou de l'archive, triées par nom."""
+        if path.is_dir():
+            files = sorted(p for p in path.rglob('*') if p.is_file() and p.suffix.lower() in HTML_SUFFIXES)
+            return [(str(p.relative_to(path)), p.read_bytes()) for p in files]
+        if zipfile.is_zipfile(path):
+            with zipfile.ZipFile(path) as archive:
+                members = sorted(
+                    info.filename for info in archive.infolist()
+                    if not info.is_dir() and info.filename.lower().endswith(HTML_SUFFIXES)
+                )
+                return [(name, archive.read(name)) for name in members]
+        raise CommandError(f"{path}: not a directory or a zip archive.")
+
+    def write_pages(self, parsed, targets):
+        """Écrit les pages au fil de leur analyse, une transaction par page ; renvoie (lignes, secondes d'écriture)."""
+        rows = 0
+        write_seconds = 0.0
+        for (name, tables, parse_ms), (stage, digest) in zip(parsed, targets):
+            report = import_parsed_results(stage, digest, tables, uuid.uuid4())
+            if report.skipped:
+                self.stdout.write(f"{name} -> {stage.name}: already imported, skipped.")
+                continue
+            rows += report.rows
+            write_seconds += report.write_ms / 1000
+            self.stdout.write(
+                f"{name} -> {stage.name}: {report.rows} rows, parsed in {parse_ms:.0f} ms, "
+                f"written in {report.write_ms:.0f} ms."
+            )
+        return rows, write_seconds
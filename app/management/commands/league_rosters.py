@@ -0,0 +1,54 @@
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from app.models import League
+from app.rosters import FORMATS, RosterImportError, export_chunks, format_from_name, import_rosters, read_rows
+
+
+class Command(BaseCommand):
+    help = "Exporte ou importe les effectifs d'une ligue (player, rider, team, price) en CSV ou JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['export', 'import'])
+        parser.add_argument('league_id', type=int, help='ID de la ligue')
+        parser.add_argument('file', nargs='?', default='-', help='Fichier (- pour stdin/stdout)')
+        parser.add_argument('--format', choices=FORMATS, default=None, help='Format (déduit de l\'extension par défaut)')
+        parser.add_argument('--replace', action='store_true', help='Import : remplace les effectifs des équipes importées')
+        parser.add_argument('--dry-run', action='store_true', help='Import : valide sans rien écrire')
+
+    def handle(self, *args, **options):
+        league = League.objects.filter(id=options['league_id']).first()
+        if league is None:
+            raise CommandError(f"League {options['league_id']} not found.")
+        path = options['file']
+        fmt = options['format'] or format_from_name(path)
+        if options['action'] == 'export':
+            self.export(league, path, fmt)
+        else:
+            self.import_(league, path, fmt, options)
+
+    def export(self, league, path, fmt):
+        out = sys.stdout if path == '-' else open(path, 'w', newline='', encoding='utf-8')
+        try:
+            for chunk in export_chunks(league, fmt):
+                out.write(chunk)
+        finally:
+            if out is not sys.stdout:
+                out.close()
+        if out is not sys.stdout:
+            self.stderr.write(f"Rosters of {league.name} exported to {path}.")
+
+    def import_(self, league, path, fmt, options):
+        stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        try:
+            summary = import_rosters(league, read_rows(stream, fmt), replace=options['replace'], dry_run=options['dry_run'])
+        except RosterImportError as exc:
+            for error in exc.errors:
+                self.stderr.write(self.style.ERROR(error))
+            raise CommandError(str(exc))
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        verb = "validated" if options['dry_run'] else "imported"
+        self.stdout.write(self.style.SUCCESS(
+            f"{sum(summary.values())} riders {verb} for {len(summary)} players in {league.name}."
+        ))
@@ -0,0 +1,284 @@
+import csv
+import json
+import logging
+import random
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+from django.db import close_old_connections, connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from app.models import AuctionResolutionJob, Competition, Cyclist, League, Stage, Team, TeamCyclist, TEAM_SIZE
+
+User = get_user_model()
+
+SUBMIT = 'submit (TeamCreateView.post)'
+STATUS = 'status (LeagueTeamStatusView)'
+RESOLVE = 'resolve (check_and_resolve + resolve_auctions_for_league)'
+
+
+def percentile(values, pct):
+    """Percentile au rang le plus proche (valeurs triées)."""
+    if not values:
+        return 0.0
+    rank = max(0, min(len(values) - 1, round(pct / 100 * len(values) + 0.5) - 1))
+    return values[rank]
+
+
+def is_lock_error(exc):
+    message = str(exc).lower()
+    return 'deadlock' in message or 'database is locked' in message or 'lock timeout' in message
+
+
+class Recorder:
+    """Collecte thread-safe des latences, nombres de requêtes et erreurs par endpoint."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.timings = defaultdict(list)
+        self.queries = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.deadlocks = defaultdict(int)
+        self.conflicts = defaultdict(int)
+
+    def measure(self, endpoint, func):
+        """Exécute func, enregistre sa durée et ses requêtes ; renvoie son résultat ou None en cas d'erreur."""
+        result, error = None, None
+        with CaptureQueriesContext(connection) as ctx:
+            start = time.perf_counter()
+            try:
+                result = func()
+            except Exception as exc:
+                error = exc
+            elapsed = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self.timings[endpoint].append(elapsed)
+            if error is not None:
+                self.errors[endpoint] += 1
+                if is_lock_error(error):
+                    self.deadlocks[endpoint] += 1
+            elif getattr(result, 'status_code', 200) == 409:
+                self.conflicts[endpoint] += 1
+            elif getattr(result, 'status_code', 200) >= 400:
+                self.errors[endpoint] += 1
+            else:
+                # Seules les requêtes réussies comptent : la page d'erreur de DEBUG fait ses propres requêtes
+                self.queries[endpoint].append(len(ctx.captured_queries))
+        return result
+
+
+class Command(BaseCommand):
+    help = (
+        "Test de charge des enchères : génère N ligues de M équipes avec des mises réalistes "
+        "(prix de cyclists.csv), rejoue les soumissions en parallèle et mesure latence, requêtes et verrous."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--leagues', type=int, default=5, help='Nombre de ligues générées')
+        parser.add_argument('--teams', type=int, default=20, help='Nombre d\'équipes par ligue')
+        parser.add_argument('--rounds', type=int, default=2, help='Nombre de rounds d\'enchères rejoués')
+        parser.add_argument('--concurrency', type=int, default=16, help='Nombre de clients simultanés')
+        parser.add_argument('--workers', type=int, default=2, help='Nombre de workers de résolution simultanés')
+        parser.add_argument('--status-polls', type=int, default=2, help='Affichages de la page de statut par équipe et par round')
+        parser.add_argument('--csv', default='cyclists.csv', help='Fichier des coureurs (Coureur, Équipe, Prix min)')
+        parser.add_argument('--seed', type=int, default=None, help='Graine aléatoire pour rejouer le même scénario')
+        parser.add_argument('--keep', action='store_true', help='Conserve les ligues générées après le test')
+        parser.add_argument(
+            '--allow-db-writes', action='store_true',
+            help='Autorise le test hors DEBUG : il écrit (puis supprime) utilisateurs, ligues et coureurs préfixés',
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['allow_db_writes']:
+            raise CommandError(
+                "The load test writes users, leagues and riders to this database: "
+                "run it with DEBUG on, or pass --allow-db-writes."
+            )
+        self.rng = random.Random(options['seed'])
+        self.prefix = 'loadtest'
+        self.cleanup()
+        cyclists = self.load_cyclists(options['csv'])
+        leagues = self.generate(options['leagues'], options['teams'])
+        self.stdout.write(
+            f"Generated {len(leagues)} leagues x {options['teams']} teams over {len(cyclists)} riders "
+            f"({connection.vendor})."
+        )
+        recorder = Recorder()
+        if options['verbosity'] < 2:
+            # Les erreurs sont comptées dans le rapport : pas de traceback par requête
+            logging.getLogger('django.request').setLevel(logging.CRITICAL)
+        try:
+            for round_index in range(options['rounds']):
+                started = time.perf_counter()
+                submitted = self.run_round(leagues, cyclists, recorder, options)
+                self.stdout.write(
+                    f"Round {round_index + 1}: {submitted} submissions replayed in "
+                    f"{time.perf_counter() - started:.1f}s"
+                )
+                if not submitted:
+                    break
+            self.report(recorder)
+        finally:
+            if not options['keep']:
+                self.cleanup()
+
+    # --- Génération ---
+
+    def load_cyclists(self, csv_path):
+        """
+        Copies préfixées des coureurs de cyclists.csv, supprimées par cleanup() : leur prix minimum
+        sert de base aux mises, sans toucher au catalogue réel.
+        """
+        try:
+            with open(csv_path, newline='', encoding='utf-8') as f:
+                rows = list(csv.DictReader(f))
+        except FileNotFoundError:
+            raise CommandError(f"CSV file not found: {csv_path}")
+        cyclists = Cyclist.objects.bulk_create([
+            Cyclist(name=f"{self.rider_prefix}{r['Coureur']}", team=r['Équipe'], value=int(r['Prix min']))
+            for r in rows
+        ])
+        Cyclist.invalidate_catalogue()
+        return [{'id': cyclist.id, 'value': cyclist.value} for cyclist in cyclists]
+
+    def generate(self, league_count, team_count):
+        users = User.objects.bulk_create([
+            User(username=f'{self.prefix}_{l}_{t}', password='!')
+            for l in range(league_count) for t in range(team_count)
+        ])
+        competition = Competition.objects.create(name=f'{self.prefix} competition')
+        Stage.objects.create(competition=competition, name=f'{self.prefix} stage', date=date.today() + timedelta(days=30))
+        leagues = []
+        for l in range(league_count):
+            league_users = users[l * team_count:(l + 1) * team_count]
+            league = League.objects.create(
+                name=f'{self.prefix} league {l}', creator=league_users[0], competition=competition, is_active=True,
+            )
+            Team.objects.bulk_create([Team(player=user, league=league) for user in league_users])
+            leagues.append(league)
+        return leagues
+
+    @property
+    def rider_prefix(self):
+        return f'[{self.prefix}] '
+
+    def cleanup(self):
+        League.objects.filter(name__startswith=f'{self.prefix} league').delete()
+        Competition.objects.filter(name=f'{self.prefix} competition').delete()
+        # Seulement les comptes générés : loadtest_<ligue>_<équipe>, sans mot de passe utilisable
+        User.objects.filter(username__regex=rf'^{self.prefix}_[0-9]+_[0-9]+$', password='!').delete()
+        if Cyclist.objects.filter(name__startswith=self.rider_prefix).delete()[0]:
+            Cyclist.invalidate_catalogue()
+
+    def build_bids(self, cyclists, owned, roster_count, remaining_budget):
+        """
+        Tire les coureurs en favorisant les plus chers (les plus disputés), puis répartit le budget
+        restant au-delà des prix minimums selon une prime log-normale : le total vaut exactement le budget.
+        """
+        needed = TEAM_SIZE - roster_count
+        candidates = [c for c in cyclists if c['id'] not in owned]
+        if needed <= 0 or len(candidates) < needed:
+            return []
+        for _ in range(50):
+            picks = []
+            pool = list(candidates)
+            weights = [c['value'] ** 1.5 for c in pool]
+            while len(picks) < needed:
+                index = self.rng.choices(range(len(pool)), weights=weights)[0]
+                picks.append(pool.pop(index))
+                weights.pop(index)
+            extra = remaining_budget - sum(c['value'] for c in picks)
+            if extra >= 0:
+                break
+        else:
+            return []
+        premiums = [c['value'] * self.rng.lognormvariate(0, 0.5) for c in picks]
+        total_premium = sum(premiums)
+        prices = [c['value'] + int(extra * p / total_premium) for c, p in zip(picks, premiums)]
+        prices[premiums.index(max(premiums))] += remaining_budget - sum(prices)
+        return [{'id': c['id'], 'price': price} for c, price in zip(picks, prices)]
+
+    # --- Rejeu ---
+
+    def run_round(self, leagues, cyclists, recorder, options):
+        teams = list(Team.objects.filter(league__in=leagues).select_related('player', 'league'))
+        owned_by_league = defaultdict(set)
+        for league_id, cyclist_id in TeamCyclist.objects.filter(league__in=leagues).values_list('league_id', 'cyclist_id'):
+            owned_by_league[league_id].add(cyclist_id)
+        tasks = []
+        for team in teams:
+            if team.is_complete or team.roster_count >= TEAM_SIZE:
+                continue
+            bids = self.build_bids(cyclists, owned_by_league[team.league_id], team.roster_count, team.remaining_budget)
+            if bids:
+                tasks.append((team, bids))
+        self.rng.shuffle(tasks)
+
+        host = settings.ALLOWED_HOSTS[0] if settings.ALLOWED_HOSTS else 'localhost'
+        submissions_done = threading.Event()
+
+        def submit(team, bids):
+            close_old_connections()
+            client = Client(HTTP_HOST=host)
+            client.force_login(team.player)
+            try:
+                for _ in range(options['status_polls']):
+                    recorder.measure(STATUS, lambda: client.get(reverse('league_team_status', args=[team.league_id])))
+                recorder.measure(SUBMIT, lambda: client.post(
+                    reverse('team_create', args=[team.league_id]),
+                    data=json.dumps({'cyclists': bids}), content_type='application/json',
+                ))
+            finally:
+                connection.close()
+
+        def resolve():
+            # Comme run_auction_worker : vide la file jusqu'à la fin des soumissions
+            close_old_connections()
+            try:
+                while True:
+                    job = AuctionResolutionJob.claim_next()
+                    if job is None:
+                        if submissions_done.is_set():
+                            return
+                        time.sleep(0.05)
+                        continue
+                    recorder.measure(RESOLVE, job.process)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=options['workers']) as resolvers:
+            resolver_futures = [resolvers.submit(resolve) for _ in range(options['workers'])]
+            with ThreadPoolExecutor(max_workers=options['concurrency']) as clients:
+                for future in [clients.submit(submit, team, bids) for team, bids in tasks]:
+                    future.result()
+            submissions_done.set()
+            for future in resolver_futures:
+                future.result()
+        return len(tasks)
+
+    def report(self, recorder):
+        self.stdout.write("")
+        self.stdout.write(
+            f"{'endpoint':<60} {'n':>5} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+            f"{'q avg':>6} {'q max':>6} {'409':>5} {'locks':>6} {'errors':>7}"
+        )
+        for endpoint in (SUBMIT, STATUS, RESOLVE):
+            timings = sorted(recorder.timings[endpoint])
+            queries = recorder.queries[endpoint]
+            if not timings:
+                continue
+            self.stdout.write(
+                f"{endpoint:<60} {len(timings):>5} {percentile(timings, 50):>8.1f} {percentile(timings, 95):>8.1f} "
+                f"{percentile(timings, 99):>8.1f} {sum(queries) / max(len(queries), 1):>6.1f} {max(queries, default=0):>6} "
+                f"{recorder.conflicts[endpoint]:>5} {recorder.deadlocks[endpoint]:>6} {recorder.errors[endpoint]:>7}"
+            )
+        if any(recorder.deadlocks.values()):
+            self.stdout.write(self.style.WARNING("Lock errors detected (deadlocks or 'database is locked')."))
+        else:
+            self.stdout.write(self.style.SUCCESS("No lock errors."))
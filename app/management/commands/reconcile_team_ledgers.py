@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from app.models import Team
+
+class Command(BaseCommand):
+    help = 'Reconstruit le registre des équipes (spent, roster_count, is_complete) depuis les TeamCyclist et signale les écarts.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--league', type=int, help='Limiter à une ligue')
+        parser.add_argument('--dry-run', action='store_true', help='Signale les écarts sans les corriger')
+
+    def handle(self, *args, **options):
+        teams = Team.objects.select_related('player', 'league')
+        if options['league']:
+            teams = teams.filter(league_id=options['league'])
+        with transaction.atomic():
+            drifts = Team.rebuild_ledgers(teams)
+            for team, old, new in drifts:
+                self.stdout.write(self.style.WARNING(
+                    f"{team}: spent/roster_count/is_complete {old} -> {new}"
+                ))
+            if options['dry_run']:
+                transaction.set_rollback(True)
+        if not drifts:
+            self.stdout.write(self.style.SUCCESS("Aucun écart."))
+        elif options['dry_run']:
+            self.stdout.write(self.style.WARNING(f"{len(drifts)} équipe(s) en écart (dry run, rien n'a été modifié)."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"{len(drifts)} équipe(s) corrigée(s)."))
@@ -0,0 +1,42 @@
+import logging
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from app.models import AuctionResolutionJob
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Traite la file des rounds d\'enchères à résoudre (AuctionResolutionJob).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Traite les jobs en attente puis s\'arrête')
+        parser.add_argument('--interval', type=float, default=2.0, help='Pause (secondes) quand la file est vide')
+        parser.add_argument('--stale-after', type=int, default=300, help='Reprend un job "running" abandonné depuis N secondes')
+        parser.add_argument('--retry-after', type=int, default=60, help='Relance un job "failed" après N secondes (au plus %d essais)' % AuctionResolutionJob.MAX_ATTEMPTS)
+
+    def handle(self, *args, **options):
+        stale_after = timedelta(seconds=options['stale_after'])
+        retry_after = timedelta(seconds=options['retry_after'])
+        self.stdout.write("Auction worker started.")
+        while True:
+            close_old_connections()
+            job = AuctionResolutionJob.claim_next(stale_after=stale_after, retry_after=retry_after)
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+                continue
+            try:
+                resolution = job.process()
+            except Exception:
+                logger.exception("Resolution failed for league %s round %s", job.league_id, job.round_number)
+                self.stdout.write(self.style.ERROR(f"{job}: failed"))
+                continue
+            if resolution is not None:
+                self.stdout.write(self.style.SUCCESS(
+                    f"{job}: {resolution.won_count} won, {resolution.lost_count} lost"
+                ))
+            else:
+                self.stdout.write(f"{job}")
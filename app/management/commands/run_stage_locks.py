@@ -0,0 +1,24 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from app.models import Stage
+
+
+class Command(BaseCommand):
+    help = (
+        "Envoie le signal stage_locked une fois pour chaque étape dont l'heure de verrouillage est passée "
+        "(de nouveau au passage suivant si un récepteur a échoué)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Tourne en continu au lieu d\'un seul passage (cron)')
+        parser.add_argument('--interval', type=float, default=30.0, help='Pause (secondes) entre deux passages avec --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            for stage in Stage.process_due_locks():
+                self.stdout.write(self.style.SUCCESS(f"{stage}: locked at {stage.lock_at:%Y-%m-%d %H:%M %Z}"))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
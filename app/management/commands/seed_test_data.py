@@ -79,11 +79,10 @@ class Command(BaseCommand):
                 defaults={'competition': competition}
             )
             all_finished = True
+            teams = list(Team.objects.filter(league=league))  # Registre à jour après chaque résolution
             for team in teams:
-                owned_cyclists = TeamCyclist.objects.filter(team=team, league=league)
-                spent = sum(c.price for c in owned_cyclists)
-                remaining_budget = 488 - spent  # Budget starting at 488
-                num_owned = owned_cyclists.count()
+                remaining_budget = 488 - team.spent  # Budget starting at 488
+                num_owned = team.roster_count
                 if num_owned >= 12 or remaining_budget <= 0:
                     continue
                 all_finished = False
@@ -122,8 +121,9 @@ class Command(BaseCommand):
             round_number += 1
 
         # Ensure all teams have 12 cyclists, if not, create them and bid for them
+        teams = list(Team.objects.filter(league=league))
         for team in teams:
-            num_owned = TeamCyclist.objects.filter(team=team, league=league).count()
+            num_owned = team.roster_count
             remaining_spots = 12 - num_owned
             if remaining_spots > 0:
                 self.stdout.write(self.style.WARNING(f"Team {team.player.username} has only {num_owned} cyclists, adding {remaining_spots} more."))
@@ -0,0 +1,70 @@
+import random
+import time
+from statistics import mean
+from django.core.management.base import BaseCommand, CommandError
+from app.models import League, Team, TeamCyclist
+from app.simulator import AuctionHistory, PRICING, TIE_BREAKS, simulate
+
+
+class Command(BaseCommand):
+    help = (
+        "Rejoue en mémoire les enchères d'une ligue avec d'autres règles (départage, prix) "
+        "et compare le résultat aux effectifs réels."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('league_id', type=int, help='ID de la ligue à rejouer')
+        parser.add_argument('--tie-break', choices=sorted(TIE_BREAKS), default='earliest', help='Règle de départage à prix égal')
+        parser.add_argument('--pricing', choices=sorted(PRICING), default='first_price', help='Prix payé par le gagnant')
+        parser.add_argument(
+            '--enforce-limits', action='store_true',
+            help="Variante : seule une équipe incomplète et solvable peut gagner un coureur encore libre",
+        )
+        parser.add_argument('--replays', type=int, default=1000, help='Nombre de rejeux (utile avec --tie-break random)')
+        parser.add_argument('--seed', type=int, default=None, help='Graine aléatoire')
+
+    def handle(self, *args, **options):
+        league = League.objects.filter(id=options['league_id']).first()
+        if league is None:
+            raise CommandError(f"League {options['league_id']} not found.")
+        history = AuctionHistory.load(league)
+        if not history.rounds:
+            raise CommandError(f"No bids recorded for league {league.name}.")
+        self.stdout.write(
+            f"{league.name}: {len(history.rounds)} rounds, {len(history.team_ids)} teams, "
+            f"{history.bid_count} bids loaded."
+        )
+
+        rng = random.Random(options['seed'])
+        replays = max(1, options['replays'])
+        results = []
+        start = time.perf_counter()
+        for _ in range(replays):
+            results.append(simulate(history, options['tie_break'], options['pricing'], rng, options['enforce_limits']))
+        elapsed = time.perf_counter() - start
+        self.stdout.write(f"{replays} replays in {elapsed:.2f}s ({replays / elapsed:,.0f} replays/s).")
+
+        actual = {team_id: (0, 0) for team_id in history.team_ids}
+        for team in Team.objects.filter(league=league):
+            actual[team.id] = (team.roster_count, team.spent)
+        usernames = dict(Team.objects.filter(league=league).values_list('id', 'player__username'))
+        self.stdout.write("")
+        self.stdout.write(f"{'team':<20} {'riders':>7} {'sim.':>7} {'spent':>7} {'sim.':>8} {'changed':>8}")
+        actual_assignments = dict(TeamCyclist.objects.filter(league=league).values_list('cyclist_id', 'team_id'))
+        for index, team_id in enumerate(history.team_ids):
+            riders = mean(len(result.roster[index]) for result in results)
+            spent = mean(result.spent[index] for result in results)
+            simulated = [
+                {history.cyclist_ids[c] for c in result.roster[index]} for result in results
+            ]
+            owned = {cyclist_id for cyclist_id, owner in actual_assignments.items() if owner == team_id}
+            changed = mean(len(riders_set ^ owned) / 2 for riders_set in simulated)
+            self.stdout.write(
+                f"{usernames.get(team_id, team_id):<20} {actual[team_id][0]:>7} {riders:>7.1f} "
+                f"{actual[team_id][1]:>7} {spent:>8.1f} {changed:>8.1f}"
+            )
+        total_spent = mean(sum(result.spent) for result in results)
+        self.stdout.write("")
+        self.stdout.write(self.style.SUCCESS(
+            f"Average league spend: {total_spent:.1f} (actual {sum(a[1] for a in actual.values())})."
+        ))
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.3 on 2026-10-18 14:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0019_generaltimeresult_bonis_generaltimeresult_uci_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuctionResolutionJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('round_number', models.PositiveIntegerField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('waiting', 'Waiting for bids'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('rerun', models.BooleanField(default=False, help_text='Set when an event arrives while the job is running.')),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('resolved_at', models.DateTimeField(blank=True, null=True)),
+                ('league', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resolution_jobs', to='app.league')),
+            ],
+            options={
+                'unique_together': {('league', 'round_number')},
+            },
+        ),
+    ]
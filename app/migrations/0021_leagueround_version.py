@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 14:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0020_auctionresolutionjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='leagueround',
+            name='version',
+            field=models.PositiveIntegerField(default=0, help_text='Incrémenté à chaque soumission et résolution.'),
+        ),
+    ]
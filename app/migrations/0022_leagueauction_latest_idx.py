@@ -0,0 +1,17 @@
+# Generated by Django 5.2.3 on 2026-10-18 14:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0021_leagueround_version'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='leagueauction',
+            index=models.Index(fields=['league', 'round_number', 'team', '-submitted_at'], name='leagueauction_latest_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.3 on 2026-10-18 14:54
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_team_ledger(apps, schema_editor):
+    Team = apps.get_model('app', 'Team')
+    TeamCyclist = apps.get_model('app', 'TeamCyclist')
+    rosters = TeamCyclist.objects.values('team_id').annotate(count=Count('id'), total=Sum('price'))
+    teams = []
+    for row in rosters:
+        teams.append(Team(
+            id=row['team_id'],
+            spent=row['total'] or 0,
+            roster_count=row['count'],
+            is_complete=row['count'] >= 12 and row['total'] == 500,
+        ))
+    Team.objects.bulk_update(teams, ['spent', 'roster_count', 'is_complete'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0022_leagueauction_latest_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='team',
+            name='is_complete',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='team',
+            name='roster_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='team',
+            name='spent',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_team_ledger, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.3 on 2026-10-18 14:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_league_assignments(apps, schema_editor):
+    TeamCyclist = apps.get_model('app', 'TeamCyclist')
+    LeagueAssignment = apps.get_model('app', 'LeagueAssignment')
+    LeagueAssignment.objects.bulk_create([
+        LeagueAssignment(league_id=tc.league_id, team_id=tc.team_id, cyclist_id=tc.cyclist_id, price=tc.price)
+        for tc in TeamCyclist.objects.order_by('id')
+    ], batch_size=500)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0023_team_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeagueAssignment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('price', models.IntegerField()),
+                ('round_number', models.PositiveIntegerField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('cyclist', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='assignments', to='app.cyclist')),
+                ('league', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='assignments', to='app.league')),
+                ('team', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='assignments', to='app.team')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['league', 'id'], name='leagueassignment_feed_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_league_assignments, migrations.RunPython.noop),
+    ]
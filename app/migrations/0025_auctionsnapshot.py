@@ -0,0 +1,23 @@
+# Generated by Django 5.2.3 on 2026-10-18 15:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0024_leagueassignment'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuctionSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.JSONField()),
+                ('created_at', models.DateTimeField(auto_now=True)),
+                ('league', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='auction_snapshot', to='app.league')),
+            ],
+        ),
+    ]
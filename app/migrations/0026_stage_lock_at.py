@@ -0,0 +1,50 @@
+# Generated by Django 5.2.3 on 2026-10-18 15:09
+
+import datetime
+from zoneinfo import ZoneInfo
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_stage_lock_at(apps, schema_editor):
+    Stage = apps.get_model('app', 'Stage')
+    now = timezone.now()
+    stages = list(Stage.objects.select_related('competition'))
+    for stage in stages:
+        competition = stage.competition
+        stage.lock_at = datetime.datetime.combine(stage.date, competition.lock_time, tzinfo=ZoneInfo(competition.timezone))
+        # Les étapes déjà verrouillées ne doivent pas déclencher stage_locked après coup
+        if stage.lock_at <= now:
+            stage.lock_processed_at = now
+    Stage.objects.bulk_update(stages, ['lock_at', 'lock_processed_at'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0025_auctionsnapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='competition',
+            name='lock_time',
+            field=models.TimeField(default=datetime.time(12, 0)),
+        ),
+        migrations.AddField(
+            model_name='competition',
+            name='timezone',
+            field=models.CharField(default='UTC', help_text="Fuseau IANA de l'heure de verrouillage, ex. Europe/Paris.", max_length=64),
+        ),
+        migrations.AddField(
+            model_name='stage',
+            name='lock_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='stage',
+            name='lock_processed_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_stage_lock_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.3 on 2026-10-18 15:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0026_stage_lock_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResultBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=30)),
+                ('batch_id', models.UUIDField()),
+                ('content_hash', models.CharField(max_length=64)),
+                ('row_count', models.PositiveIntegerField(default=0)),
+                ('imported_at', models.DateTimeField(auto_now=True)),
+                ('stage', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='result_batches', to='app.stage')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['stage', 'content_hash'], name='resultbatch_hash_idx')],
+                'unique_together': {('stage', 'kind')},
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.3 on 2026-10-18 15:29
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+
+
+def backfill_page_kind_count(apps, schema_editor):
+    # Les lots existants partageant une empreinte viennent de la même page
+    ResultBatch = apps.get_model('app', 'ResultBatch')
+    same_page = (
+        ResultBatch.objects.filter(stage=OuterRef('stage'), content_hash=OuterRef('content_hash'))
+        .values('stage').annotate(n=Count('id')).values('n')
+    )
+    ResultBatch.objects.update(page_kind_count=Subquery(same_page))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0027_resultbatch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resultbatch',
+            name='page_kind_count',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_page_kind_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.3 on 2026-10-18 15:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_removals(apps, schema_editor):
+    # Coureurs attribués dans le journal mais retirés depuis : une ligne de retrait chacun
+    TeamCyclist = apps.get_model('app', 'TeamCyclist')
+    LeagueAssignment = apps.get_model('app', 'LeagueAssignment')
+    current = set(TeamCyclist.objects.values_list('league_id', 'cyclist_id'))
+    logged = {}
+    for league_id, cyclist_id, price in LeagueAssignment.objects.order_by('id').values_list('league_id', 'cyclist_id', 'price'):
+        logged[league_id, cyclist_id] = price
+    LeagueAssignment.objects.bulk_create([
+        LeagueAssignment(league_id=league_id, cyclist_id=cyclist_id, price=price, removed=True)
+        for (league_id, cyclist_id), price in logged.items() if (league_id, cyclist_id) not in current
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0028_resultbatch_page_kind_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='leagueassignment',
+            name='removed',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AlterField(
+            model_name='leagueassignment',
+            name='team',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='assignments', to='app.team'),
+        ),
+        migrations.RunPython(backfill_removals, migrations.RunPython.noop),
+    ]
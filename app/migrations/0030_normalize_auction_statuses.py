@@ -0,0 +1,21 @@
+# Generated by Django 5.2.3 on 2026-10-18 16:10
+
+from django.db import migrations
+
+
+def normalize_statuses(apps, schema_editor):
+    # Anciennes lignes écrites en 'Won' / 'Lost' : la résolution n'écrit que les valeurs des choices
+    TeamCyclistAuction = apps.get_model('app', 'TeamCyclistAuction')
+    for status in ('pending', 'won', 'lost'):
+        TeamCyclistAuction.objects.filter(status__iexact=status).exclude(status=status).update(status=status)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0029_leagueassignment_removed'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_statuses, migrations.RunPython.noop),
+    ]
@@ -1,25 +1,67 @@
 # NOTE: After editing models, run: python manage.py makemigrations && python manage.py migrate
 from django.db import models
 from django.contrib.auth import get_user_model
-from django.db import transaction
+from django.db import connection, transaction
+from bisect import bisect_right
 from collections import defaultdict
+from dataclasses import dataclass, field
+from django.core.cache import cache
+from django.db.models import Case, Count, Max, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Lower
 from django.utils import timezone
-from django.db.models.signals import post_save
-from django.dispatch import receiver
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+import hashlib
 import random
 import string
+import logging
 import uuid
+from datetime import datetime, time as dt_time
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from . import events
 
 User = get_user_model()
+logger = logging.getLogger(__name__)
+
+BUDGET = 500  # Budget d'enchères par équipe
+TEAM_SIZE = 12  # Nombre de coureurs dans une équipe complète
 
 class Competition(models.Model):
     name = models.CharField(max_length=255)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Heure locale de verrouillage des sélections le jour de chaque étape (voir Stage.lock_at)
+    lock_time = models.TimeField(default=dt_time(12, 0))
+    timezone = models.CharField(max_length=64, default='UTC', help_text="Fuseau IANA de l'heure de verrouillage, ex. Europe/Paris.")
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        loaded = dict(zip(field_names, values))
+        instance._loaded_lock_policy = (loaded.get('lock_time'), loaded.get('timezone'))
+        return instance
+
+    def save(self, *args, **kwargs):
+        policy_changed = not self._state.adding and getattr(self, '_loaded_lock_policy', None) != (self.lock_time, self.timezone)
+        super().save(*args, **kwargs)
+        self._loaded_lock_policy = (self.lock_time, self.timezone)
+        if not policy_changed:
+            return
+        # L'heure ou le fuseau ont changé : recalcule le verrouillage des étapes
+        stages = [stage for stage in self.stages.all() if stage.set_lock_at(Stage.compute_lock_at(stage.date, self))]
+        Stage.objects.bulk_update(stages, ['lock_at', 'lock_processed_at'])
+
+    def zoneinfo(self):
+        try:
+            return ZoneInfo(self.timezone)
+        except (ZoneInfoNotFoundError, ValueError):
+            logger.warning("Unknown timezone %r for competition %s, using UTC", self.timezone, self.id)
+            return ZoneInfo('UTC')
+
 class Cyclist(models.Model):
     name = models.CharField(max_length=255)
     team = models.CharField(max_length=255)
@@ -27,9 +69,46 @@ class Cyclist(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    CATALOGUE_VERSION_KEY = 'cyclist_catalogue_version'
+    CATALOGUE_FIELDS = ['id', 'name', 'team', 'value']
+
     def __str__(self):
         return f"{self.name} ({self.team})"
 
+    @staticmethod
+    def catalogue_version():
+        """Version of the rider catalogue, derived from the latest updated_at and the row count."""
+        version = cache.get(Cyclist.CATALOGUE_VERSION_KEY)
+        if version is None:
+            stats = Cyclist.objects.aggregate(updated=Max('updated_at'), count=Count('id'))
+            updated = stats['updated'].strftime('%Y%m%d%H%M%S%f') if stats['updated'] else '0'
+            version = f"{stats['count']}-{updated}"
+            cache.set(Cyclist.CATALOGUE_VERSION_KEY, version, None)
+        return version
+
+    @staticmethod
+    def catalogue(version=None):
+        """Compact catalogue payload (one row per rider), cached per version."""
+        version = version or Cyclist.catalogue_version()
+        key = f'cyclist_catalogue:{version}'
+        payload = cache.get(key)
+        if payload is None:
+            payload = {
+                'version': version,
+                'fields': Cyclist.CATALOGUE_FIELDS,
+                'rows': [list(row) for row in Cyclist.objects.order_by('id').values_list(*Cyclist.CATALOGUE_FIELDS)],
+            }
+            cache.set(key, payload, 60 * 60 * 24)
+        return payload
+
+    @staticmethod
+    def invalidate_catalogue():
+        cache.delete(Cyclist.CATALOGUE_VERSION_KEY)
+
+@receiver([post_save, post_delete], sender=Cyclist)
+def invalidate_cyclist_catalogue(sender, **kwargs):
+    Cyclist.invalidate_catalogue()
+
 class League(models.Model):
     name = models.CharField(max_length=255)
     creator = models.ForeignKey(
@@ -51,10 +130,28 @@ class League(models.Model):
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'auction_finished' in field_names:
+            instance._loaded_auction_finished = values[field_names.index('auction_finished')]
+        return instance
+
     def save(self, *args, **kwargs):
         if not self.invite_code:
             self.invite_code = self.generate_invite_code()
+        finished_changed = (
+            not self._state.adding and hasattr(self, '_loaded_auction_finished')
+            and self._loaded_auction_finished != self.auction_finished
+        )
         super().save(*args, **kwargs)
+        if finished_changed:
+            # Fin des enchères (résolution ou admin) : nouveau snapshot ; réouverture : il est jeté
+            self._loaded_auction_finished = self.auction_finished
+            if self.auction_finished:
+                AuctionSnapshot.build(self)
+            else:
+                AuctionSnapshot.discard(self)
 
     @staticmethod
     def generate_invite_code(length=8):
@@ -98,12 +195,34 @@ class LeagueAuction(models.Model):
     submitted_at = models.DateTimeField(auto_now_add=True)
     is_active = models.BooleanField(default=True)
 
+    class Meta:
+        indexes = [
+            # Sert "dernière soumission de chaque équipe pour un round"
+            models.Index(fields=['league', 'round_number', 'team', '-submitted_at'], name='leagueauction_latest_idx'),
+        ]
+
     def __str__(self):
         return f"Auction for {self.team} in {self.league} (Round {self.round_number})"
 
     @staticmethod
     def get_latest_for_team_and_round(league, team, round_number):
-        return LeagueAuction.objects.filter(league=league, team=team, round_number=round_number).order_by('-submitted_at').first()
+        return LeagueAuction.objects.filter(league=league, team=team, round_number=round_number).order_by('-submitted_at', '-id').first()
+
+    @staticmethod
+    def latest_for_round(league, round_number):
+        """
+        Return {team_id: LeagueAuction} with the latest submission of every team for the round,
+        in one query (DISTINCT ON where the database supports it, a correlated subquery otherwise).
+        """
+        auctions = LeagueAuction.objects.filter(league=league, round_number=round_number)
+        if connection.features.can_distinct_on_fields:
+            auctions = auctions.order_by('team_id', '-submitted_at', '-id').distinct('team_id')
+        else:
+            latest = LeagueAuction.objects.filter(
+                league=league, round_number=round_number, team=OuterRef('team')
+            ).order_by('-submitted_at', '-id').values('id')[:1]
+            auctions = auctions.filter(id=Subquery(latest))
+        return {auction.team_id: auction for auction in auctions}
 
     def save(self, *args, **kwargs):
         is_new = self.pk is None
@@ -112,28 +231,18 @@ class LeagueAuction(models.Model):
         #     self.check_and_resolve_auction()
 
     def check_and_resolve_auction(self):
-        teams = Team.objects.filter(league=self.league)
-        all_ready = True
-        for team in teams:
-            print(f"[DEBUG] Checking team: {team}")
-            latest_auction = LeagueAuction.get_latest_for_team_and_round(self.league, team, self.round_number)
-            team_cyclist_count = TeamCyclist.objects.filter(team=team, league=self.league).count()
-            teamcyclist_total = sum(tc.price for tc in TeamCyclist.objects.filter(team=team, league=self.league))
-            remaining_budget = 500 - teamcyclist_total
-            if not latest_auction:
-                if team_cyclist_count >= 12 or remaining_budget == 0:
-                    continue  # Team is complete, skip auction check
-                all_ready = False
-                print(f"[WARN] No auction found for team {team}")
-                break
-            cyclist_count = TeamCyclistAuction.objects.filter(league_auction=latest_auction).count()
-            print(f"[DEBUG] Cyclists submitted for team {team}: {cyclist_count}")
-            if cyclist_count + team_cyclist_count < 12 and remaining_budget > 0:
-                all_ready = False
-                break
-        if all_ready:
-            print("[INFO] All teams ready, resolving auction")
-            resolve_auctions_for_league(self.league.id, self.round_number)
+        return LeagueAuction.check_and_resolve(self.league, self.round_number)
+
+    @staticmethod
+    def check_and_resolve(league, round_number):
+        league_round = LeagueRound.objects.get(league=league, round_number=round_number)
+        readiness = league_round.readiness()
+        if not readiness.all_ready:
+            logger.debug("Round %s of league %s not ready: %s", round_number, league.id,
+                         [t.username for t in readiness.teams if not t.is_ready])
+            return None
+        logger.info("All teams ready in league %s, resolving round %s", league.id, round_number)
+        return resolve_auctions_for_league(league.id, round_number, expected_version=league_round.version)
 
 
 class TeamCyclistAuction(models.Model):
@@ -143,12 +252,79 @@ class TeamCyclistAuction(models.Model):
     submitted_at = models.DateTimeField(auto_now_add=True)
     status = models.CharField(max_length=255, choices=[('pending', 'Pending'), ('won', 'Won'), ('lost', 'Lost')])
 
+    RESOLVED_STATUSES = ('won', 'lost')
+    RESULTS_PAGE_SIZE = 25
+
     class Meta:
         unique_together = ('league_auction', 'cyclist')
 
     def __str__(self):
         return f"{self.cyclist.name} in {self.league_auction.id} for {self.price} ({self.status})"
 
+    @staticmethod
+    def results_page(league, after=None, search='', limit=RESULTS_PAGE_SIZE):
+        """
+        One page of auction results grouped by rider, sorted in SQL by purchase price (winning bid,
+        descending) then name. `after` is the (top_price, name_key, cyclist_id) keyset cursor of the
+        previous page's last rider; limit=None returns every rider. Returns (riders, next_cursor); each rider carries its bids,
+        best first, with the winner first on equal prices. `search` matches the rider's name or team,
+        or the player of one of its bids.
+        """
+        riders = Cyclist.objects.filter(
+            team_cyclists_auction__league_auction__league=league,
+            team_cyclists_auction__status__in=TeamCyclistAuction.RESOLVED_STATUSES,
+        )
+        if search:
+            # Joueur cherché en sous-requête : un filtre sur la jointure des mises restreindrait aussi
+            # les agrégats (prix d'achat, nombre d'enchères) aux mises de ce joueur
+            bidders = TeamCyclistAuction.objects.filter(
+                league_auction__league=league, league_auction__team__player__username__icontains=search,
+            ).values('cyclist_id')
+            riders = riders.filter(Q(name__icontains=search) | Q(team__icontains=search) | Q(id__in=bidders))
+        riders = riders.annotate(
+            top_price=Coalesce(
+                Max('team_cyclists_auction__price', filter=Q(team_cyclists_auction__status='won')), Value(0.0)
+            ),
+            bid_count=Count('team_cyclists_auction'),
+            name_key=Lower('name'),
+        )
+        if after is not None:
+            top_price, name_key, cyclist_id = after
+            riders = riders.filter(
+                Q(top_price__lt=top_price)
+                | Q(top_price=top_price, name_key__gt=name_key)
+                | Q(top_price=top_price, name_key=name_key, id__gt=cyclist_id)
+            )
+        riders = riders.order_by('-top_price', 'name_key', 'id')
+        riders = list(riders if limit is None else riders[:limit + 1])
+        next_cursor = None
+        if limit is not None and len(riders) > limit:
+            riders = riders[:limit]
+            last = riders[-1]
+            next_cursor = (last.top_price, last.name_key, last.id)
+        bids = (
+            TeamCyclistAuction.objects.filter(
+                league_auction__league=league,
+                cyclist_id__in=[rider.id for rider in riders],
+                status__in=TeamCyclistAuction.RESOLVED_STATUSES,
+            )
+            # '-status' : à prix égal, 'won' passe avant 'lost'
+            .order_by('cyclist_id', '-price', '-status')
+            .values('cyclist_id', 'price', 'status', 'league_auction__round_number', 'league_auction__team__player__username')
+        )
+        bids_by_rider = defaultdict(list)
+        for bid in bids:
+            bids_by_rider[bid['cyclist_id']].append({
+                'player': bid['league_auction__team__player__username'],
+                'price': bid['price'],
+                'status': bid['status'],
+                'round': bid['league_auction__round_number'],
+            })
+        for rider in riders:
+            rider.bids = bids_by_rider[rider.id]
+            rider.winner = next((bid for bid in rider.bids if bid['status'] == 'won'), None)
+        return riders, next_cursor
+
 
 class Team(models.Model):
     player = models.ForeignKey(
@@ -162,6 +338,11 @@ class Team(models.Model):
         related_name="teams"
     )
 
+    # Registre dénormalisé des TeamCyclist de l'équipe (voir rebuild_ledgers)
+    spent = models.IntegerField(default=0)
+    roster_count = models.PositiveIntegerField(default=0)
+    is_complete = models.BooleanField(default=False)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -169,82 +350,299 @@ class Team(models.Model):
         return f"Team of {self.player} in {self.league}"
 
     @property
-    def is_complete(self):
-        won_cyclists = self.team_cyclists_auction.filter(status='won').count()
-        total_won_price = sum(tc.price for tc in self.team_cyclists_auction.filter(status='won'))
-        return won_cyclists >= 12 and total_won_price == 100  # or use BUDGET if variable
-
-def resolve_auctions_for_league(league_id, round_number):
-    league = League.objects.get(id=league_id)
-    teams = Team.objects.filter(league=league)
-    # On ne prend que les dernières LeagueAuction de chaque team pour ce round
-    latest_auctions = {
-        team.id: LeagueAuction.get_latest_for_team_and_round(league, team, round_number)
-        for team in teams
-    }
-    # Récupère tous les TeamCyclistAuction "pending" pour ces LeagueAuction
-    all_bids = TeamCyclistAuction.objects.filter(
-        league_auction__in=[a for a in latest_auctions.values() if a],
-        status='pending'
-    )
-    cyclist_bids = defaultdict(list)
-    for bid in all_bids.select_related('cyclist', 'league_auction__team'):
-        cyclist_bids[bid.cyclist_id].append(bid)
-    assignments = {}
+    def remaining_budget(self):
+        return BUDGET - self.spent
+
+    @staticmethod
+    def roster_version(league):
+        """
+        Fingerprint of everything the league teams list shows: per team its player's username,
+        rider count, last assignment and prices (one grouped query), plus the rider catalogue
+        version for rider name, team and value edits. It changes with every roster add, removal
+        or price edit, username change or catalogue edit.
+        """
+        teams = (
+            Team.objects.filter(league=league)
+            .annotate(riders=Count('team_cyclists'), last=Max('team_cyclists__id'), prices=Sum('team_cyclists__price'))
+            .order_by('id')
+            .values_list('id', 'player__username', 'riders', 'last', 'prices')
+        )
+        digest = hashlib.sha1(repr(list(teams)).encode('utf-8')).hexdigest()[:16]
+        return f"{Cyclist.catalogue_version()}-{digest}"
+
+    @staticmethod
+    def league_rosters(league):
+        """Rosters of every team of the league: one team query and one roster query."""
+        teams = list(Team.objects.filter(league=league).select_related('player').order_by('id'))
+        rosters = defaultdict(list)
+        for tc in TeamCyclist.objects.filter(league=league).select_related('cyclist').order_by('id'):
+            rosters[tc.team_id].append({
+                'name': tc.cyclist.name,
+                'team': tc.cyclist.team,
+                'price': tc.price,
+                'min_value': tc.cyclist.value,
+            })
+        return [{'player': team.player.username, 'cyclists': rosters[team.id]} for team in teams]
+
+    @staticmethod
+    def rebuild_ledgers(teams):
+        """
+        Recompute spent, roster_count and is_complete of the given teams from their TeamCyclist
+        rows (one aggregate query, one bulk update). Returns the list of (team, old, new) tuples
+        for the teams whose stored ledger had drifted.
+        """
+        teams = list(teams)
+        rosters = {
+            row['team_id']: row
+            for row in TeamCyclist.objects.filter(team__in=teams).values('team_id').annotate(
+                count=Count('id'), total=Sum('price')
+            )
+        }
+        drifts = []
+        for team in teams:
+            row = rosters.get(team.id, {'count': 0, 'total': 0})
+            new = (row['total'] or 0, row['count'], row['count'] >= TEAM_SIZE and row['total'] == BUDGET)
+            old = (team.spent, team.roster_count, team.is_complete)
+            if old != new:
+                team.spent, team.roster_count, team.is_complete = new
+                drifts.append((team, old, new))
+        Team.objects.bulk_update([team for team, _, _ in drifts], ['spent', 'roster_count', 'is_complete'])
+        return drifts
+
+@receiver([post_save, post_delete], sender=TeamCyclist)
+def refresh_team_ledger(sender, instance, **kwargs):
+    # La résolution des enchères (bulk_create) met le registre à jour elle-même
+    origin = kwargs.get('origin', instance)
+    if origin is instance:
+        Team.rebuild_ledgers(Team.objects.filter(pk=instance.team_id))
+        return
+    # Suppression en masse (admin, queryset) ou en cascade d'un coureur : une seule reconstruction
+    # des équipes touchées au commit. Avec la ligue ou l'équipe, le registre disparaît aussi.
+    origin_model = getattr(origin, 'model', type(origin))
+    if origin_model in (League, Team):
+        return
+    team_ids = getattr(origin, '_ledger_team_ids', None)
+    if team_ids is None:
+        team_ids = origin._ledger_team_ids = set()
+        transaction.on_commit(lambda: Team.rebuild_ledgers(Team.objects.filter(pk__in=team_ids)))
+    team_ids.add(instance.team_id)
+
+class LeagueAssignment(models.Model):
+    """
+    Append-only log of riders assigned to a team in a league, and of riders removed from a
+    roster (tombstone rows, removed=True, without team). The auto-increment id is the feed
+    version: the auction page replays "assignments since N" instead of loading the whole roster.
+    """
+    league = models.ForeignKey('League', on_delete=models.CASCADE, related_name='assignments')
+    team = models.ForeignKey('Team', on_delete=models.CASCADE, related_name='assignments', null=True, blank=True)
+    cyclist = models.ForeignKey('Cyclist', on_delete=models.CASCADE, related_name='assignments')
+    price = models.IntegerField()
+    round_number = models.PositiveIntegerField(null=True, blank=True)
+    removed = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['league', 'id'], name='leagueassignment_feed_idx')]
+
+    def __str__(self):
+        if self.removed:
+            return f"#{self.id} {self.cyclist_id} removed"
+        return f"#{self.id} {self.cyclist_id} -> {self.team} for {self.price}"
+
+    @staticmethod
+    def since(league, version):
+        """
+        Return (new_version, assignments) for the entries logged after version, in log order:
+        replaying them from 0 gives the current locked riders of the league.
+        """
+        rows = list(
+            LeagueAssignment.objects.filter(league=league, id__gt=version).order_by('id')
+            .values_list('id', 'cyclist_id', 'team__player__username', 'price', 'removed')
+        )
+        assignments = [
+            {'cyclist_id': cyclist_id, 'assigned_to': username, 'price': price, 'removed': removed}
+            for _, cyclist_id, username, price, removed in rows
+        ]
+        return (rows[-1][0] if rows else version), assignments
+
+    @staticmethod
+    def removal(team_cyclist):
+        return LeagueAssignment(
+            league_id=team_cyclist.league_id, cyclist_id=team_cyclist.cyclist_id, price=team_cyclist.price, removed=True,
+        )
+
+@receiver(post_save, sender=TeamCyclist)
+def log_team_cyclist_assignment(sender, instance, created, **kwargs):
+    # Attributions unitaires (admin) ; la résolution des enchères écrit le journal en masse
+    if created:
+        LeagueAssignment.objects.create(
+            league_id=instance.league_id, team_id=instance.team_id,
+            cyclist_id=instance.cyclist_id, price=instance.price,
+        )
+
+@receiver(post_delete, sender=TeamCyclist)
+def log_team_cyclist_removal(sender, instance, **kwargs):
+    # Suppressions unitaires, en masse (admin, remplacement d'effectifs) ou avec l'équipe :
+    # le coureur redevient libre. Rien à journaliser si la ligue ou le coureur disparaissent.
+    origin = kwargs.get('origin')
+    origin_model = getattr(origin, 'model', type(origin))
+    if origin_model in (League, Cyclist):
+        return
+    LeagueAssignment.removal(instance).save()
+
+@dataclass
+class AuctionResolution:
+    """Outcome of resolving one auction round for a league."""
+    league_id: int
+    round_number: int
+    assignments: dict = field(default_factory=dict)  # cyclist_id -> team_id
+    won_count: int = 0
+    lost_count: int = 0
+    created_count: int = 0
+    round_closed: bool = False
+    league_finished: bool = False
+
+def resolve_auctions_for_league(league_id, round_number, expected_version=None):
+    """
+    Resolve the bids of a round for the whole league with a fixed number of queries:
+    winners are picked in memory (highest price, then earliest submission), statuses are
+    written with bulk_update, rosters with bulk_create and completeness with one aggregate.
+
+    The round row is locked for the whole resolution so that concurrent submissions and
+    resolutions of the same league are serialized. Returns None without writing anything
+    when the round is already closed or its version no longer matches expected_version
+    (a bid was submitted after the readiness check).
+    """
     with transaction.atomic():
+        current_round = LeagueRound.objects.select_for_update().select_related('league').get(
+            league_id=league_id, round_number=round_number
+        )
+        if not current_round.is_active or (expected_version is not None and current_round.version != expected_version):
+            logger.info("Skipping stale resolution of round %s for league %s", round_number, league_id)
+            return None
+        league = current_round.league
+        teams = list(Team.objects.filter(league=league))
+        result = AuctionResolution(league_id=league.id, round_number=round_number)
+        # On ne prend que les dernières LeagueAuction de chaque team pour ce round
+        latest_auctions = LeagueAuction.latest_for_round(league, round_number)
+        # Récupère tous les TeamCyclistAuction "pending" pour ces LeagueAuction
+        all_bids = TeamCyclistAuction.objects.filter(
+            league_auction__in=latest_auctions.values(),
+            status='pending'
+        )
+        auction_teams = {auction.id: team_id for team_id, auction in latest_auctions.items()}
+        cyclist_bids = defaultdict(list)
+        for bid in all_bids:
+            cyclist_bids[bid.cyclist_id].append(bid)
+        owned_cyclist_ids = set(
+            TeamCyclist.objects.filter(league=league).values_list('cyclist_id', flat=True)
+        )
+        updated_bids = []
+        new_team_cyclists = []
+        won_by_team = defaultdict(list)
         for cyclist_id, bids in cyclist_bids.items():
-            if len(bids) == 1:
-                bid = bids[0]
-                bid.status = 'won'
-                bid.save()
-                assignments[cyclist_id] = bid.league_auction.team_id
-            else:
-                bids.sort(key=lambda b: (-b.price, b.submitted_at))
-                winner = bids[0]
-                winner.status = 'won'
-                winner.save()
-                assignments[cyclist_id] = winner.league_auction.team_id
-                for loser in bids[1:]:
-                    loser.status = 'lost'
-                    loser.save()
-        # After assignment, check team completeness (pour ce round)
-        all_complete = True
-        for team in teams:
-            auction = latest_auctions.get(team.id)
-            if not auction:
-                continue
-            won_bids = TeamCyclistAuction.objects.filter(league_auction=auction, status='won')
-            for tc in won_bids:
-                # Crée un TeamCyclist si non existant pour ce team, league, cyclist
-                TeamCyclist.objects.get_or_create(
-                    team=team,
+            bids.sort(key=lambda b: (-b.price, b.submitted_at))
+            winner = bids[0]
+            winner.status = 'won'
+            team_id = auction_teams[winner.league_auction_id]
+            result.assignments[cyclist_id] = team_id
+            won_by_team[team_id].append(winner)
+            for loser in bids[1:]:
+                loser.status = 'lost'
+            updated_bids.extend(bids)
+            result.lost_count += len(bids) - 1
+            if cyclist_id not in owned_cyclist_ids:
+                new_team_cyclists.append(TeamCyclist(
+                    team_id=team_id,
                     league=league,
-                    cyclist=tc.cyclist,
-                    defaults={
-                        'price': tc.price,
-                        'locked': True
-                    }
-                )
-            won_count = won_bids.count()
-            total_won_price = sum(tc.price for tc in won_bids)
-            team_complete = won_count >= 12 and total_won_price == 500
-            # Optionnel : stocker le statut de complétude
-            if not team_complete:
-                all_complete = False
+                    cyclist_id=cyclist_id,
+                    price=winner.price,
+                    locked=True,
+                ))
+        result.won_count = len(result.assignments)
+        TeamCyclistAuction.objects.bulk_update(updated_bids, ['status'])
+        TeamCyclist.objects.bulk_create(new_team_cyclists)
+        LeagueAssignment.objects.bulk_create([
+            LeagueAssignment(
+                league=league, team_id=tc.team_id, cyclist_id=tc.cyclist_id,
+                price=tc.price, round_number=round_number,
+            )
+            for tc in new_team_cyclists
+        ])
+        result.created_count = len(new_team_cyclists)
+        # After assignment, check team completeness (pour ce round)
+        all_complete = all(
+            len(won_by_team[team_id]) >= TEAM_SIZE and sum(b.price for b in won_by_team[team_id]) == BUDGET
+            for team_id in latest_auctions
+        )
+        # Toute résolution invalide les vérifications faites sur l'ancienne version du round
+        current_round.version += 1
         # Si toutes les équipes sont complètes, close le round et crée le suivant
         if not all_complete:
-            current_round = LeagueRound.objects.get(league=league, round_number=round_number)
             current_round.close_and_create_next()
-        # Si toutes les équipes sont complètes pour la ligue, on marque auction_finished à True
-        league_complete = all(
-            TeamCyclist.objects.filter(team=team, league=league).count() >= 12 and
-            sum(tc.price for tc in TeamCyclist.objects.filter(team=team, league=league)) == 500
-            for team in teams
-        )
+            result.round_closed = True
+        else:
+            current_round.save(update_fields=['version'])
+        # Met à jour le registre des équipes puis, si toutes les équipes sont complètes
+        # pour la ligue, on marque auction_finished à True
+        Team.rebuild_ledgers(teams)
+        league_complete = all(team.is_complete for team in teams)
         if league_complete:
+            # League.save écrit le snapshot des résultats
             league.auction_finished = True
             league.save()
-    return assignments
+            result.league_finished = True
+        events.publish(
+            league.id, events.ROUND_RESOLVED, round_number=round_number,
+            won_count=result.won_count, round_closed=result.round_closed,
+        )
+        if result.league_finished:
+            events.publish(league.id, events.AUCTION_FINISHED)
+    return result
+
+@dataclass
+class TeamReadiness:
+    """Roster and latest-bid situation of one team for a round."""
+    team_id: int
+    player_id: int
+    username: str
+    roster_count: int
+    spent: int
+    latest_auction_id: int | None
+    bid_count: int
+
+    @property
+    def remaining_budget(self):
+        return BUDGET - self.spent
+
+    @property
+    def submitted(self):
+        return self.bid_count > 0
+
+    @property
+    def is_complete(self):
+        return self.roster_count >= TEAM_SIZE or self.remaining_budget <= 0
+
+    @property
+    def is_finished(self):
+        return self.roster_count >= TEAM_SIZE and self.remaining_budget == 0
+
+    @property
+    def is_ready(self):
+        if self.is_complete:
+            return True
+        return self.latest_auction_id is not None and self.bid_count + self.roster_count >= TEAM_SIZE
+
+@dataclass
+class RoundReadiness:
+    """Per-team readiness of a round and the league verdict."""
+    league_id: int
+    round_number: int
+    teams: list
+
+    @property
+    def all_ready(self):
+        return all(team.is_ready for team in self.teams)
 
 class LeagueRound(models.Model):
     competition = models.ForeignKey('Competition', on_delete=models.CASCADE, related_name='rounds')
@@ -253,6 +651,7 @@ class LeagueRound(models.Model):
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     ended_at = models.DateTimeField(null=True, blank=True)
+    version = models.PositiveIntegerField(default=0, help_text="Incrémenté à chaque soumission et résolution.")
 
     class Meta:
         unique_together = ('league', 'round_number')
@@ -264,6 +663,46 @@ class LeagueRound(models.Model):
     def get_active(league):
         return LeagueRound.objects.filter(league=league, is_active=True).order_by('-round_number').first()
 
+    @staticmethod
+    def lock_current(league):
+        """Lock the latest round of the league. Must be called inside transaction.atomic()."""
+        return LeagueRound.objects.select_for_update().filter(league=league).order_by('-round_number').first()
+
+    def bump_version(self):
+        LeagueRound.objects.filter(pk=self.pk).update(version=models.F('version') + 1)
+
+    def readiness(self):
+        """
+        Read roster count and spend (from the team ledger) and the latest-auction bid count
+        of every team of the league in a single annotated query.
+        """
+        latest_auction = LeagueAuction.objects.filter(
+            team=OuterRef('pk'), league_id=self.league_id, round_number=self.round_number
+        ).order_by('-submitted_at', '-id').values('id')[:1]
+        bid_count = TeamCyclistAuction.objects.filter(
+            league_auction=OuterRef('latest_auction_id')
+        ).order_by().values('league_auction').annotate(count=Count('id')).values('count')
+        teams = Team.objects.filter(league_id=self.league_id).select_related('player').annotate(
+            latest_auction_id=Subquery(latest_auction),
+            bid_count=Coalesce(Subquery(bid_count), 0),
+        ).order_by('id')
+        return RoundReadiness(
+            league_id=self.league_id,
+            round_number=self.round_number,
+            teams=[
+                TeamReadiness(
+                    team_id=team.id,
+                    player_id=team.player_id,
+                    username=team.player.username,
+                    roster_count=team.roster_count,
+                    spent=team.spent,
+                    latest_auction_id=team.latest_auction_id,
+                    bid_count=team.bid_count,
+                )
+                for team in teams
+            ],
+        )
+
     def close_and_create_next(self):
         self.is_active = False
         self.ended_at = timezone.now()
@@ -276,6 +715,230 @@ class LeagueRound(models.Model):
         )
         return next_round
 
+class AuctionSnapshot(models.Model):
+    """
+    Frozen results of a finished auction: final rosters, prices and the bid history grouped by
+    rider. Written once when League.auction_finished is set, then served from cache instead of
+    being recomputed from the raw tables. Ignored as soon as the auction is reopened.
+    """
+    league = models.OneToOneField('League', on_delete=models.CASCADE, related_name='auction_snapshot')
+    data = models.JSONField()
+    created_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Auction snapshot of {self.league} ({self.created_at:%Y-%m-%d %H:%M})"
+
+    @staticmethod
+    def cache_key(league_id):
+        return f'auction_snapshot:{league_id}'
+
+    @staticmethod
+    def build(league):
+        """(Re)write the snapshot of the league from the raw tables."""
+        rosters = defaultdict(list)
+        team_cyclists = TeamCyclist.objects.filter(league=league).select_related('cyclist').order_by('-price', 'id')
+        for tc in team_cyclists:
+            rosters[tc.team_id].append({
+                'name': tc.cyclist.name,
+                'team': tc.cyclist.team,
+                'price': tc.price,
+                'min_value': tc.cyclist.value,
+            })
+        # Situation de chaque équipe au dernier round (mises comprises) pour la page de statut
+        last_round = LeagueRound.objects.filter(league=league).order_by('-round_number').first()
+        teams = [
+            {
+                'team_id': team.team_id,
+                'player': team.username,
+                'player_id': team.player_id,
+                'spent': team.spent,
+                'roster_count': team.roster_count,
+                'bid_count': team.bid_count,
+                'submitted': team.submitted,
+                'finished': team.is_finished,
+                'cyclists': rosters[team.team_id],
+            }
+            for team in last_round.readiness().teams
+        ]
+        riders, _ = TeamCyclistAuction.results_page(league, limit=None)
+        data = {
+            # Validateur HTTP (ETag) des pages servies depuis le snapshot
+            'build_id': uuid.uuid4().hex,
+            'built_at': timezone.now().isoformat(),
+            'teams': teams,
+            # Trié en Python avec la clé de results_page : l'ordre SQL (collation de la base)
+            # peut différer de l'ordre des chaînes Python sur les noms accentués
+            'riders': sorted((
+                {
+                    'id': rider.id,
+                    'name': rider.name,
+                    'team': rider.team,
+                    'top_price': rider.top_price,
+                    'name_key': rider.name_key,
+                    'bid_count': rider.bid_count,
+                    'winner': rider.winner,
+                    'bids': rider.bids,
+                }
+                for rider in riders
+            ), key=AuctionSnapshot.rider_key),
+        }
+        snapshot, _ = AuctionSnapshot.objects.update_or_create(league=league, defaults={'data': data})
+        transaction.on_commit(lambda: cache.set(AuctionSnapshot.cache_key(league.id), data, None))
+        return snapshot
+
+    @staticmethod
+    def discard(league):
+        AuctionSnapshot.objects.filter(league=league).delete()
+        cache.delete(AuctionSnapshot.cache_key(league.id))
+
+    @staticmethod
+    def for_league(league):
+        """Snapshot data of a finished auction, or None (auction running or reopened, no snapshot)."""
+        if not league.auction_finished:
+            return None
+        data = cache.get(AuctionSnapshot.cache_key(league.id))
+        if data is None:
+            data = AuctionSnapshot.objects.filter(league=league).values_list('data', flat=True).first()
+            if data is not None and 'build_id' not in data:
+                # Snapshot écrit avant les build ids et l'état des mises : reconstruit une fois
+                return AuctionSnapshot.build(league).data
+            if data is not None:
+                cache.set(AuctionSnapshot.cache_key(league.id), data, None)
+        return data
+
+    @staticmethod
+    def rider_key(rider):
+        """Sort and keyset key of the frozen rider list: price descending, then name, then id."""
+        return (-rider['top_price'], rider['name_key'], rider['id'])
+
+    @staticmethod
+    def results_page(data, after=None, search='', limit=TeamCyclistAuction.RESULTS_PAGE_SIZE):
+        """
+        Same contract as TeamCyclistAuction.results_page, over the frozen rider list. The list is
+        sorted with the same key the cursor is bisected on (a no-op pass for recent snapshots,
+        which are stored in that order), so pages never skip or repeat a rider.
+        """
+        riders = sorted(data['riders'], key=AuctionSnapshot.rider_key)
+        if search:
+            needle = search.lower()
+            riders = [
+                rider for rider in riders
+                if needle in rider['name'].lower() or needle in (rider.get('team') or '').lower()
+                or any(needle in bid['player'].lower() for bid in rider['bids'])
+            ]
+        start = 0
+        if after is not None:
+            top_price, name_key, cyclist_id = after
+            cursor = (-top_price, name_key, cyclist_id)
+            start = bisect_right(riders, cursor, key=AuctionSnapshot.rider_key)
+        page = riders[start:start + limit]
+        next_cursor = None
+        if start + limit < len(riders):
+            last = page[-1]
+            next_cursor = (last['top_price'], last['name_key'], last['id'])
+        return page, next_cursor
+
+class AuctionResolutionJob(models.Model):
+    """
+    Queued "round may be complete" event for a league round, processed by the
+    run_auction_worker command instead of inside the bidder's HTTP request.
+    There is one row per (league, round_number): enqueueing the same round again only re-arms it.
+    A failed job is retried by the worker after a backoff, up to MAX_ATTEMPTS consecutive failures.
+    """
+    MAX_ATTEMPTS = 5
+
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('waiting', 'Waiting for bids'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    league = models.ForeignKey('League', on_delete=models.CASCADE, related_name='resolution_jobs')
+    round_number = models.PositiveIntegerField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    rerun = models.BooleanField(default=False, help_text="Set when an event arrives while the job is running.")
+    # Prises en charge depuis la dernière vérification réussie (borne les relances après échec)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    resolved_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ('league', 'round_number')
+
+    def __str__(self):
+        return f"Resolution of round {self.round_number} for {self.league} ({self.status})"
+
+    @staticmethod
+    def enqueue(league, round_number):
+        """Record that the round may be complete. Duplicate events are harmless."""
+        job, created = AuctionResolutionJob.objects.get_or_create(league=league, round_number=round_number)
+        if created:
+            return job
+        now = timezone.now()
+        jobs = AuctionResolutionJob.objects.filter(pk=job.pk)
+        # Un worker traite déjà ce round : il le relancera en terminant
+        if not jobs.filter(status='running').update(rerun=True, updated_at=now):
+            jobs.filter(status__in=['waiting', 'failed']).update(status='pending', attempts=0, updated_at=now)
+        return job
+
+    @staticmethod
+    def requeue(jobs):
+        """Put jobs back in the queue with a fresh retry budget (admin). Running jobs are left alone."""
+        return jobs.exclude(status='running').update(status='pending', rerun=False, attempts=0, updated_at=timezone.now())
+
+    @staticmethod
+    def claim_next(stale_after=None, retry_after=None):
+        """
+        Atomically move the oldest pending job (or a running job abandoned for longer than
+        stale_after, or a job failed for longer than retry_after with attempts left) to running
+        and return it. Returns None when there is nothing to do.
+        """
+        now = timezone.now()
+        candidates = AuctionResolutionJob.objects.filter(status='pending')
+        if stale_after is not None:
+            candidates = candidates | AuctionResolutionJob.objects.filter(
+                status='running', updated_at__lt=now - stale_after
+            )
+        if retry_after is not None:
+            # Erreur passagère sur le dernier round : plus personne ne soumettra pour relancer le job
+            candidates = candidates | AuctionResolutionJob.objects.filter(
+                status='failed', attempts__lt=AuctionResolutionJob.MAX_ATTEMPTS, updated_at__lt=now - retry_after
+            )
+        for job in candidates.order_by('updated_at')[:10]:
+            claimed = AuctionResolutionJob.objects.filter(pk=job.pk, status=job.status, updated_at=job.updated_at).update(
+                status='running', rerun=False, attempts=models.F('attempts') + 1, updated_at=timezone.now()
+            )
+            if claimed:
+                job.refresh_from_db()
+                return job
+        return None
+
+    def process(self):
+        """Check the round and resolve it when every team is ready."""
+        try:
+            resolution = LeagueAuction.check_and_resolve(self.league, self.round_number)
+        except Exception as exc:
+            self._finish('failed', last_error=repr(exc))
+            raise
+        if resolution is not None:
+            self._finish('done', resolved_at=timezone.now(), last_error='')
+        else:
+            self._finish('waiting', last_error='')
+        return resolution
+
+    def _finish(self, status, **fields):
+        if status != 'failed':
+            fields['attempts'] = 0
+        jobs = AuctionResolutionJob.objects.filter(pk=self.pk, status='running')
+        if status != 'done' and jobs.filter(rerun=True).update(status='pending', rerun=False, updated_at=timezone.now(), **fields):
+            self.status = 'pending'
+            return
+        jobs.update(status=status, updated_at=timezone.now(), **fields)
+        self.status = status
+
 class Stage(models.Model):
     """
     Represents a stage in a cycling competition (e.g., a stage of the Tour de France).
@@ -284,12 +947,76 @@ class Stage(models.Model):
     name = models.CharField(max_length=255)
     date = models.DateField()
     competition = models.ForeignKey('Competition', on_delete=models.CASCADE, related_name='stages')
+    # Verrouillage des sélections, précalculé depuis Competition.lock_time / timezone
+    lock_at = models.DateTimeField(null=True, blank=True, editable=False)
+    # Renseigné une seule fois par run_stage_locks quand le signal stage_locked a été envoyé
+    lock_processed_at = models.DateTimeField(null=True, blank=True, editable=False)
 
     MAX_RIDERS = 8  # Maximum number of riders a player can select for this stage
 
     def __str__(self):
         return f"{self.name} ({self.competition.name})"
 
+    def save(self, *args, **kwargs):
+        if self.set_lock_at(Stage.compute_lock_at(self.date, self.competition)) and kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = set(kwargs['update_fields']) | {'lock_at', 'lock_processed_at'}
+        super().save(*args, **kwargs)
+
+    def set_lock_at(self, lock_at):
+        """
+        Met à jour lock_at ; s'il change, stage_locked devra être renvoyé à la nouvelle heure
+        (lock_processed_at est remis à zéro). Renvoie True si lock_at a changé.
+        """
+        if self.lock_at == lock_at:
+            return False
+        self.lock_at = lock_at
+        self.lock_processed_at = None
+        return True
+
+    @staticmethod
+    def compute_lock_at(date, competition):
+        return datetime.combine(date, competition.lock_time, tzinfo=competition.zoneinfo())
+
+    @property
+    def is_locked(self):
+        lock_at = self.lock_at or Stage.compute_lock_at(self.date, self.competition)
+        return timezone.now() >= lock_at
+
+    @property
+    def local_lock_time(self):
+        """Heure de verrouillage dans le fuseau de la compétition (affichage)."""
+        return timezone.localtime(self.lock_at, self.competition.zoneinfo()).time() if self.lock_at else None
+
+    @staticmethod
+    def process_due_locks(now=None):
+        """
+        Send `stage_locked` for every stage whose lock time has passed. Each stage is claimed
+        with a conditional update, so concurrent runs never send it twice; if a receiver fails,
+        the claim is released and the next run sends the signal again (receivers must be
+        idempotent). Returns the stages whose receivers all succeeded.
+        """
+        now = now or timezone.now()
+        processed = []
+        due = Stage.objects.filter(lock_at__lte=now, lock_processed_at__isnull=True).select_related('competition')
+        for stage in due.order_by('lock_at'):
+            if not Stage.objects.filter(pk=stage.pk, lock_processed_at__isnull=True).update(lock_processed_at=now):
+                continue
+            failed = False
+            for receiver_func, response in stage_locked.send_robust(sender=Stage, stage=stage):
+                if isinstance(response, Exception):
+                    failed = True
+                    logger.error("stage_locked receiver %s failed for %s: %r", receiver_func, stage, response)
+            if failed:
+                Stage.objects.filter(pk=stage.pk, lock_processed_at=now).update(lock_processed_at=None)
+                continue
+            stage.lock_processed_at = now
+            processed.append(stage)
+        return processed
+
+# Envoyé une seule fois par étape à son heure de verrouillage (commande run_stage_locks),
+# pour précalculer ce qui ne change plus ensuite (sélections par défaut, peloton...)
+stage_locked = Signal()
+
 class BonusConfig(models.Model):
     """
     Configures a bonus for a competition. Admin can set how many times each bonus can be used per player.
@@ -312,6 +1039,17 @@ class Role(models.Model):
     def __str__(self):
         return self.label
 
+@dataclass
+class StageSelectionPage:
+    """Données d'une équipe pour la page de sélection d'étape (construites par StageSelection.page_data)."""
+    default_riders: list = field(default_factory=list)
+    default_roles: dict = field(default_factory=dict)
+    initial_riders: list = field(default_factory=list)
+    initial_roles: dict = field(default_factory=dict)
+    selected_bonuses: list = field(default_factory=list)
+    used_bonuses: dict = field(default_factory=dict)  # bonus_id -> [étapes]
+    used_counts: dict = field(default_factory=dict)  # bonus_id -> nombre utilisé
+
 class StageSelection(models.Model):
     """
     Stores a selection of riders for a given team (player) and stage.
@@ -326,9 +1064,170 @@ class StageSelection(models.Model):
     bonuses = models.ManyToManyField('BonusConfig', through='StageSelectionBonus', related_name='stage_selections', blank=True)
     # Plus de champ riders, leader, sprinteur, grimpeur ici
 
+    CONTEXT_VERSION_KEY = 'stage_selection_version:{team_id}'
+    CONTEXT_TIMEOUT = 60 * 60 * 24
+
     def __str__(self):
         return f"Selection for {self.team} on {self.stage} (validated={self.validated})"
 
+    @staticmethod
+    def context_version(team_id):
+        """Version of the team's selection data, replaced after each of its submissions."""
+        key = StageSelection.CONTEXT_VERSION_KEY.format(team_id=team_id)
+        version = cache.get(key)
+        if version is None:
+            version = uuid.uuid4().hex
+            cache.set(key, version, None)
+        return version
+
+    @staticmethod
+    def invalidate_context(team_id):
+        cache.delete(StageSelection.CONTEXT_VERSION_KEY.format(team_id=team_id))
+
+    @staticmethod
+    def page_data(team, stage, roles, bonuses, stages):
+        """
+        Selection data of the stage page for (team, stage). Only ids and counts are cached, until the
+        team's next submission; riders are read again on every render (one query) and roles, bonus
+        configs and stages come from the caller, so admin edits of any of them show up at once.
+        Cold cache: 3 more queries (default riders, riders of the current stage selection, bonuses
+        used by the validated selections or picked for this stage).
+        """
+        stage_id = stage.id if stage else None
+        key = f'stage_selection_page:{team.id}:{stage_id}:{StageSelection.context_version(team.id)}'
+        cached = cache.get(key)
+        if cached is None:
+            cached = StageSelection._build_page_data(team, stage_id)
+            cache.set(key, cached, StageSelection.CONTEXT_TIMEOUT)
+        return StageSelection._hydrate_page_data(cached, roles, bonuses, stages)
+
+    @staticmethod
+    def _build_page_data(team, stage_id):
+        """Plain (picklable) page data: [(cyclist_id, role_id)] lists, bonus and stage ids."""
+        latest_default = DefaultStageSelection.objects.filter(team=team).order_by('-created_at').values('id')[:1]
+        default_riders = list(
+            DefaultStageSelectionRider.objects.filter(default_selection=Subquery(latest_default))
+            .order_by('id').values_list('cyclist_id', 'role_id')
+        )
+        # Sélection affichée : la validée si elle existe, sinon la dernière soumise
+        current = StageSelection.objects.filter(team=team, stage_id=stage_id).order_by('-validated', '-submitted_at').values('id')[:1]
+        initial_riders = list(
+            StageSelectionRider.objects.filter(stage_selection=Subquery(current)).order_by('id').values_list('cyclist_id', 'role_id')
+        )
+        # Une seule requête pour les bonus déjà utilisés (sélections validées) et ceux de l'étape
+        selection_bonuses = StageSelectionBonus.objects.filter(
+            Q(stage_selection__team=team, stage_selection__validated=True) | Q(stage_selection=Subquery(current))
+        ).annotate(
+            is_current=Case(When(stage_selection=Subquery(current), then=Value(True)), default=Value(False))
+        ).order_by('id').values_list('bonus_id', 'count', 'stage_selection__stage_id', 'stage_selection__validated', 'is_current')
+        used_bonuses, used_counts, selected_bonuses = {}, {}, []
+        for bonus_id, count, selection_stage_id, validated, is_current in selection_bonuses:
+            if validated:
+                used_bonuses.setdefault(bonus_id, []).append(selection_stage_id)
+                used_counts[bonus_id] = used_counts.get(bonus_id, 0) + count
+            if is_current:
+                selected_bonuses.append((bonus_id, count))
+        return {
+            'default_riders': default_riders,
+            'initial_riders': initial_riders,
+            'selected_bonuses': selected_bonuses,
+            'used_bonuses': used_bonuses,
+            'used_counts': used_counts,
+        }
+
+    @staticmethod
+    def _hydrate_page_data(cached, roles, bonuses, stages):
+        rider_ids = {cyclist_id for cyclist_id, _ in cached['default_riders'] + cached['initial_riders']}
+        riders = Cyclist.objects.in_bulk(rider_ids) if rider_ids else {}
+        role_order = {role.id: role.order for role in roles}
+        bonuses_by_id = {bonus.id: bonus for bonus in bonuses}
+        stages_by_id = {stage.id: stage for stage in stages}
+        data = StageSelectionPage(used_counts=cached['used_counts'])
+        data.default_riders, data.default_roles = StageSelection._riders_by_role(cached['default_riders'], riders, role_order)
+        data.initial_riders, data.initial_roles = StageSelection._riders_by_role(cached['initial_riders'], riders, role_order)
+        data.used_bonuses = {
+            bonus_id: [stages_by_id[stage_id] for stage_id in stage_ids if stage_id in stages_by_id]
+            for bonus_id, stage_ids in cached['used_bonuses'].items()
+        }
+        data.selected_bonuses = [
+            StageSelectionBonus(bonus=bonuses_by_id[bonus_id], count=count)
+            for bonus_id, count in cached['selected_bonuses'] if bonus_id in bonuses_by_id
+        ]
+        return data
+
+    @staticmethod
+    def _riders_by_role(selection_riders, riders, role_order):
+        """(riders sorted by role order, {cyclist_id: role_id or ''}) ; les coureurs supprimés sont ignorés."""
+        selection_riders = [(cyclist_id, role_id) for cyclist_id, role_id in selection_riders if cyclist_id in riders]
+        roles = {cyclist_id: role_id or '' for cyclist_id, role_id in selection_riders}
+        ordered = sorted(selection_riders, key=lambda entry: role_order.get(entry[1], 999))
+        return [riders[cyclist_id] for cyclist_id, _ in ordered], roles
+
+    @staticmethod
+    def missing_stage_ids(team, stage_ids):
+        """Stages of stage_ids without a validated selection for the team (one query)."""
+        validated = set(
+            StageSelection.objects.filter(team=team, stage_id__in=stage_ids, validated=True).values_list('stage_id', flat=True)
+        )
+        return [stage_id for stage_id in stage_ids if stage_id not in validated]
+
+    @staticmethod
+    def apply_defaults(stage):
+        """
+        Validate the default selection of every team of the stage's competition that has no
+        validated selection for it. One query finds those teams with their default riders, then
+        everything is written by bulk_validate; the stage row is locked for the duration, so a
+        second (or concurrent) run finds nothing left to do. Returns the number of selections created.
+        """
+        with transaction.atomic():
+            Stage.objects.select_for_update().filter(pk=stage.pk).first()
+            missing_teams = Team.objects.filter(league__competition_id=stage.competition_id).exclude(
+                id__in=StageSelection.objects.filter(stage=stage, validated=True).values('team_id')
+            ).values('id')
+            defaults = DefaultStageSelection.riders_by_team(missing_teams)
+            selections = StageSelection.bulk_validate([
+                (team_id, stage.id, riders, []) for team_id, riders in defaults.items()
+            ], replace=False)
+        return len(selections)
+
+    @staticmethod
+    def bulk_validate(entries, replace=True):
+        """
+        Write one validated selection per entry (team_id, stage_id, [(cyclist_id, role_id), ...], [bonus_id, ...])
+        in a single transaction: selections, riders and bonuses each go through one bulk_create.
+        With replace=True, the previous validated selections of those (team, stage) are kept as
+        history with validated=False (one update per team). Returns the created selections.
+        """
+        entries = list(entries)
+        if not entries:
+            return []
+        team_ids = {team_id for team_id, _, _, _ in entries}
+        with transaction.atomic():
+            if replace:
+                stages_by_team = defaultdict(set)
+                for team_id, stage_id, _, _ in entries:
+                    stages_by_team[team_id].add(stage_id)
+                for team_id, stage_ids in stages_by_team.items():
+                    StageSelection.objects.filter(team_id=team_id, stage_id__in=stage_ids, validated=True).update(validated=False)
+            selections = StageSelection.objects.bulk_create([
+                StageSelection(team_id=team_id, stage_id=stage_id, validated=True)
+                for team_id, stage_id, _, _ in entries
+            ], batch_size=1000)
+            StageSelectionRider.objects.bulk_create([
+                StageSelectionRider(stage_selection=selection, cyclist_id=cyclist_id, role_id=role_id)
+                for selection, (_, _, riders, _) in zip(selections, entries)
+                for cyclist_id, role_id in riders
+            ], batch_size=1000)
+            StageSelectionBonus.objects.bulk_create([
+                StageSelectionBonus(stage_selection=selection, bonus_id=bonus_id, count=1)
+                for selection, (_, _, _, bonus_ids) in zip(selections, entries)
+                for bonus_id in bonus_ids
+            ], batch_size=1000)
+            # bulk_create n'envoie pas post_save : invalide le contexte des équipes au commit
+            version_keys = [StageSelection.CONTEXT_VERSION_KEY.format(team_id=team_id) for team_id in team_ids]
+            transaction.on_commit(lambda: cache.delete_many(version_keys))
+        return selections
+
 class StageSelectionRider(models.Model):
     """
     Associates a cyclist and a role to a StageSelection (i.e., a rider's role for a given stage selection).
@@ -375,6 +1274,24 @@ class DefaultStageSelection(models.Model):
     def __str__(self):
         return f"Default selection for {self.team}" 
 
+    @staticmethod
+    def riders_by_team(team_ids):
+        """
+        {team_id: [(cyclist_id, role_id), ...]} from the latest default selection of each team
+        (one query; team_ids may be a list or an id queryset, used as a subquery).
+        """
+        rows = (
+            DefaultStageSelectionRider.objects.filter(default_selection__team_id__in=team_ids)
+            .order_by('default_selection__team_id', '-default_selection__created_at', '-default_selection_id', 'id')
+            .values_list('default_selection__team_id', 'default_selection_id', 'cyclist_id', 'role_id')
+        )
+        latest = {}
+        riders = defaultdict(list)
+        for team_id, default_id, cyclist_id, role_id in rows:
+            if latest.setdefault(team_id, default_id) == default_id:
+                riders[team_id].append((cyclist_id, role_id))
+        return dict(riders)
+
 class DefaultStageSelectionRider(models.Model):
     default_selection = models.ForeignKey(DefaultStageSelection, on_delete=models.CASCADE, related_name='riders')
     cyclist = models.ForeignKey('Cyclist', on_delete=models.CASCADE)
@@ -386,6 +1303,36 @@ class DefaultStageSelectionRider(models.Model):
     def __str__(self):
         return f"{self.cyclist} as {self.role} in {self.default_selection}"
 
+@receiver(stage_locked)
+def apply_default_selections_at_lock(sender, stage, **kwargs):
+    # Les équipes sans sélection validée jouent l'étape avec leur sélection par défaut
+    created = StageSelection.apply_defaults(stage)
+    logger.info("%s: %s default selection(s) applied at lock", stage, created)
+
+@receiver([post_save, post_delete], sender=StageSelection)
+@receiver([post_save, post_delete], sender=DefaultStageSelection)
+def invalidate_stage_selection_context(sender, instance, **kwargs):
+    # Après le commit : les coureurs et bonus sont écrits dans la même transaction que la sélection
+    team_id = instance.team_id
+    transaction.on_commit(lambda: StageSelection.invalidate_context(team_id))
+
+@receiver([post_save, post_delete], sender=StageSelectionRider)
+@receiver([post_save, post_delete], sender=StageSelectionBonus)
+@receiver([post_save, post_delete], sender=DefaultStageSelectionRider)
+def invalidate_stage_selection_context_for_row(sender, instance, **kwargs):
+    # Ajouts et suppressions depuis l'admin ; les écritures de la page passent par bulk_create et
+    # la suppression d'une sélection entière est traitée par le receiver ci-dessus
+    origin = kwargs.get('origin', instance)
+    if getattr(origin, 'model', type(origin)) is not sender:
+        return
+    if sender is DefaultStageSelectionRider:
+        parent_model, parent_id = DefaultStageSelection, instance.default_selection_id
+    else:
+        parent_model, parent_id = StageSelection, instance.stage_selection_id
+    team_id = parent_model.objects.filter(pk=parent_id).values_list('team_id', flat=True).first()
+    if team_id is not None:
+        transaction.on_commit(lambda: StageSelection.invalidate_context(team_id))
+
 class Resultat(models.Model):
     stage = models.ForeignKey('Stage', on_delete=models.CASCADE, related_name='resultats')
     insert_batch_id = models.UUIDField(default=uuid.uuid4, editable=False)
@@ -686,3 +1633,58 @@ class TeamTodayResult(models.Model):
 
     def __str__(self):
         return f"Team Today - {self.team} ({self.stage.name})"
+
+class ResultBatch(models.Model):
+    """
+    Lot de résultats actif pour une étape et un classement (kind, voir results_import),
+    avec l'empreinte SHA-256 de la page importée et le nombre de classements qu'elle a écrits :
+    réimporter une page dont tous les classements sont encore actifs ne fait rien, une page
+    modifiée remplace le lot précédent de chacun de ses classements dans la même transaction.
+    """
+    stage = models.ForeignKey('Stage', on_delete=models.CASCADE, related_name='result_batches')
+    kind = models.CharField(max_length=30)
+    batch_id = models.UUIDField()
+    content_hash = models.CharField(max_length=64)
+    # Nombre de classements écrits par la page d'empreinte content_hash
+    page_kind_count = models.PositiveSmallIntegerField(default=0)
+    row_count = models.PositiveIntegerField(default=0)
+    imported_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('stage', 'kind')
+        indexes = [models.Index(fields=['stage', 'content_hash'], name='resultbatch_hash_idx')]
+
+    def __str__(self):
+        return f"{self.kind} of {self.stage.name}: {self.batch_id}"
+
+    @staticmethod
+    def is_loaded(stage, content_hash):
+        """
+        True si chaque classement écrit par la page est encore actif avec son empreinte : une
+        page dont une partie des classements a été remplacée par une autre page doit être réimportée.
+        """
+        counts = list(
+            ResultBatch.objects.filter(stage=stage, content_hash=content_hash).values_list('page_kind_count', flat=True)
+        )
+        return bool(counts) and len(counts) == counts[0]
+
+    @staticmethod
+    def activate(stage, kind, model, batch_id, content_hash, row_count, page_kind_count):
+        """
+        Make batch_id the active batch of (stage, kind) and delete the rows of the batch it
+        replaces. Without a previous batch (first import since batches exist), the rows of the
+        stage left by older imports are deleted instead. Call inside the import transaction.
+        """
+        previous = ResultBatch.objects.filter(stage=stage, kind=kind).values_list('batch_id', flat=True).first()
+        rows = model.objects.filter(stage=stage)
+        if previous is not None:
+            rows.filter(insert_batch_id=previous).delete()
+        else:
+            rows.exclude(insert_batch_id=batch_id).delete()
+        ResultBatch.objects.update_or_create(
+            stage=stage, kind=kind,
+            defaults={
+                'batch_id': batch_id, 'content_hash': content_hash,
+                'row_count': row_count, 'page_kind_count': page_kind_count,
+            },
+        )
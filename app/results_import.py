@@ -0,0 +1,176 @@
+"""
+Import des résultats d'étape (pages HTML de classements, CSV) : l'analyse (voir
+results_parser) produit les lignes table par table, sans toucher à la base, et chaque table
+est écrite par bulk_create dès qu'elle est complète, dans une seule transaction. Le fichier
+envoyé est lu par morceaux, sans être chargé en entier en mémoire. Son empreinte SHA-256
+rend l'import idempotent : chaque classement d'une étape n'a qu'un lot actif (ResultBatch).
+
+Partagé par les imports de l'admin des résultats.
+"""
+import csv
+import hashlib
+import time
+from dataclasses import dataclass, field
+from io import TextIOWrapper
+
+from django.db import transaction
+
+from .results_parser import iter_html_tables
+from .models import (
+    GeneralTimeResult, KOMGeneralResult, KOMTodayResult, PointsGeneralResult, PointsTodayResult, Resultat,
+    ResultBatch, Stage, StageGeneralResult, TeamGeneralResult, TeamTodayResult, YouthGeneralResult, YouthTodayResult,
+)
+
+# Type de classement -> modèle, dans l'ordre d'écriture
+RESULT_MODELS = {
+    'stage_general': StageGeneralResult,
+    'general_time': GeneralTimeResult,
+    'points_general': PointsGeneralResult,
+    'points_today': PointsTodayResult,
+    'kom_general': KOMGeneralResult,
+    'kom_today': KOMTodayResult,
+    'youth_general': YouthGeneralResult,
+    'youth_today': YouthTodayResult,
+    'team_general': TeamGeneralResult,
+    'team_today': TeamTodayResult,
+}
+RESULT_MODELS['resultat'] = Resultat
+
+BATCH_SIZE = 500
+
+
+@dataclass
+class ImportReport:
+    """Nombre de lignes écrites par classement, et durées d'analyse et d'écriture."""
+    counts: dict = field(default_factory=dict)
+    parse_ms: float = 0.0
+    write_ms: float = 0.0
+    content_hash: str = ''
+    skipped: bool = False  # page déjà importée pour l'étape
+
+    @property
+    def rows(self):
+        return sum(self.counts.values())
+
+    @property
+    def rows_per_second(self):
+        return self.rows / (self.write_ms / 1000) if self.write_ms else 0.0
+
+    def summary(self):
+        if self.skipped:
+            return f"already imported (sha256 {self.content_hash[:12]}), nothing changed"
+        return (
+            f"{self.rows} rows parsed in {self.parse_ms:.0f} ms, written in {self.write_ms:.0f} ms "
+            f"({self.rows_per_second:,.0f} rows/s)"
+        )
+
+
+def write_results(stage, tables, insert_batch_id, batch_size=BATCH_SIZE, content_hash=None):
+    """
+    Écrit pour l'étape les tables (type de classement, [lignes]) au fil de leur arrivée, un
+    bulk_create par table (par lots de batch_size), le tout dans une seule transaction.
+    `tables` peut être un itérable paresseux (analyse incrémentale) ou un dict {type: [lignes]}.
+    Avec content_hash, chaque classement écrit devient le lot actif de l'étape (ResultBatch),
+    ce qui supprime ses lignes précédentes dans la même transaction.
+    Renvoie un ImportReport ; le temps passé hors écriture est compté comme temps d'analyse.
+    """
+    if isinstance(tables, dict):
+        tables = tables.items()
+    report = ImportReport()
+    start = time.perf_counter()
+    with transaction.atomic():
+        for kind, rows in tables:
+            write_start = time.perf_counter()
+            model = RESULT_MODELS[kind]
+            model.objects.bulk_create(
+                [model(stage=stage, insert_batch_id=insert_batch_id, **row) for row in rows],
+                batch_size=batch_size,
+            )
+            report.counts[kind] = report.counts.get(kind, 0) + len(rows)
+            report.write_ms += (time.perf_counter() - write_start) * 1000
+        if content_hash:
+            write_start = time.perf_counter()
+            # Un classement absent de la page (ou vide) garde son lot actuel
+            written = {kind: count for kind, count in report.counts.items() if count}
+            for kind, count in written.items():
+                ResultBatch.activate(stage, kind, RESULT_MODELS[kind], insert_batch_id, content_hash, count, len(written))
+            report.content_hash = content_hash
+            report.write_ms += (time.perf_counter() - write_start) * 1000
+    report.parse_ms = (time.perf_counter() - start) * 1000 - report.write_ms
+    return report
+
+
+def file_chunks(source):
+    """Morceaux d'octets d'un contenu str/bytes ou d'un fichier Django (upload, File) ; relisible."""
+    if isinstance(source, str):
+        return [source.encode('utf-8')]
+    if isinstance(source, bytes):
+        return [source]
+    # File.chunks() repart du début du fichier à chaque appel
+    return source.chunks()
+
+
+def content_hash(source):
+    """Empreinte SHA-256 du contenu, calculée morceau par morceau."""
+    digest = hashlib.sha256()
+    for chunk in file_chunks(source):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def import_html_results(source, stage, insert_batch_id, parser=None):
+    """
+    Importe une page de classements : `source` est le HTML (str ou bytes) ou le fichier envoyé,
+    analysé de façon incrémentale et écrit table par table. Une page déjà importée pour
+    l'étape (même empreinte) est ignorée ; sinon chaque classement remplace le lot précédent.
+    """
+    return _import_batch(stage, content_hash(source), insert_batch_id, lambda: iter_html_tables(file_chunks(source), parser))
+
+
+def import_csv_results(upload, stage, insert_batch_id, batch_size=BATCH_SIZE):
+    """Importe un CSV de résultats (colonnes Rnk, GC, Timelag, BIB, ...) dans Resultat, lu par lots."""
+    def tables():
+        upload.seek(0)
+        return _csv_batches(TextIOWrapper(upload.file, encoding='utf-8'), batch_size)
+    return _import_batch(stage, content_hash(upload), insert_batch_id, tables, batch_size)
+
+
+def import_parsed_results(stage, digest, tables, insert_batch_id):
+    """
+    Écrit des classements déjà analysés ({type: [lignes]}, par ex. dans un autre processus)
+    pour la page d'empreinte `digest`, avec la même idempotence que les imports de l'admin.
+    """
+    return _import_batch(stage, digest, insert_batch_id, lambda: tables)
+
+
+def _import_batch(stage, digest, insert_batch_id, tables, batch_size=BATCH_SIZE):
+    with transaction.atomic():
+        # Sérialise les imports d'une même étape, pour que le test d'empreinte reste valable
+        Stage.objects.select_for_update().filter(pk=stage.pk).first()
+        if ResultBatch.is_loaded(stage, digest):
+            return ImportReport(skipped=True, content_hash=digest)
+        return write_results(stage, tables(), insert_batch_id, batch_size, content_hash=digest)
+
+
+def _csv_batches(stream, batch_size):
+    batch = []
+    for row in csv.DictReader(stream):
+        batch.append({
+            'rnk': row.get('Rnk'),
+            'gc': row.get('GC'),
+            'timelag': row.get('Timelag'),
+            'bib': row.get('BIB'),
+            'h2h': row.get('H2H'),
+            'specialty': row.get('Specialty'),
+            'rider': row.get('Rider'),
+            'age': row.get('Age'),
+            'team': row.get('Team'),
+            'uci': row.get('UCI'),
+            'pnt': row.get('Pnt'),
+            'time': row.get('Time'),
+        })
+        if len(batch) >= batch_size:
+            yield 'resultat', batch
+            batch = []
+    if batch:
+        yield 'resultat', batch
@@ -0,0 +1,395 @@
+"""
+Analyse des pages de classements (blocs `div.resTab`) en lignes prêtes pour l'import.
+
+Deux moteurs produisent exactement les mêmes lignes :
+- `lxml` (analyse incrémentale en C), utilisé par défaut quand lxml est installé ;
+- `bs4` (BeautifulSoup + html.parser), conservé en repli.
+
+Chaque resTab est parcourue une fois pour repérer sa navigation, ses blocs general/today et
+leurs tables ; le type de classement est déduit de ce relevé (`classify`, commun aux deux
+moteurs) puis les tables sont extraites sans nouvelle recherche.
+"""
+import time
+from dataclasses import dataclass, field
+
+from bs4 import BeautifulSoup
+
+try:
+    from lxml import etree
+except ImportError:  # lxml absent : repli sur BeautifulSoup
+    etree = None
+
+# Types de classement produits, dans l'ordre d'écriture
+KINDS = [
+    'stage_general', 'general_time', 'points_general', 'points_today', 'kom_general',
+    'kom_today', 'youth_general', 'youth_today', 'team_general', 'team_today',
+]
+
+
+@dataclass
+class TabSummary:
+    """Relevé d'une resTab : ce qu'il faut pour la classer et extraire ses tables."""
+    button_texts: list = None  # None sans ul.buttonNav
+    general_table: object = None
+    general_headers: list = field(default_factory=list)
+    today_div: object = None
+    today_h4_texts: list = field(default_factory=list)
+
+
+def classify(summary):
+    """Type de classement d'une resTab (stage_general, general_time, points, kom, youth ou team)."""
+    headers = summary.general_headers
+    button_texts = summary.button_texts or []
+    if 'general' in button_texts and 'today' in button_texts:
+        # KOM/Sprints : des h4 "KOM" ou "Sprint" dans le bloc today
+        if any('kom' in text or 'sprint' in text for text in summary.today_h4_texts):
+            return 'kom'
+        if any('youth' in text for text in button_texts):
+            return 'youth'
+        # Pas de colonnes rider/bib : classement par équipes
+        if summary.general_table is not None and 'ridername' not in headers and 'bib' not in headers:
+            return 'team'
+        return 'points'
+
+    # Sans boutons, la structure de la première table décide
+    if summary.general_table is not None:
+        if 'gc' in headers and 'gc_timelag' in headers and 'uci_pnt' in headers:
+            return 'stage_general'
+        if 'time_wonlost' in headers:
+            return 'general_time'
+        if 'ridername' not in headers and 'bib' not in headers:
+            return 'team'
+        if any('youth' in text for text in summary.today_h4_texts):
+            return 'youth'
+    return 'stage_general'
+
+
+class ResultsParser:
+    """Squelette commun : les moteurs fournissent l'arbre, le relevé des resTab et les cellules."""
+    name = None
+
+    def parse(self, html_content):
+        """{type de classement: [lignes]} pour toute la page."""
+        parsed = {kind: [] for kind in KINDS}
+        for kind, rows in self.iter_tables([html_content]):
+            parsed[kind] += rows
+        return parsed
+
+    def iter_tables(self, chunks):
+        """(type de classement, [lignes]) de chaque table, à partir du contenu découpé en morceaux."""
+        html_content = ''.join(chunk.decode('utf-8') if isinstance(chunk, bytes) else chunk for chunk in chunks)
+        for res_tab in self.res_tabs(html_content):
+            yield from self.tab_tables(res_tab)
+
+    def tab_tables(self, res_tab):
+        summary = self.scan(res_tab)
+        table_type = classify(summary)
+        if table_type in ('stage_general', 'general_time'):
+            if summary.general_table is not None:
+                yield table_type, self.table_rows(summary.general_table, summary.general_headers, table_type)
+        elif table_type == 'kom':
+            if summary.general_table is not None:
+                yield 'kom_general', self.table_rows(summary.general_table, summary.general_headers, 'kom_general')
+            if summary.today_div is not None:
+                # KOM Today peut avoir plusieurs sous-tables, nommées par le h4 qui les précède
+                for table, kom_type in self.kom_tables(summary.today_div):
+                    yield 'kom_today', self.table_rows(table, self.headers(table), 'kom_today', kom_type=kom_type)
+        else:
+            if summary.general_table is not None:
+                yield f'{table_type}_general', self.table_rows(
+                    summary.general_table, summary.general_headers, f'{table_type}_general',
+                )
+            today_table = self.first_table(summary.today_div)
+            if today_table is not None:
+                yield f'{table_type}_today', self.table_rows(today_table, self.headers(today_table), f'{table_type}_today')
+
+    def table_rows(self, table, headers, kind, **extra):
+        build = ROW_BUILDERS[kind]
+        rows = []
+        for cells in self.rows(table):
+            if len(cells) >= len(headers):
+                data = {header: cells.text(i) for i, header in enumerate(headers)}
+                row = build(data, cells)
+                row.update(extra)
+                rows.append(row)
+        return rows
+
+
+class SoupCells:
+    def __init__(self, tds):
+        self.tds = tds
+
+    def __len__(self):
+        return len(self.tds)
+
+    def text(self, index):
+        return self.tds[index].get_text(strip=True)
+
+    def link_or_text(self, index):
+        """Texte du premier lien de la cellule (coureur, équipe), sinon de la cellule."""
+        if index >= len(self.tds):
+            return None
+        link = self.tds[index].find('a')
+        return link.get_text(strip=True) if link else self.text(index)
+
+    def span_or_text(self, index):
+        """Texte du span.fs10 de la cellule (spécialité), sinon de la cellule."""
+        if index >= len(self.tds):
+            return None
+        span = self.tds[index].find('span', class_='fs10')
+        return span.get_text(strip=True) if span else self.text(index)
+
+
+class SoupResultsParser(ResultsParser):
+    name = 'bs4'
+
+    def res_tabs(self, html_content):
+        return BeautifulSoup(html_content, "html.parser").find_all('div', class_='resTab')
+
+    def scan(self, res_tab):
+        summary = TabSummary()
+        button_nav = res_tab.find('ul', class_='buttonNav')
+        if button_nav:
+            summary.button_texts = [a.get_text(strip=True).lower() for a in button_nav.find_all('a')]
+        general_div = res_tab.find('div', class_='general')
+        summary.general_table = general_div.find('table') if general_div else None
+        if summary.general_table is not None:
+            summary.general_headers = self.headers(summary.general_table)
+        today_div = res_tab.find('div', class_='today')
+        if today_div:
+            summary.today_div = today_div
+            summary.today_h4_texts = [h4.get_text().lower() for h4 in today_div.find_all('h4')]
+        return summary
+
+    def headers(self, table):
+        return [th.get('data-code') for th in table.find('thead').find_all('th')]
+
+    def first_table(self, div):
+        return div.find('table') if div is not None else None
+
+    def kom_tables(self, today_div):
+        for table in today_div.find_all('table'):
+            h4_before = table.find_previous_sibling('h4')
+            yield table, h4_before.get_text() if h4_before else "KOM Sprint"
+
+    def rows(self, table):
+        for tr in table.find('tbody').find_all('tr'):
+            yield SoupCells(tr.find_all('td'))
+
+
+def _lxml_text(element):
+    """Équivalent de get_text(strip=True) de BeautifulSoup."""
+    return ''.join(text.strip() for text in element.itertext())
+
+
+def _has_class(element, css_class):
+    return css_class in (element.get('class') or '').split()
+
+
+class LxmlCells(SoupCells):
+    def text(self, index):
+        return _lxml_text(self.tds[index])
+
+    def link_or_text(self, index):
+        if index >= len(self.tds):
+            return None
+        link = next(self.tds[index].iterdescendants('a'), None)
+        return _lxml_text(link) if link is not None else self.text(index)
+
+    def span_or_text(self, index):
+        if index >= len(self.tds):
+            return None
+        for span in self.tds[index].iterdescendants('span'):
+            if _has_class(span, 'fs10'):
+                return _lxml_text(span)
+        return self.text(index)
+
+
+class LxmlResultsParser(ResultsParser):
+    name = 'lxml'
+
+    def iter_tables(self, chunks):
+        """
+        Analyse incrémentale : les morceaux sont donnés au fur et à mesure à un HTMLPullParser,
+        chaque resTab est extraite dès sa balise fermante puis libérée avec ce qui la précède,
+        si bien que la mémoire ne dépend pas de la taille de la page.
+        """
+        pull_parser = etree.HTMLPullParser(events=('end',), tag='div', encoding='utf-8')
+        for chunk in chunks:
+            pull_parser.feed(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+            yield from self._completed_tabs(pull_parser)
+        pull_parser.close()
+        yield from self._completed_tabs(pull_parser)
+
+    def _completed_tabs(self, pull_parser):
+        for _, element in pull_parser.read_events():
+            if not _has_class(element, 'resTab'):
+                continue
+            # get_text() de BeautifulSoup ignore le contenu des scripts et styles
+            etree.strip_elements(element, 'script', 'style', with_tail=False)
+            yield from self.tab_tables(element)
+            element.clear(keep_tail=True)
+            parent = element.getparent()
+            while parent is not None and element.getprevious() is not None:
+                del parent[0]
+
+    def scan(self, res_tab):
+        summary = TabSummary()
+        general_div = None
+        # Un seul passage sur les ul/div de la resTab pour trouver la navigation et les blocs
+        for element in res_tab.iterdescendants('ul', 'div'):
+            if element.tag == 'ul':
+                if summary.button_texts is None and _has_class(element, 'buttonNav'):
+                    summary.button_texts = [_lxml_text(a).lower() for a in element.iterdescendants('a')]
+            elif general_div is None and _has_class(element, 'general'):
+                general_div = element
+            elif summary.today_div is None and _has_class(element, 'today'):
+                summary.today_div = element
+        summary.general_table = self.first_table(general_div)
+        if summary.general_table is not None:
+            summary.general_headers = self.headers(summary.general_table)
+        if summary.today_div is not None:
+            summary.today_h4_texts = [''.join(h4.itertext()).lower() for h4 in summary.today_div.iterdescendants('h4')]
+        return summary
+
+    def headers(self, table):
+        thead = next(table.iterdescendants('thead'))
+        return [th.get('data-code') for th in thead.iterdescendants('th')]
+
+    def first_table(self, div):
+        return next(div.iterdescendants('table'), None) if div is not None else None
+
+    def kom_tables(self, today_div):
+        for table in today_div.iterdescendants('table'):
+            h4_before = next(table.itersiblings('h4', preceding=True), None)
+            yield table, ''.join(h4_before.itertext()) if h4_before is not None else "KOM Sprint"
+
+    def rows(self, table):
+        tbody = next(table.iterdescendants('tbody'))
+        for tr in tbody.iterdescendants('tr'):
+            yield LxmlCells(list(tr.iterdescendants('td')))
+
+
+PARSERS = {'lxml': LxmlResultsParser, 'bs4': SoupResultsParser}
+DEFAULT_PARSER = 'lxml' if etree is not None else 'bs4'
+
+
+def get_parser(name=None):
+    name = name or DEFAULT_PARSER
+    if name == 'lxml' and etree is None:
+        raise ValueError("The lxml results parser needs the lxml package.")
+    return PARSERS[name]()
+
+
+def parse_html_results(html_content, parser=None):
+    """
+    Parse le contenu HTML et renvoie les lignes de chaque classement : {type: [lignes]}.
+    `parser` choisit le moteur ('lxml' ou 'bs4', lxml par défaut s'il est installé).
+    """
+    return get_parser(parser).parse(html_content)
+
+
+def parse_results_page(name, data, parser=None):
+    """
+    Analyse d'une page enregistrée (octets UTF-8) dans un processus de travail : renvoie
+    (nom, {type: [lignes]}, durée en ms). Ne touche pas à la base, ce qui permet de l'exécuter
+    dans un ProcessPoolExecutor sans connexion Django.
+    """
+    start = time.perf_counter()
+    tables = get_parser(parser).parse(data.decode('utf-8'))
+    return name, tables, (time.perf_counter() - start) * 1000
+
+
+def iter_html_tables(chunks, parser=None):
+    """(type de classement, [lignes]) table par table, depuis un contenu en morceaux (upload.chunks())."""
+    return get_parser(parser).iter_tables(chunks)
+
+
+def safe_int(value):
+    """Convertit une valeur en entier de manière sécurisée."""
+    if not value or value == '' or value == ',,':
+        return None
+    try:
+        return int(value)
+    except (ValueError, TypeError):
+        return None
+
+
+def safe_bool(value):
+    """Convertit une valeur en booléen de manière sécurisée."""
+    if not value or value == '' or value == ',,':
+        return None
+    return bool(value)
+
+
+def _rider_fields(data, cells, specialty=3, rider=5, team=6):
+    """Colonnes communes des classements individuels."""
+    return {
+        'rnk': safe_int(data.get('rnk')),
+        'bib': safe_int(data.get('bib')),
+        'h2h': safe_bool(data.get('h2h')),
+        'specialty': cells.span_or_text(specialty),
+        'age': safe_int(data.get('age')),
+        'rider': cells.link_or_text(rider),
+        'team': cells.link_or_text(team),
+    }
+
+
+def stage_general_row(data, cells):
+    row = _rider_fields(data, cells, specialty=5, rider=7, team=8)
+    row.update(
+        gc=data.get('gc'), timelag=data.get('gc_timelag'), uci=data.get('uci_pnt'),
+        pnt=data.get('pnt'), bonis=data.get('bonis'), time=data.get('time'),
+    )
+    return row
+
+
+def general_time_row(data, cells):
+    row = _rider_fields(data, cells)
+    row.update(
+        uci=data.get('uci_pnt'), bonis=data.get('gc_bonis'),
+        time=data.get('time'), time_wonlost=data.get('time_wonlost'),
+    )
+    return row
+
+
+def points_general_row(data, cells):
+    # Classements à points (points, KOM) - General : total dans la colonne pnt2
+    row = _rider_fields(data, cells)
+    row.update(pnt=safe_int(data.get('pnt2')), today=data.get('delta_pnt'))
+    return row
+
+
+def points_today_row(data, cells):
+    row = _rider_fields(data, cells)
+    row.update(pnt=safe_int(data.get('pnt')), today=data.get('delta_pnt'))
+    return row
+
+
+def youth_row(data, cells):
+    row = _rider_fields(data, cells)
+    row.update(time=data.get('time'), time_wonlost=data.get('time_wonlost'))
+    return row
+
+
+def team_row(data, cells):
+    return {
+        'rnk': safe_int(data.get('rnk')),
+        'team': cells.link_or_text(1),
+        'time': data.get('time'),
+        'time_wonlost': data.get('time_wonlost'),
+    }
+
+
+ROW_BUILDERS = {
+    'stage_general': stage_general_row,
+    'general_time': general_time_row,
+    'points_general': points_general_row,
+    'points_today': points_today_row,
+    'kom_general': points_general_row,
+    'kom_today': points_today_row,
+    'youth_general': youth_row,
+    'youth_today': youth_row,
+    'team_general': team_row,
+    'team_today': team_row,
+}
@@ -0,0 +1,187 @@
+"""
+Import et export en masse des effectifs d'une ligue (joueur, coureur, équipe du coureur, prix),
+en CSV ou JSON. Le nom d'un coureur n'étant pas unique, l'équipe du coureur départage les homonymes.
+
+Partagé par la commande `league_rosters` et les actions de l'admin des ligues.
+"""
+import csv
+import json
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from .models import AuctionSnapshot, BUDGET, Cyclist, LeagueAssignment, TEAM_SIZE, Team, TeamCyclist
+
+User = get_user_model()
+
+FIELDS = ['player', 'rider', 'team', 'price']
+FORMATS = ('csv', 'json')
+
+
+class RosterImportError(Exception):
+    """Import refusé : `errors` liste tous les problèmes trouvés en une passe."""
+
+    def __init__(self, errors):
+        super().__init__(f"{len(errors)} error(s) in roster import")
+        self.errors = errors
+
+
+def format_from_name(filename, default='csv'):
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    return extension if extension in FORMATS else default
+
+
+def export_rows(league):
+    """Lignes {player, rider, team, price} de la ligue, lues par lots."""
+    roster = (
+        TeamCyclist.objects.filter(league=league)
+        .order_by('team__player__username', '-price', 'cyclist__name')
+        .values_list('team__player__username', 'cyclist__name', 'cyclist__team', 'price')
+    )
+    for player, rider, team, price in roster.iterator(chunk_size=500):
+        yield {'player': player, 'rider': rider, 'team': team, 'price': price}
+
+
+def export_chunks(league, fmt='csv'):
+    """Export de la ligue par morceaux de texte (pour StreamingHttpResponse ou un fichier)."""
+    if fmt == 'json':
+        yield '['
+        for index, row in enumerate(export_rows(league)):
+            yield (',\n' if index else '\n') + json.dumps(row, ensure_ascii=False)
+        yield '\n]\n'
+        return
+    buffer = _LineBuffer()
+    writer = csv.DictWriter(buffer, fieldnames=FIELDS)
+    writer.writeheader()
+    yield buffer.pop()
+    for row in export_rows(league):
+        writer.writerow(row)
+        yield buffer.pop()
+
+
+class _LineBuffer:
+    def __init__(self):
+        self.lines = []
+
+    def write(self, line):
+        self.lines.append(line)
+
+    def pop(self):
+        text = ''.join(self.lines)
+        self.lines = []
+        return text
+
+
+def read_rows(stream, fmt='csv'):
+    """Lit les lignes {player, rider, team, price} d'un flux texte CSV ou JSON (team facultatif)."""
+    if fmt == 'json':
+        data = json.load(stream)
+        if not isinstance(data, list):
+            raise RosterImportError(["JSON roster must be a list of {player, rider, team, price} objects."])
+        return data
+    return csv.DictReader(stream)
+
+
+def import_rosters(league, rows, replace=False, dry_run=False):
+    """
+    Valide toutes les lignes en une passe (joueurs, coureurs, homonymes, doublons, prix minimum,
+    budget entièrement dépensé et règle des 12 coureurs par équipe importée, comme Team.is_complete)
+    puis écrit les effectifs avec bulk_create.
+    Avec replace=True, les effectifs des équipes importées sont remplacés. Renvoie le nombre de
+    coureurs importés par joueur ; lève RosterImportError avec toutes les erreurs sinon.
+    """
+    rows = list(rows)
+    errors = []
+    usernames = {str(row.get('player', '')).strip() for row in rows}
+    riders = {str(row.get('rider', '')).strip() for row in rows}
+    users = {user.username: user for user in User.objects.filter(username__in=usernames)}
+    cyclists = defaultdict(list)
+    for cyclist in Cyclist.objects.filter(name__in=riders):
+        cyclists[cyclist.name].append(cyclist)
+    teams = {team.player.username: team for team in Team.objects.filter(league=league).select_related('player')}
+    existing = {
+        cyclist_id: (username, price)
+        for cyclist_id, username, price in TeamCyclist.objects.filter(league=league)
+        .values_list('cyclist_id', 'team__player__username', 'price')
+    }
+
+    imported = defaultdict(list)
+    seen = {}
+    for line, row in enumerate(rows, start=1):
+        player = str(row.get('player', '')).strip()
+        rider = str(row.get('rider', '')).strip()
+        if player not in users:
+            errors.append(f"Line {line}: unknown player '{player}'.")
+            continue
+        rider_team = str(row.get('team') or '').strip()
+        matches = [c for c in cyclists.get(rider, []) if not rider_team or c.team == rider_team]
+        if not matches:
+            errors.append(f"Line {line}: unknown rider '{rider}'" + (f" of {rider_team}." if rider_team else "."))
+            continue
+        if len(matches) > 1:
+            errors.append(
+                f"Line {line}: several riders are named '{rider}' "
+                f"({', '.join(c.team for c in matches)}), add their team in the team column."
+            )
+            continue
+        cyclist = matches[0]
+        try:
+            price = int(row.get('price'))
+        except (TypeError, ValueError):
+            errors.append(f"Line {line}: invalid price '{row.get('price')}'.")
+            continue
+        if price < cyclist.value:
+            errors.append(f"Line {line}: price {price} for {rider} is below its minimum ({cyclist.value}).")
+        if cyclist.id in seen:
+            errors.append(f"Line {line}: {rider} is already assigned to {seen[cyclist.id]} in this file.")
+            continue
+        seen[cyclist.id] = player
+        imported[player].append((cyclist, price))
+
+    names = {cyclist.id: cyclist.name for matches in cyclists.values() for cyclist in matches}
+    for cyclist_id, player in seen.items():
+        owner = existing.get(cyclist_id, (None, None))[0]
+        # Un coureur déjà attribué ne peut être repris que si l'effectif de son équipe est remplacé
+        if owner is None or (replace and owner in imported):
+            continue
+        if owner == player:
+            errors.append(f"{names[cyclist_id]} is already in {owner}'s roster.")
+        else:
+            errors.append(f"{names[cyclist_id]} already belongs to {owner} in this league.")
+
+    for player, roster in imported.items():
+        kept = [] if replace else [price for owner, price in existing.values() if owner == player]
+        count = len(kept) + len(roster)
+        spent = sum(kept) + sum(price for _, price in roster)
+        if count != TEAM_SIZE:
+            errors.append(f"{player}: {count} riders, a team needs exactly {TEAM_SIZE}.")
+        if spent != BUDGET:
+            errors.append(f"{player}: spends {spent}, a full team must spend exactly the {BUDGET} budget.")
+
+    if errors:
+        raise RosterImportError(errors)
+    summary = {player: len(roster) for player, roster in imported.items()}
+    if dry_run:
+        return summary
+
+    with transaction.atomic():
+        for player in imported:
+            if player not in teams:
+                teams[player] = Team.objects.create(player=users[player], league=league)
+        touched = [teams[player] for player in imported]
+        if replace:
+            TeamCyclist.objects.filter(league=league, team__in=touched).delete()
+        TeamCyclist.objects.bulk_create([
+            TeamCyclist(team=teams[player], league=league, cyclist=cyclist, price=price, locked=True)
+            for player, roster in imported.items() for cyclist, price in roster
+        ], batch_size=500)
+        LeagueAssignment.objects.bulk_create([
+            LeagueAssignment(league=league, team=teams[player], cyclist=cyclist, price=price)
+            for player, roster in imported.items() for cyclist, price in roster
+        ], batch_size=500)
+        Team.rebuild_ledgers(touched)
+        if league.auction_finished:
+            AuctionSnapshot.build(league)
+    return summary
+
@@ -0,0 +1,128 @@
+"""
+Soumission des enchères d'une équipe, partagée par TeamCreateView et AdminTeamEditView.
+"""
+import logging
+import time
+from dataclasses import dataclass
+
+from django.db import connection, transaction
+
+from . import events
+from .models import AuctionResolutionJob, BUDGET, Cyclist, LeagueAuction, LeagueRound, Team, TeamCyclistAuction, TEAM_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+class SubmissionError(Exception):
+    """Soumission refusée : le message est renvoyé tel quel au client."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+@dataclass
+class SubmissionMetrics:
+    duration_ms: float = 0.0
+    query_count: int = 0
+    bid_count: int = 0
+
+
+@dataclass
+class AuctionSubmission:
+    league_auction: LeagueAuction
+    metrics: SubmissionMetrics
+
+
+class AuctionSubmissionService:
+    """
+    Valide et enregistre les mises d'un joueur pour le round courant de la ligue.
+
+    Lectures en nombre fixe (équipe et registre, round, coureurs sélectionnés), validation en
+    mémoire, puis écriture sous le verrou du round avec bulk_create. Chaque soumission mesure
+    sa durée et son nombre de requêtes (loggés, et exposés via `metrics`).
+    """
+
+    def __init__(self, league, player):
+        self.league = league
+        self.player = player
+        self.metrics = SubmissionMetrics()
+
+    def submit(self, selected):
+        """Enregistre la sélection [{'id': ..., 'price': ...}] ; lève SubmissionError si elle est refusée."""
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(self._count_query):
+                league_auction = self._submit(selected)
+        finally:
+            self.metrics.duration_ms = (time.perf_counter() - start) * 1000
+            logger.info(
+                "Auction submission league=%s player=%s bids=%s: %.1f ms, %s queries",
+                self.league.id, self.player.id, self.metrics.bid_count,
+                self.metrics.duration_ms, self.metrics.query_count,
+            )
+        return AuctionSubmission(league_auction=league_auction, metrics=self.metrics)
+
+    def _count_query(self, execute, sql, params, many, context):
+        self.metrics.query_count += 1
+        return execute(sql, params, many, context)
+
+    def _submit(self, selected):
+        bids = self._parse(selected)
+        self.metrics.bid_count = len(bids)
+        team = Team.objects.filter(player=self.player, league=self.league).first()
+        current_round = LeagueRound.objects.filter(league=self.league).order_by('-round_number').first()
+        if current_round is None:
+            raise SubmissionError('The auction has not started yet.')
+        self._validate(team, bids)
+        with transaction.atomic():
+            # Verrouille le round : sérialise les soumissions avec la résolution de la ligue
+            league_round = LeagueRound.lock_current(self.league)
+            if league_round.round_number != current_round.round_number or not league_round.is_active:
+                raise SubmissionError('The round has just been resolved, please reload the page.', status=409)
+            if not team:
+                team = Team.objects.create(player=self.player, league=self.league)
+            league_auction = LeagueAuction.objects.create(
+                league=self.league, team=team, round_number=league_round.round_number,
+            )
+            TeamCyclistAuction.objects.bulk_create([
+                TeamCyclistAuction(league_auction=league_auction, cyclist_id=cyclist_id, price=price, status='pending')
+                for cyclist_id, price in bids
+            ])
+            league_round.bump_version()
+        AuctionResolutionJob.enqueue(self.league, league_round.round_number)
+        events.publish(
+            self.league.id, events.TEAM_SUBMITTED,
+            team_id=team.id, username=self.player.username, round_number=league_round.round_number,
+        )
+        return league_auction
+
+    @staticmethod
+    def _parse(selected):
+        try:
+            bids = [(int(c['id']), float(c['price'])) for c in selected]
+        except (TypeError, KeyError, ValueError):
+            raise SubmissionError('Invalid data.')
+        cyclist_ids = [cyclist_id for cyclist_id, _ in bids]
+        if len(set(cyclist_ids)) != len(cyclist_ids):
+            raise SubmissionError('Duplicate cyclists.')
+        return bids
+
+    def _validate(self, team, bids):
+        remaining_budget = team.remaining_budget if team else BUDGET
+        roster_count = team.roster_count if team else 0
+        # Joueurs déjà dans l'équipe + sélection >= 12
+        if roster_count + len(bids) < TEAM_SIZE:
+            raise SubmissionError('You must have at least 12 cyclists in total (current team + selection).')
+        cyclists = Cyclist.objects.in_bulk([cyclist_id for cyclist_id, _ in bids])
+        if len(cyclists) != len(bids):
+            raise SubmissionError('Invalid cyclist(s).')
+        total = 0
+        for cyclist_id, price in bids:
+            cyclist = cyclists[cyclist_id]
+            if price < cyclist.value:
+                raise SubmissionError(f'Price for {cyclist.name} below minimum.')
+            total += price
+        if total != remaining_budget:
+            raise SubmissionError(f'Total spent ({total}) does not match budget ({BUDGET}).')
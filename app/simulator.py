@@ -0,0 +1,162 @@
+"""
+Rejeu en mémoire des enchères d'une ligue, avec règles de départage et de prix interchangeables.
+
+`AuctionHistory.load()` lit une seule fois (2 requêtes) la dernière soumission de chaque équipe
+pour chaque round, en tableaux compacts d'entiers ; `simulate()` rejoue ensuite la résolution
+round par round sans toucher à la base, ce qui permet des milliers de rejeux par seconde.
+"""
+import random
+from dataclasses import dataclass, field
+
+from .models import BUDGET, LeagueAuction, TEAM_SIZE, TeamCyclistAuction
+
+# Règles de départage : clé de tri d'une mise (prix décroissant d'abord), la première l'emporte.
+# Une mise est un tuple (équipe, coureur, prix, ordre de soumission).
+TIE_BREAKS = {
+    # Règle actuelle de resolve_auctions_for_league : à prix égal, la première soumission gagne
+    # (avec first_price et sans enforce_limits, simulate() reproduit la résolution réelle)
+    'earliest': lambda bid, state, rng: (-bid[2], bid[3]),
+    'latest': lambda bid, state, rng: (-bid[2], -bid[3]),
+    'random': lambda bid, state, rng: (-bid[2], rng.random()),
+    # À prix égal, l'équipe qui a le plus de budget restant gagne
+    'most_budget': lambda bid, state, rng: (-bid[2], state.spent[bid[0]], bid[3]),
+}
+
+
+def first_price(bids, winner_index, min_value):
+    return bids[winner_index][2]
+
+
+def second_price(bids, winner_index, min_value):
+    """Enchère scellée au second prix : le gagnant paie la meilleure mise suivante (ou le prix minimum)."""
+    others = [bid[2] for i, bid in enumerate(bids) if i != winner_index]
+    return max(others) if others else min_value
+
+
+PRICING = {
+    'first_price': first_price,
+    'second_price': second_price,
+}
+
+
+@dataclass
+class AuctionHistory:
+    """Mises historiques d'une ligue, indexées par entiers (équipes et coureurs)."""
+    league_id: int
+    team_ids: list
+    cyclist_ids: list
+    min_values: list
+    # rounds[i] = liste des mises groupées par coureur : (coureur, [(équipe, coureur, prix, ordre), ...])
+    rounds: list
+    round_numbers: list
+
+    @staticmethod
+    def load(league):
+        auctions = list(
+            LeagueAuction.objects.filter(league=league)
+            .order_by('round_number', 'team_id', '-submitted_at', '-id')
+            .values_list('id', 'round_number', 'team_id')
+        )
+        latest = {}
+        for auction_id, round_number, team_id in auctions:
+            latest.setdefault((round_number, team_id), auction_id)
+        auction_keys = {auction_id: key for key, auction_id in latest.items()}
+        # Seules les mises résolues : un round encore ouvert n'a pas d'issue à rejouer
+        bids = (
+            TeamCyclistAuction.objects.filter(
+                league_auction_id__in=auction_keys, status__in=TeamCyclistAuction.RESOLVED_STATUSES,
+            )
+            .order_by('submitted_at', 'id')
+            .values_list('league_auction_id', 'cyclist_id', 'price', 'cyclist__value')
+        )
+        team_index, cyclist_index = {}, {}
+        min_values = []
+        by_round = {}
+        for order, (auction_id, cyclist_id, price, value) in enumerate(bids):
+            round_number, team_id = auction_keys[auction_id]
+            team = team_index.setdefault(team_id, len(team_index))
+            if cyclist_id not in cyclist_index:
+                cyclist_index[cyclist_id] = len(cyclist_index)
+                min_values.append(value)
+            cyclist = cyclist_index[cyclist_id]
+            by_round.setdefault(round_number, {}).setdefault(cyclist, []).append((team, cyclist, price, order))
+        round_numbers = sorted(by_round)
+        return AuctionHistory(
+            league_id=league.id,
+            team_ids=list(team_index),
+            cyclist_ids=list(cyclist_index),
+            min_values=min_values,
+            rounds=[list(by_round[n].items()) for n in round_numbers],
+            round_numbers=round_numbers,
+        )
+
+    @property
+    def bid_count(self):
+        return sum(len(bids) for round_bids in self.rounds for _, bids in round_bids)
+
+
+@dataclass
+class SimulationState:
+    spent: list
+    roster: list
+    owner: dict = field(default_factory=dict)
+    won_count: int = 0
+
+
+@dataclass
+class SimulationResult:
+    history: AuctionHistory
+    spent: list
+    roster: list
+    owner: dict
+    won_count: int = 0  # mises gagnantes, y compris sur un coureur déjà attribué (comme la résolution)
+
+    def team_summary(self):
+        """{team_id: (nombre de coureurs, dépense)}"""
+        return {
+            team_id: (len(self.roster[i]), self.spent[i])
+            for i, team_id in enumerate(self.history.team_ids)
+        }
+
+    def assignments(self):
+        """{cyclist_id: team_id}"""
+        return {
+            self.history.cyclist_ids[cyclist]: self.history.team_ids[team]
+            for cyclist, team in self.owner.items()
+        }
+
+
+def simulate(history, tie_break='earliest', pricing='first_price', rng=None, enforce_limits=False):
+    """
+    Rejoue la résolution round par round comme resolve_auctions_for_league : pour chaque coureur,
+    la meilleure mise (selon la règle de départage) l'emporte, au prix donné par la règle de prix.
+    Comme dans la résolution réelle, une mise gagnante sur un coureur déjà attribué compte comme
+    gagnée sans changer d'équipe, et une équipe complète ou sans budget peut encore gagner.
+    Avec enforce_limits (variante what-if), seule une équipe encore incomplète et solvable peut
+    l'emporter, et un coureur déjà attribué n'est plus disputé.
+    """
+    sort_key = TIE_BREAKS[tie_break]
+    price_rule = PRICING[pricing]
+    rng = rng or random.Random()
+    team_count = len(history.team_ids)
+    state = SimulationState(spent=[0] * team_count, roster=[[] for _ in range(team_count)])
+    min_values = history.min_values
+    for round_bids in history.rounds:
+        for cyclist, bids in round_bids:
+            if enforce_limits and cyclist in state.owner:
+                continue
+            ranked = sorted(bids, key=lambda bid: sort_key(bid, state, rng))
+            for winner in ranked:
+                team = winner[0]
+                price = price_rule(bids, bids.index(winner), min_values[cyclist])
+                if enforce_limits and (len(state.roster[team]) >= TEAM_SIZE or state.spent[team] + price > BUDGET):
+                    continue
+                state.won_count += 1
+                if cyclist not in state.owner:
+                    state.owner[cyclist] = team
+                    state.roster[team].append(cyclist)
+                    state.spent[team] += price
+                break
+    return SimulationResult(
+        history=history, spent=state.spent, roster=state.roster, owner=state.owner, won_count=state.won_count,
+    )
@@ -1,3 +1,911 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import shutil
+import tempfile
+import uuid
+from unittest import mock
+from io import StringIO
+from pathlib import Path
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import events
+from .services import AuctionSubmissionService, SubmissionError
+from .rosters import RosterImportError, import_rosters
+from .results_import import import_csv_results, import_html_results
+from .simulator import AuctionHistory, simulate
+from .models import (
+    BUDGET, TEAM_SIZE, AuctionResolutionJob, AuctionSnapshot, BonusConfig, Competition, Cyclist,
+    DefaultStageSelection, DefaultStageSelectionRider, League, LeagueAssignment, LeagueAuction, LeagueRound,
+    PointsTodayResult, ResultBatch, Resultat, Role, Stage, StageGeneralResult, StageSelection, StageSelectionBonus,
+    StageSelectionRider, Team, TeamCyclist, TeamCyclistAuction, User, resolve_auctions_for_league, stage_locked,
+)
+
+# Le cache configuré (DatabaseCache) coûte des requêtes : elles sont comptées explicitement.
+# Lecture : un SELECT. Écriture : décompte pour l'éviction, savepoint, recherche, insertion, release.
+# Suppression : un DELETE.
+CACHE_GET_QUERIES = 1
+CACHE_SET_QUERIES = 5
+CACHE_DELETE_QUERIES = 1
+
+
+class StageSelectionLeagueViewTests(TestCase):
+    """
+    Nombre de requêtes de la page de sélection d'étape (à froid, en cache, après une soumission),
+    avec le cache de settings.CACHES.
+    """
+
+    # session, user, league, stages, team, roles, bonus configs, riders of the form
+    BASE_QUERIES = 8
+    # default riders, riders of the stage selection, bonuses (StageSelection.page_data)
+    PAGE_DATA_QUERIES = 3
+    # riders of the cached ids, read on every render
+    RIDER_QUERIES = 1
+    # version of the team's selections, then page data: both read, and written on a miss
+    COLD_QUERIES = BASE_QUERIES + PAGE_DATA_QUERIES + RIDER_QUERIES + 2 * (CACHE_GET_QUERIES + CACHE_SET_QUERIES)
+    CACHED_QUERIES = BASE_QUERIES + RIDER_QUERIES + 2 * CACHE_GET_QUERIES
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('rider_fan', password='pw')
+        competition = Competition.objects.create(name='Tour')
+        cls.league = League.objects.create(name='Ligue', creator=cls.user, competition=competition, auction_finished=True)
+        cls.team = Team.objects.create(player=cls.user, league=cls.league)
+        tomorrow = datetime.date.today() + datetime.timedelta(days=1)
+        cls.stages = [
+            Stage.objects.create(name=f'Stage {i}', date=tomorrow + datetime.timedelta(days=i), competition=competition)
+            for i in range(3)
+        ]
+        cls.roles = [
+            Role.objects.create(name=name, label=name.title(), order=order)
+            for order, name in enumerate(['leader', 'sprinteur', 'grimpeur'])
+        ]
+        cls.bonus = BonusConfig.objects.create(competition=competition, name='Double', max_per_player=2)
+        cls.riders = [Cyclist.objects.create(name=f'Rider {i}', team='Team', value=1) for i in range(12)]
+        for rider in cls.riders:
+            TeamCyclist.objects.create(team=cls.team, league=cls.league, cyclist=rider, price=10, locked=True)
+        default = DefaultStageSelection.objects.create(team=cls.team)
+        for rider, role in zip(cls.riders[:8], cls.roles + [None] * 5):
+            DefaultStageSelectionRider.objects.create(default_selection=default, cyclist=rider, role=role)
+        for stage in cls.stages[:2]:
+            selection = StageSelection.objects.create(team=cls.team, stage=stage, validated=True)
+            for rider, role in zip(cls.riders[:8], cls.roles + [None] * 5):
+                StageSelectionRider.objects.create(stage_selection=selection, cyclist=rider, role=role)
+            StageSelectionBonus.objects.create(stage_selection=selection, bonus=cls.bonus, count=1)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.url = reverse('stage_selection_league', args=[self.league.id])
+
+    def get_page(self, stage):
+        return self.client.get(self.url, {'stage': stage.id})
+
+    def test_cold_render_uses_fixed_queries(self):
+        with self.assertNumQueries(self.COLD_QUERIES):
+            response = self.get_page(self.stages[0])
+        self.assertEqual(response.status_code, 200)
+        context = response.context
+        self.assertEqual([r.id for r in context['initial_riders']], [r.id for r in self.riders[:8]])
+        self.assertEqual(context['initial_roles'][self.riders[0].id], self.roles[0].id)
+        self.assertEqual(context['initial_roles'][self.riders[7].id], '')
+        self.assertEqual(context['unique_role_ids'], [role.id for role in self.roles])
+        self.assertEqual(context['selected_bonus_ids_for_stage'], [self.bonus.id])
+        self.assertEqual(context['used_bonuses'][self.bonus.id], self.stages[:2])
+        self.assertEqual(context['available_bonuses'][self.bonus.id], 0)
+        self.assertEqual(len(context['default_riders']), 8)
+
+    def test_cached_render_skips_selection_queries(self):
+        self.get_page(self.stages[0])
+        with self.assertNumQueries(self.CACHED_QUERIES):
+            response = self.get_page(self.stages[0])
+        self.assertEqual(response.context['selected_bonus_ids_for_stage'], [self.bonus.id])
+
+    def test_query_count_does_not_grow_with_history(self):
+        for _ in range(5):
+            StageSelection.objects.create(team=self.team, stage=self.stages[2])
+        with self.assertNumQueries(self.COLD_QUERIES):
+            response = self.get_page(self.stages[2])
+        self.assertEqual(response.context['initial_riders'], [])
+        self.assertEqual(response.context['selected_bonuses_for_stage'], [])
+
+    def test_submission_invalidates_team_cache(self):
+        self.get_page(self.stages[2])
+        post = {'stage': self.stages[2].id, 'riders': [r.id for r in self.riders[4:12]]}
+        for rider, role in zip(self.riders[4:7], self.roles):
+            post[f'role_{rider.id}'] = role.id
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.url, post)
+        self.assertEqual(response.status_code, 302)
+        with self.assertNumQueries(self.COLD_QUERIES):
+            response = self.get_page(self.stages[2])
+        self.assertEqual([r.id for r in response.context['initial_riders']][:3], [r.id for r in self.riders[4:7]])
+
+    def test_admin_edits_show_up_on_next_render(self):
+        self.get_page(self.stages[0])
+        Cyclist.objects.filter(pk=self.riders[0].pk).update(name='Renamed rider')
+        BonusConfig.objects.filter(pk=self.bonus.pk).update(name='Triple', max_per_player=3)
+        # Le leader passe après le sprinteur et le grimpeur
+        Role.objects.filter(pk=self.roles[0].pk).update(order=5)
+        context = self.get_page(self.stages[0]).context
+        self.assertEqual([rider.id for rider in context['initial_riders'][:3]], [r.id for r in self.riders[1:3] + self.riders[:1]])
+        self.assertIn('Renamed rider', [rider.name for rider in context['initial_riders']])
+        self.assertEqual(context['selected_bonuses_for_stage'][0].bonus.name, 'Triple')
+        self.assertEqual(context['available_bonuses'][self.bonus.id], 1)
+        # Bonus retiré puis coureur ajouté à la sélection depuis l'admin
+        selection = StageSelection.objects.get(team=self.team, stage=self.stages[0])
+        with self.captureOnCommitCallbacks(execute=True):
+            StageSelectionBonus.objects.filter(stage_selection=selection).delete()
+            StageSelectionRider.objects.create(stage_selection=selection, cyclist=self.riders[8])
+        context = self.get_page(self.stages[0]).context
+        self.assertEqual(context['selected_bonuses_for_stage'], [])
+        self.assertIn(self.riders[8].id, [rider.id for rider in context['initial_riders']])
+
+    def test_invalid_submission_renders_same_context(self):
+        response = self.client.post(self.url, {'stage': self.stages[0].id, 'riders': [self.riders[0].id]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r.id for r in response.context['initial_riders']], [r.id for r in self.riders[:8]])
+        self.assertEqual(response.context['selected_bonus_ids_for_stage'], [self.bonus.id])
+
+    def test_apply_default_all_writes_in_bulk(self):
+        # 21 étapes : le nombre de requêtes ne dépend pas du nombre d'étapes à remplir
+        for i in range(3, 21):
+            Stage.objects.create(
+                name=f'Stage {i}', date=datetime.date.today() + datetime.timedelta(days=i + 1), competition=self.league.competition,
+            )
+        # 12 requêtes, plus l'invalidation du cache de l'équipe après le commit
+        with self.assertNumQueries(12 + CACHE_DELETE_QUERIES), self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.url, {'stage': self.stages[0].id, 'action': 'apply_default_all'})
+        self.assertEqual(response.status_code, 302)
+        validated = StageSelection.objects.filter(team=self.team, validated=True)
+        self.assertEqual(validated.count(), 21)
+        self.assertEqual(StageSelectionRider.objects.filter(stage_selection__in=validated).count(), 21 * 8)
+        # Les sélections déjà validées ne sont pas remplacées
+        self.assertEqual(StageSelectionBonus.objects.filter(stage_selection__team=self.team).count(), 2)
+
+    def test_apply_defaults_at_lock_is_idempotent(self):
+        other = Team.objects.create(player=User.objects.create_user('no_default'), league=self.league)
+        stage = self.stages[2]
+        with self.captureOnCommitCallbacks(execute=True):
+            stage_locked.send_robust(sender=Stage, stage=stage)
+        self.assertEqual(StageSelection.objects.filter(stage=stage, validated=True).count(), 1)
+        self.assertFalse(StageSelection.objects.filter(team=other).exists())
+        with self.assertNumQueries(4):
+            self.assertEqual(StageSelection.apply_defaults(stage), 0)
+        self.assertEqual(StageSelection.apply_defaults(self.stages[0]), 0)
+
+
+class ResultsImportTests(TestCase):
+    """Import idempotent des résultats : une même page n'est écrite qu'une fois, une nouvelle remplace l'ancienne."""
+
+    CSV = "Rnk,Rider,Team,UCI,Pnt,,Time\n1,KOOIJ Olav,Visma,180,80,10,10\n2,VAN UDEN Casper,Picnic,130,50,6,6\n"
+
+    @classmethod
+    def setUpTestData(cls):
+        competition = Competition.objects.create(name='Tour')
+        cls.stage = Stage.objects.create(name='Stage 1', date=datetime.date.today(), competition=competition)
+
+    def import_csv(self, content):
+        return import_csv_results(SimpleUploadedFile('resultats.csv', content.encode('utf-8')), self.stage, uuid.uuid4())
+
+    def test_same_file_is_imported_once(self):
+        self.assertEqual(self.import_csv(self.CSV).rows, 2)
+        report = self.import_csv(self.CSV)
+        self.assertTrue(report.skipped)
+        self.assertEqual(Resultat.objects.filter(stage=self.stage).count(), 2)
+
+    def test_new_file_replaces_previous_batch(self):
+        Resultat.objects.create(stage=self.stage, rider='legacy')
+        self.import_csv(self.CSV)
+        report = self.import_csv(self.CSV.replace('KOOIJ', 'KOOY'))
+        self.assertFalse(report.skipped)
+        riders = list(Resultat.objects.filter(stage=self.stage).order_by('rnk').values_list('rider', flat=True))
+        self.assertEqual(riders, ['KOOY Olav', 'VAN UDEN Casper'])
+        batch = ResultBatch.objects.get(stage=self.stage, kind='resultat')
+        self.assertEqual(batch.content_hash, report.content_hash)
+        self.assertEqual(batch.row_count, 2)
+
+    def test_import_results_command_maps_files_to_stages(self):
+        directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, directory)
+        shutil.copy(Path(settings.BASE_DIR) / 'result_stage_1.html', directory / 'stage_1.html')
+        shutil.copy(Path(settings.BASE_DIR) / 'global_result.html', directory / 'overview.html')
+        args = [str(directory), '--competition', str(self.stage.competition_id), '--workers', '1']
+        call_command('import_results', *args, stdout=StringIO(), stderr=StringIO())
+        rows = StageGeneralResult.objects.filter(stage=self.stage).count()
+        self.assertGreater(rows, 0)
+        out = StringIO()
+        call_command('import_results', *args, stdout=out, stderr=StringIO())
+        self.assertIn('already imported', out.getvalue())
+        self.assertEqual(StageGeneralResult.objects.filter(stage=self.stage).count(), rows)
+
+    def import_page(self, name):
+        with open(Path(settings.BASE_DIR) / name, 'rb') as page:
+            return import_html_results(page.read(), self.stage, uuid.uuid4())
+
+    def test_partial_page_then_full_page_reimport(self):
+        # global_result.html a les classements du jour points/équipes, result_stage_1.html non
+        self.import_page('global_result.html')
+        points_today = PointsTodayResult.objects.filter(stage=self.stage).count()
+        self.assertFalse(self.import_page('result_stage_1.html').skipped)
+        self.assertEqual(PointsTodayResult.objects.filter(stage=self.stage).count(), points_today)
+        self.assertEqual(StageGeneralResult.objects.filter(stage=self.stage).count(), 184)
+
+        report = self.import_page('global_result.html')
+        self.assertFalse(report.skipped)
+        self.assertEqual(StageGeneralResult.objects.filter(stage=self.stage).count(), 176)
+        self.assertEqual(PointsTodayResult.objects.filter(stage=self.stage).count(), points_today)
+        self.assertEqual(
+            set(ResultBatch.objects.filter(stage=self.stage).values_list('content_hash', flat=True)), {report.content_hash},
+        )
+        self.assertTrue(self.import_page('global_result.html').skipped)
+
+
+class CyclistCatalogueViewTests(TestCase):
+    """Catalogue des coureurs servi depuis le cache configuré, requêtes du cache comprises."""
+
+    # session, user
+    BASE_QUERIES = 2
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('catalogue_fan')
+        Cyclist.objects.bulk_create([Cyclist(name=f'Rider {i}', team='Team', value=i) for i in range(50)])
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def test_catalogue_queries(self):
+        url = reverse('cyclist_catalogue')
+        # version (agrégat) puis catalogue (une requête), lus et écrits dans le cache
+        with self.assertNumQueries(self.BASE_QUERIES + 2 * (CACHE_GET_QUERIES + 1 + CACHE_SET_QUERIES)):
+            response = self.client.get(url)
+        self.assertEqual(len(response.json()['rows']), 50)
+        with self.assertNumQueries(self.BASE_QUERIES + 2 * CACHE_GET_QUERIES):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        # Catalogue déjà chez le client : seule la version est lue
+        with self.assertNumQueries(self.BASE_QUERIES + CACHE_GET_QUERIES):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+
+class StageLockTests(TestCase):
+    """Heures de verrouillage précalculées et envoi de stage_locked."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.competition = Competition.objects.create(name='Giro', lock_time=datetime.time(13, 0), timezone='Europe/Rome')
+        cls.stage = Stage.objects.create(name='Stage 1', date=datetime.date.today() - datetime.timedelta(days=1), competition=cls.competition)
+
+    def test_failed_receiver_is_retried(self):
+        def failing(sender, stage, **kwargs):
+            raise RuntimeError('boom')
+        stage_locked.connect(failing)
+        try:
+            self.assertEqual(Stage.process_due_locks(), [])
+        finally:
+            stage_locked.disconnect(failing)
+        self.stage.refresh_from_db()
+        self.assertIsNone(self.stage.lock_processed_at)
+        self.assertEqual(Stage.process_due_locks(), [self.stage])
+        self.assertEqual(Stage.process_due_locks(), [])
+
+    def test_moving_lock_later_resets_processing(self):
+        Stage.process_due_locks()
+        self.stage.refresh_from_db()
+        self.assertIsNotNone(self.stage.lock_processed_at)
+        self.stage.date = datetime.date.today() + datetime.timedelta(days=1)
+        self.stage.save(update_fields=['date'])
+        self.stage.refresh_from_db()
+        self.assertIsNone(self.stage.lock_processed_at)
+        self.assertFalse(self.stage.is_locked)
+
+    def test_competition_lock_policy_change_updates_stages(self):
+        Stage.process_due_locks()
+        competition = Competition.objects.get(pk=self.competition.pk)
+        competition.name = 'Giro d\'Italia'
+        with self.assertNumQueries(1):
+            competition.save()
+        competition.lock_time = datetime.time(15, 30)
+        competition.save()
+        self.stage.refresh_from_db()
+        self.assertEqual(self.stage.local_lock_time, datetime.time(15, 30))
+        self.assertIsNone(self.stage.lock_processed_at)
+
+
+class AuctionSnapshotPageTests(TestCase):
+    def test_cursor_pages_cover_each_rider_once(self):
+        # Ordre d'une collation linguistique (é entre e et f), différent de l'ordre Python
+        names = ['emma', 'élodie', 'fabio', 'zoé']
+        data = {'riders': [
+            {'id': i, 'name': name, 'name_key': name, 'top_price': 10.0, 'bids': [], 'winner': None}
+            for i, name in enumerate(names, start=1)
+        ]}
+        seen, after = [], None
+        while True:
+            page, after = AuctionSnapshot.results_page(data, after=after, limit=1)
+            seen.extend(rider['name'] for rider in page)
+            if after is None:
+                break
+        self.assertEqual(sorted(seen), sorted(names))
+        self.assertEqual(len(seen), len(names))
+
+
+class RosterVersionTests(TestCase):
+    """La version du fragment league_teams_list suit tout ce que la liste affiche."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('roster_fan')
+        cls.league = League.objects.create(name='Ligue', creator=cls.user, competition=Competition.objects.create(name='Tour'))
+        cls.team = Team.objects.create(player=cls.user, league=cls.league)
+        cls.rider = Cyclist.objects.create(name='Rider', team='Team', value=1)
+        TeamCyclist.objects.create(team=cls.team, league=cls.league, cyclist=cls.rider, price=10)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_version_follows_rider_and_player_edits(self):
+        versions = [Team.roster_version(self.league)]
+        self.rider.team = 'Other team'
+        self.rider.save()
+        versions.append(Team.roster_version(self.league))
+        self.user.username = 'renamed'
+        self.user.save()
+        versions.append(Team.roster_version(self.league))
+        TeamCyclist.objects.filter(team=self.team).update(price=12)
+        versions.append(Team.roster_version(self.league))
+        self.assertEqual(len(set(versions)), len(versions))
+
+
+class LeagueAssignmentFeedTests(TestCase):
+    """Rejouer le flux d'attributions depuis 0 donne les coureurs attribués de la ligue."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('bidder', password='pw')
+        competition = Competition.objects.create(name='Tour')
+        cls.league = League.objects.create(name='Ligue', creator=cls.user, competition=competition, is_active=True)
+        cls.teams = [
+            Team.objects.create(player=User.objects.create_user(f'player_{i}'), league=cls.league) for i in range(2)
+        ] + [Team.objects.create(player=cls.user, league=cls.league)]
+        cls.riders = [Cyclist.objects.create(name=f'Rider {i}', team='Team', value=1) for i in range(6)]
+        for i, rider in enumerate(cls.riders):
+            TeamCyclist.objects.create(team=cls.teams[i % 2], league=cls.league, cyclist=rider, price=10)
+
+    def replay(self, version=0, locked=None):
+        locked = dict(locked or {})
+        version, entries = LeagueAssignment.since(self.league, version)
+        for entry in entries:
+            if entry['removed']:
+                locked.pop(entry['cyclist_id'], None)
+            else:
+                locked[entry['cyclist_id']] = entry['assigned_to']
+        return version, locked
+
+    def current(self):
+        return dict(TeamCyclist.objects.filter(league=self.league).values_list('cyclist_id', 'team__player__username'))
+
+    def test_removals_are_logged(self):
+        version, locked = self.replay()
+        self.assertEqual(locked, self.current())
+        TeamCyclist.objects.get(cyclist=self.riders[0]).delete()
+        TeamCyclist.objects.filter(cyclist__in=self.riders[1:3]).delete()
+        self.teams[1].delete()
+        version, locked = self.replay(version, locked)
+        self.assertEqual(locked, self.current())
+        self.assertEqual(self.replay()[1], self.current())
+        TeamCyclist.objects.create(team=self.teams[0], league=self.league, cyclist=self.riders[0], price=12)
+        self.assertEqual(self.replay(version, locked)[1], self.current())
+
+    def test_auction_page_does_not_load_league_rosters(self):
+        client = Client()
+        client.force_login(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(reverse('team_create', args=[self.league.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('locked_cyclists', response.context)
+        league_roster_queries = [
+            q['sql'] for q in queries.captured_queries
+            if '"app_teamcyclist"' in q['sql'] and '"app_teamcyclist"."team_id"' not in q['sql']
+        ]
+        self.assertEqual(league_roster_queries, [])
+
+
+class TeamLedgerTests(TestCase):
+    """Le registre des équipes suit les suppressions unitaires, en masse et en cascade."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('ledger')
+        cls.league = League.objects.create(name='Ligue', creator=cls.user, competition=Competition.objects.create(name='Tour'))
+        cls.team = Team.objects.create(player=cls.user, league=cls.league)
+        cls.riders = [Cyclist.objects.create(name=f'Rider {i}', team='Team', value=1) for i in range(3)]
+        for rider in cls.riders:
+            TeamCyclist.objects.create(team=cls.team, league=cls.league, cyclist=rider, price=10)
+
+    def ledger(self):
+        self.team.refresh_from_db()
+        return self.team.spent, self.team.roster_count
+
+    def test_bulk_and_cascade_deletes_rebuild_the_ledger(self):
+        self.assertEqual(self.ledger(), (30, 3))
+        with self.captureOnCommitCallbacks(execute=True):
+            TeamCyclist.objects.filter(cyclist=self.riders[0]).delete()
+        self.assertEqual(self.ledger(), (20, 2))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.riders[1].delete()
+        self.assertEqual(self.ledger(), (10, 1))
+
+    def test_reconcile_command_fixes_drift(self):
+        Team.objects.filter(pk=self.team.pk).update(spent=99, roster_count=7)
+        out = StringIO()
+        call_command('reconcile_team_ledgers', '--dry-run', stdout=out)
+        self.assertIn('dry run', out.getvalue())
+        self.assertEqual(self.ledger(), (99, 7))
+        out = StringIO()
+        call_command('reconcile_team_ledgers', '--league', str(self.league.id), stdout=out)
+        self.assertIn('1 équipe(s) corrigée(s)', out.getvalue())
+        self.assertEqual(self.ledger(), (30, 3))
+        out = StringIO()
+        call_command('reconcile_team_ledgers', stdout=out)
+        self.assertIn('Aucun écart', out.getvalue())
+
+
+class RosterImportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('manager')
+        cls.league = League.objects.create(name='Ligue', creator=cls.user, competition=Competition.objects.create(name='Tour'))
+        cls.riders = [Cyclist.objects.create(name=f'Rider {i}', team='Alpha', value=10) for i in range(TEAM_SIZE)]
+        cls.namesake = Cyclist.objects.create(name='Rider 0', team='Beta', value=10)
+
+    def rows(self, prices, team_of_first=None):
+        rows = [{'player': 'manager', 'rider': rider.name, 'price': price} for rider, price in zip(self.riders, prices)]
+        rows[0]['team'] = team_of_first
+        return rows
+
+    def full_budget_prices(self):
+        return [BUDGET - 40 * (TEAM_SIZE - 1)] + [40] * (TEAM_SIZE - 1)
+
+    def test_ambiguous_rider_name_needs_team(self):
+        with self.assertRaises(RosterImportError) as error:
+            import_rosters(self.league, self.rows(self.full_budget_prices()))
+        self.assertIn("several riders are named 'Rider 0'", error.exception.errors[0])
+        import_rosters(self.league, self.rows(self.full_budget_prices(), team_of_first='Alpha'))
+        team = Team.objects.get(league=self.league)
+        self.assertTrue(team.team_cyclists.filter(cyclist=self.riders[0]).exists())
+        self.assertTrue(team.is_complete)
+
+    def test_under_budget_roster_is_rejected(self):
+        with self.assertRaises(RosterImportError) as error:
+            import_rosters(self.league, self.rows([40] * TEAM_SIZE, team_of_first='Alpha'))
+        self.assertEqual(error.exception.errors, [f"manager: spends {40 * TEAM_SIZE}, a full team must spend exactly the {BUDGET} budget."])
+
+
+class AuctionTestMixin:
+    """Ligue de `team_count` équipes et mises complètes (12 coureurs, budget entier)."""
+
+    def make_league(self, team_count, name='Ligue'):
+        creator = User.objects.create_user(f'{name}_creator')
+        league = League.objects.create(name=name, creator=creator, competition=Competition.objects.create(name='Tour'), is_active=True)
+        teams = [
+            Team.objects.create(player=User.objects.create_user(f'{name}_player_{i}'), league=league)
+            for i in range(team_count)
+        ]
+        return league, teams
+
+    def make_riders(self, count, value=10):
+        start = Cyclist.objects.count()
+        return Cyclist.objects.bulk_create([Cyclist(name=f'Rider {start + i}', team='Team', value=value) for i in range(count)])
+
+    def bid(self, league, team, riders, prices, round_number=1, submitted_at=None):
+        auction = LeagueAuction.objects.create(league=league, team=team, round_number=round_number)
+        if submitted_at is not None:
+            LeagueAuction.objects.filter(pk=auction.pk).update(submitted_at=submitted_at)
+        TeamCyclistAuction.objects.bulk_create([
+            TeamCyclistAuction(league_auction=auction, cyclist=rider, price=price, status='pending')
+            for rider, price in zip(riders, prices)
+        ])
+        return auction
+
+    @staticmethod
+    def full_budget_prices():
+        return [BUDGET - 40 * (TEAM_SIZE - 1)] + [40] * (TEAM_SIZE - 1)
+
+
+class ResolveAuctionsTests(AuctionTestMixin, TestCase):
+    """resolve_auctions_for_league : nombre de requêtes fixe, égalités départagées par la date de soumission."""
+
+    # round verrouillé, équipes, dernières mises, mises en attente, coureurs possédés, statuts,
+    # effectifs, journal, clôture du round, compétition et round suivant, registre des équipes
+    # (lecture, écriture) ; savepoint compris
+    RESOLVE_QUERIES = 15
+
+    def resolve_league(self, team_count):
+        league, teams = self.make_league(team_count, name=f'L{team_count}')
+        shared = self.make_riders(1)[0]
+        now = timezone.now()
+        for index, team in enumerate(teams):
+            riders = [shared] + self.make_riders(TEAM_SIZE - 1)
+            # Même prix sur le coureur commun : la soumission la plus ancienne l'emporte
+            self.bid(league, team, riders, self.full_budget_prices(), submitted_at=now - datetime.timedelta(minutes=team_count - index))
+        with CaptureQueriesContext(connection) as queries:
+            result = resolve_auctions_for_league(league.id, 1)
+        return league, teams, shared, result, len(queries.captured_queries)
+
+    def test_query_count_does_not_depend_on_team_count(self):
+        self.assertEqual(self.resolve_league(3)[-1], self.RESOLVE_QUERIES)
+        self.assertEqual(self.resolve_league(6)[-1], self.RESOLVE_QUERIES)
+
+    def test_ties_go_to_earliest_submission(self):
+        league, teams, shared, result, _ = self.resolve_league(3)
+        self.assertEqual(result.assignments[shared.id], teams[0].id)
+        self.assertEqual(result.won_count, 1 + 3 * (TEAM_SIZE - 1))
+        self.assertEqual(result.lost_count, 2)
+        self.assertTrue(result.round_closed)
+        self.assertFalse(result.league_finished)
+        self.assertEqual(TeamCyclist.objects.get(league=league, cyclist=shared).team_id, teams[0].id)
+        statuses = dict(TeamCyclistAuction.objects.filter(cyclist=shared).values_list('league_auction__team_id', 'status'))
+        self.assertEqual(statuses, {teams[0].id: 'won', teams[1].id: 'lost', teams[2].id: 'lost'})
+        teams[0].refresh_from_db()
+        self.assertTrue(teams[0].is_complete)
+        self.assertTrue(LeagueRound.objects.get(league=league, round_number=2).is_active)
+
+    def test_stale_version_is_not_resolved(self):
+        league, teams = self.make_league(1)
+        self.bid(league, teams[0], self.make_riders(TEAM_SIZE), self.full_budget_prices())
+        league_round = LeagueRound.objects.get(league=league, round_number=1)
+        league_round.bump_version()
+        self.assertIsNone(resolve_auctions_for_league(league.id, 1, expected_version=league_round.version))
+        self.assertFalse(TeamCyclist.objects.filter(league=league).exists())
+
+
+class RoundReadinessTests(AuctionTestMixin, TestCase):
+    def test_readiness_in_one_query(self):
+        league, teams = self.make_league(4)
+        riders = self.make_riders(TEAM_SIZE)
+        self.bid(league, teams[0], riders[:5], [10] * 5)
+        self.bid(league, teams[0], riders, self.full_budget_prices())
+        self.bid(league, teams[1], riders[:3], [10] * 3)
+        league_round = LeagueRound.objects.get(league=league, round_number=1)
+        with self.assertNumQueries(1):
+            readiness = league_round.readiness()
+            by_team = {team.team_id: team for team in readiness.teams}
+        self.assertEqual(by_team[teams[0].id].bid_count, TEAM_SIZE)
+        self.assertTrue(by_team[teams[0].id].is_ready)
+        self.assertEqual(by_team[teams[1].id].bid_count, 3)
+        self.assertFalse(by_team[teams[1].id].is_ready)
+        self.assertIsNone(by_team[teams[2].id].latest_auction_id)
+        self.assertFalse(readiness.all_ready)
+
+
+class LatestAuctionTests(AuctionTestMixin, TestCase):
+    def test_latest_for_round_in_one_query(self):
+        league, teams = self.make_league(3)
+        now = timezone.now()
+        latest = {}
+        for team in teams:
+            for minutes in (3, 1, 2):
+                auction = self.bid(league, team, [], [], submitted_at=now - datetime.timedelta(minutes=minutes))
+                if minutes == 1:
+                    latest[team.id] = auction.id
+        self.bid(league, teams[0], [], [], round_number=2)
+        with self.assertNumQueries(1):
+            auctions = LeagueAuction.latest_for_round(league, 1)
+        self.assertEqual({team_id: auction.id for team_id, auction in auctions.items()}, latest)
+
+
+class AuctionSubmissionServiceTests(AuctionTestMixin, TestCase):
+    """Chemins de validation de la soumission et nombre de requêtes de chacun."""
+
+    # Lectures : équipe, round, coureurs ; sous le verrou du round : round, soumission, mises,
+    # version du round ; file de résolution (lecture, création) ; savepoints compris
+    SUBMIT_QUERIES = 13
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.league, (cls.team,) = cls().make_league(1)
+        cls.player = cls.team.player
+        cls.riders = cls().make_riders(TEAM_SIZE + 1)
+
+    def submit(self, selected):
+        return AuctionSubmissionService(self.league, self.player).submit(selected)
+
+    def selection(self, prices=None, riders=None):
+        riders = riders or self.riders[:TEAM_SIZE]
+        return [{'id': rider.id, 'price': price} for rider, price in zip(riders, prices or self.full_budget_prices())]
+
+    def assertRejected(self, selected, message, queries, status=400):
+        with self.assertNumQueries(queries), self.assertRaises(SubmissionError) as error:
+            self.submit(selected)
+        self.assertIn(message, error.exception.message)
+        self.assertEqual(error.exception.status, status)
+
+    def test_validation_paths(self):
+        self.assertRejected([{'id': 'x', 'price': 1}], 'Invalid data', 0)
+        self.assertRejected(self.selection(riders=[self.riders[0]] * TEAM_SIZE), 'Duplicate cyclists', 0)
+        self.assertRejected(self.selection()[:TEAM_SIZE - 1], 'at least 12 cyclists', 2)
+        self.assertRejected(self.selection() + [{'id': 0, 'price': 1}], 'Invalid cyclist', 3)
+        self.assertRejected(self.selection([5] + self.full_budget_prices()[1:]), 'below minimum', 3)
+        self.assertRejected(self.selection([40] * TEAM_SIZE), 'does not match budget', 3)
+        self.assertFalse(LeagueAuction.objects.exists())
+
+    def test_submission_queries_do_not_depend_on_bid_count(self):
+        with self.assertNumQueries(self.SUBMIT_QUERIES):
+            submission = self.submit(self.selection())
+        self.assertEqual(submission.metrics.query_count, self.SUBMIT_QUERIES)
+        # Même état de départ (pas encore de tâche de résolution), une mise de plus
+        AuctionResolutionJob.objects.all().delete()
+        prices = [BUDGET - 30 * TEAM_SIZE] + [30] * TEAM_SIZE
+        with self.assertNumQueries(self.SUBMIT_QUERIES):
+            submission = self.submit(self.selection(prices, self.riders))
+        self.assertEqual(submission.league_auction.bids.count(), TEAM_SIZE + 1)
+
+    def test_round_resolved_during_submission_is_rejected(self):
+        lock_current = LeagueRound.lock_current
+
+        def lock_after_resolution(league):
+            # Le round est résolu entre la lecture du round et son verrouillage
+            LeagueRound.objects.get(league=league, round_number=1).close_and_create_next()
+            return lock_current(league)
+
+        with mock.patch.object(LeagueRound, 'lock_current', side_effect=lock_after_resolution):
+            with self.assertRaises(SubmissionError) as error:
+                self.submit(self.selection())
+        self.assertEqual(error.exception.status, 409)
+        self.assertFalse(LeagueAuction.objects.exists())
+
+
+class AuctionResolutionJobTests(AuctionTestMixin, TestCase):
+    """File des rounds à résoudre : réarmement, reprise des jobs abandonnés et des échecs."""
+
+    def setUp(self):
+        self.league, self.teams = self.make_league(2, name='Queue')
+
+    def claim(self, **kwargs):
+        job = AuctionResolutionJob.claim_next(**kwargs)
+        self.assertIsNotNone(job)
+        return job
+
+    def backdate(self, job, **delta):
+        AuctionResolutionJob.objects.filter(pk=job.pk).update(updated_at=timezone.now() - datetime.timedelta(**delta))
+
+    def test_duplicate_enqueue_rearms_the_job(self):
+        AuctionResolutionJob.enqueue(self.league, 1)
+        AuctionResolutionJob.enqueue(self.league, 1)
+        job = AuctionResolutionJob.objects.get()
+        self.assertEqual((job.status, job.rerun), ('pending', False))
+        job = self.claim()
+        AuctionResolutionJob.enqueue(self.league, 1)
+        self.assertTrue(AuctionResolutionJob.objects.get().rerun)
+        # Aucune équipe n'a misé : le worker termine en 'waiting', mais l'événement reçu le relance
+        self.assertIsNone(job.process())
+        job = AuctionResolutionJob.objects.get()
+        self.assertEqual((job.status, job.rerun), ('pending', False))
+
+    def test_stale_running_job_is_reclaimed(self):
+        AuctionResolutionJob.enqueue(self.league, 1)
+        job = self.claim()
+        self.assertIsNone(AuctionResolutionJob.claim_next(stale_after=datetime.timedelta(minutes=5)))
+        self.backdate(job, minutes=10)
+        job = self.claim(stale_after=datetime.timedelta(minutes=5))
+        self.assertEqual((job.status, job.attempts), ('running', 2))
+
+    def test_process_waits_for_every_team(self):
+        riders = self.make_riders(TEAM_SIZE * 2)
+        self.bid(self.league, self.teams[0], riders[:TEAM_SIZE], self.full_budget_prices())
+        AuctionResolutionJob.enqueue(self.league, 1)
+        self.assertIsNone(self.claim().process())
+        self.assertEqual(AuctionResolutionJob.objects.get().status, 'waiting')
+        self.bid(self.league, self.teams[1], riders[TEAM_SIZE:], self.full_budget_prices())
+        AuctionResolutionJob.enqueue(self.league, 1)
+        self.assertIsNotNone(self.claim().process())
+        job = AuctionResolutionJob.objects.get()
+        self.assertEqual(job.status, 'done')
+        self.assertIsNotNone(job.resolved_at)
+
+    def test_failed_job_is_retried_after_backoff(self):
+        retry_after = datetime.timedelta(seconds=60)
+        AuctionResolutionJob.enqueue(self.league, 1)
+        with mock.patch.object(LeagueAuction, 'check_and_resolve', side_effect=RuntimeError('boom')):
+            with self.assertRaises(RuntimeError):
+                self.claim(retry_after=retry_after).process()
+        job = AuctionResolutionJob.objects.get()
+        self.assertEqual((job.status, job.attempts), ('failed', 1))
+        self.assertIn('boom', job.last_error)
+        self.assertIsNone(AuctionResolutionJob.claim_next(retry_after=retry_after))
+        self.backdate(job, minutes=2)
+        self.assertIsNone(self.claim(retry_after=retry_after).process())
+        job = AuctionResolutionJob.objects.get()
+        self.assertEqual((job.status, job.attempts), ('waiting', 0))
+
+        # Échecs répétés : le job n'est plus relancé, sauf par l'admin
+        AuctionResolutionJob.objects.filter(pk=job.pk).update(status='failed', attempts=AuctionResolutionJob.MAX_ATTEMPTS)
+        self.backdate(job, minutes=2)
+        self.assertIsNone(AuctionResolutionJob.claim_next(retry_after=retry_after))
+        self.assertEqual(AuctionResolutionJob.requeue(AuctionResolutionJob.objects.all()), 1)
+        self.assertEqual(self.claim().attempts, 1)
+
+
+class LeagueEventsTests(AuctionTestMixin, TestCase):
+    """Événements SSE : envoyés au commit, reçus par les flux abonnés de la ligue."""
+
+    def setUp(self):
+        self.broker = events.InProcessBroker()
+        patcher = mock.patch.object(events, 'get_broker', return_value=self.broker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+
+    def open_stream(self, league):
+        stream = events.stream(league.id)
+        # Le premier message abonne le flux (la boucle n'a pas besoin de tourner pour recevoir)
+        self.assertEqual(self.loop.run_until_complete(anext(stream)), 'retry: 5000\n\n')
+        self.addCleanup(self.loop.run_until_complete, stream.aclose())
+        return stream
+
+    def next_event(self, stream):
+        message = self.loop.run_until_complete(asyncio.wait_for(anext(stream), 1))
+        return message.split('\n', 1)[0].removeprefix('event: ')
+
+    def test_publish_waits_for_commit(self):
+        with mock.patch.object(self.broker, 'send') as send:
+            with self.captureOnCommitCallbacks() as callbacks:
+                events.publish(1, events.TEAM_SUBMITTED)
+                try:
+                    with transaction.atomic():
+                        events.publish(1, events.ROUND_RESOLVED)
+                        raise RuntimeError('rollback')
+                except RuntimeError:
+                    pass
+            send.assert_not_called()
+            # Seul l'événement hors du bloc annulé reste à envoyer au commit
+            self.assertEqual(len(callbacks), 1)
+            callbacks[0]()
+        send.assert_called_once_with(1, {'type': events.TEAM_SUBMITTED})
+
+    def test_stream_receives_submission_and_resolution(self):
+        league, (team,) = self.make_league(1, name='Events')
+        stream = self.open_stream(league)
+        riders = self.make_riders(TEAM_SIZE)
+        selected = [{'id': rider.id, 'price': price} for rider, price in zip(riders, self.full_budget_prices())]
+        with self.captureOnCommitCallbacks(execute=True):
+            AuctionSubmissionService(league, team.player).submit(selected)
+        self.assertEqual(self.next_event(stream), events.TEAM_SUBMITTED)
+        with self.captureOnCommitCallbacks(execute=True):
+            resolve_auctions_for_league(league.id, 1)
+        self.assertEqual(self.next_event(stream), events.ROUND_RESOLVED)
+        self.assertEqual(self.next_event(stream), events.AUCTION_FINISHED)
+
+    def test_closing_the_stream_unsubscribes(self):
+        league, _ = self.make_league(1, name='Closed')
+        stream = self.open_stream(league)
+        self.assertIn(league.id, self.broker._subscribers)
+        self.loop.run_until_complete(stream.aclose())
+        self.assertNotIn(league.id, self.broker._subscribers)
+
+    def test_non_member_gets_403_without_stream(self):
+        league, _ = self.make_league(1, name='Private')
+        client = Client()
+        client.force_login(User.objects.create_user('outsider'))
+        with mock.patch.object(events, 'stream') as stream:
+            response = client.get(reverse('league_events', args=[league.id]))
+        self.assertEqual(response.status_code, 403)
+        stream.assert_not_called()
+
+
+class AuctionSnapshotCacheTests(AuctionTestMixin, TestCase):
+    """Pages servies depuis le snapshot : ETag du build, revalidation, reconstruction après réouverture."""
+
+    def setUp(self):
+        cache.clear()
+        self.league, (team,) = self.make_league(1, name='Frozen')
+        self.bid(self.league, team, self.make_riders(TEAM_SIZE), self.full_budget_prices())
+        with self.captureOnCommitCallbacks(execute=True):
+            resolve_auctions_for_league(self.league.id, 1)
+        self.client = Client()
+        self.client.force_login(team.player)
+        self.url = reverse('league_team_status', args=[self.league.id])
+
+    def set_finished(self, finished):
+        league = League.objects.get(pk=self.league.pk)
+        league.auction_finished = finished
+        with self.captureOnCommitCallbacks(execute=True):
+            league.save()
+
+    def test_reopened_auction_is_revalidated_and_rebuilt(self):
+        response = self.client.get(self.url)
+        etag = response['ETag']
+        self.assertIn('no-cache', response['Cache-Control'])
+        entry = response.context['status_list'][0]
+        self.assertEqual((entry['submitted'], entry['finished'], entry['cyclist_count']), (True, True, TEAM_SIZE))
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # Réouverture par un admin : plus de snapshot, la page en direct est renvoyée
+        self.set_finished(None)
+        self.assertFalse(AuctionSnapshot.objects.filter(league=self.league).exists())
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('ETag'))
+
+        # Nouvelle clôture : snapshot reconstruit, l'ancien ETag ne valide plus la page
+        self.set_finished(True)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class SimulatorTests(AuctionTestMixin, TestCase):
+    """simulate : le rejeu par défaut reproduit resolve_auctions_for_league."""
+
+    def test_default_replay_matches_resolution(self):
+        league, teams = self.make_league(3)
+        shared = self.make_riders(1)[0]
+        now = timezone.now()
+        for index, team in enumerate(teams):
+            self.bid(league, team, [shared] + self.make_riders(TEAM_SIZE - 1), self.full_budget_prices(), submitted_at=now)
+        first = resolve_auctions_for_league(league.id, 1)
+        # Round 2 : l'équipe déjà complète surenchérit sur un coureur libre, une autre mise sur un coureur déjà attribué
+        extra = self.make_riders(1)[0]
+        self.bid(league, teams[1], [extra], [60], round_number=2)
+        self.bid(league, teams[0], [extra], [70], round_number=2)
+        self.bid(league, teams[2], [shared], [60], round_number=2)
+        second = resolve_auctions_for_league(league.id, 2)
+
+        result = simulate(AuctionHistory.load(league))
+        self.assertEqual(
+            result.assignments(), dict(TeamCyclist.objects.filter(league=league).values_list('cyclist_id', 'team_id')),
+        )
+        self.assertEqual(result.assignments()[extra.id], teams[0].id)
+        self.assertEqual(result.won_count, first.won_count + second.won_count)
+        # Variante what-if : l'équipe complète ne peut plus gagner
+        self.assertEqual(simulate(AuctionHistory.load(league), enforce_limits=True).assignments()[extra.id], teams[1].id)
+
+    def test_second_price(self):
+        history = AuctionHistory(
+            league_id=0, team_ids=[1, 2], cyclist_ids=[10, 20], min_values=[5, 8], round_numbers=[1],
+            rounds=[[(0, [(0, 0, 60, 0), (1, 0, 50, 1)]), (1, [(1, 1, 30, 2)])]],
+        )
+        result = simulate(history, pricing='second_price')
+        # Le gagnant paie la meilleure mise suivante, ou le prix minimum s'il est seul
+        self.assertEqual(result.spent, [50, 8])
+        self.assertEqual(result.assignments(), {10: 1, 20: 2})
+
+
+class AuctionResultsSearchTests(AuctionTestMixin, TestCase):
+    """La recherche des résultats porte sur le coureur, son équipe et les joueurs qui ont misé."""
+
+    def test_search_matches_rider_team_and_player(self):
+        league, teams = self.make_league(2, name='Search')
+        shared = self.make_riders(1)[0]
+        Cyclist.objects.filter(pk=shared.pk).update(team='Visma')
+        for team in teams:
+            self.bid(league, team, [shared] + self.make_riders(TEAM_SIZE - 1), self.full_budget_prices())
+        resolve_auctions_for_league(league.id, 1)
+
+        riders, _ = TeamCyclistAuction.results_page(league, search='visma')
+        self.assertEqual([rider.id for rider in riders], [shared.id])
+        riders, _ = TeamCyclistAuction.results_page(league, search='Search_player_1', limit=None)
+        self.assertEqual(len(riders), TEAM_SIZE)
+        rider = next(rider for rider in riders if rider.id == shared.id)
+        # Les agrégats restent calculés sur toutes les mises du coureur
+        self.assertEqual(rider.bid_count, 2)
+        self.assertEqual(rider.winner['player'], 'Search_player_0')
+
+        AuctionSnapshot.build(league)
+        data = AuctionSnapshot.objects.get(league=league).data
+        self.assertEqual([rider['id'] for rider in AuctionSnapshot.results_page(data, search='visma')[0]], [shared.id])
+        self.assertEqual(len(AuctionSnapshot.results_page(data, search='search_player_1')[0]), TEAM_SIZE)
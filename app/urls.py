@@ -1,11 +1,14 @@
 from django.urls import path
 
 from . import views
-from .views import TeamCreateView, LeagueTeamStatusView, AdminTeamEditView, LeagueTeamsListView, LeagueCreateView, LeagueJoinView, LeagueActivateView, HomepageView, StageSelectionView, CompetitionStagesView, StageSelectionLeagueView, PelotonView, LeagueResultsView
+from .views import TeamCreateView, LeagueTeamStatusView, AdminTeamEditView, LeagueTeamsListView, LeagueCreateView, LeagueJoinView, LeagueActivateView, HomepageView, StageSelectionView, CompetitionStagesView, StageSelectionLeagueView, PelotonView, LeagueResultsView, CyclistCatalogueView, LeagueAssignmentsView, LeagueEventsView
 
 urlpatterns = [
     path("", HomepageView.as_view(), name="homepage"),
     path("league/<int:league_id>/team/create/", TeamCreateView.as_view(), name="team_create"),
+    path("league/<int:league_id>/assignments/", LeagueAssignmentsView.as_view(), name="league_assignments"),
+    path("cyclists/catalogue/", CyclistCatalogueView.as_view(), name="cyclist_catalogue"),
+    path("league/<int:league_id>/events/", LeagueEventsView.as_view(), name="league_events"),
     path("league/<int:league_id>/team/status/", LeagueTeamStatusView.as_view(), name="league_team_status"),
     path("adminview/league/<int:league_id>/team/<int:user_id>/", AdminTeamEditView.as_view(), name="admin_team_edit"),
     path("league/<int:league_id>/teams/", LeagueTeamsListView.as_view(), name="league_teams_list"),
@@ -1,10 +1,13 @@
 # NOTE: You need to create 'team_create.html' in your templates directory and add the necessary JS for the team selection UI.
-from django.http import HttpResponse, JsonResponse, HttpResponseForbidden
+from django.http import HttpResponse, JsonResponse, HttpResponseForbidden, HttpResponseNotModified, StreamingHttpResponse
 from django.views import View
 from django.shortcuts import render, get_object_or_404, redirect
+from django.urls import reverse
+from django.utils.cache import patch_cache_control
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
 from django.contrib.auth.decorators import login_required
 from django.utils.decorators import method_decorator
-from .models import Cyclist, Team, League, TeamCyclistAuction, User, Competition, LeagueAuction, TeamCyclist, LeagueRound, Stage, StageSelection, StageSelectionBonus, BonusConfig, Role, StageSelectionRider, DefaultStageSelection, DefaultStageSelectionRider, StageGeneralResult, GeneralTimeResult, PointsGeneralResult, PointsTodayResult, KOMGeneralResult, KOMTodayResult, YouthGeneralResult, YouthTodayResult, TeamGeneralResult, TeamTodayResult
+from .models import Cyclist, Team, League, TeamCyclistAuction, User, Competition, LeagueAuction, TeamCyclist, LeagueRound, Stage, StageSelection, StageSelectionBonus, BonusConfig, Role, StageSelectionRider, DefaultStageSelection, DefaultStageSelectionRider, StageGeneralResult, GeneralTimeResult, PointsGeneralResult, PointsTodayResult, KOMGeneralResult, KOMTodayResult, YouthGeneralResult, YouthTodayResult, TeamGeneralResult, TeamTodayResult, LeagueAssignment, AuctionSnapshot, BUDGET
 from django.views.decorators.csrf import csrf_exempt
 import json
 from django.contrib.auth.mixins import LoginRequiredMixin
@@ -13,11 +16,12 @@ from django import forms
 from collections import defaultdict
 from django.utils import timezone
 from .forms import StageSelectionForm
-from datetime import datetime, time as dt_time
+from .services import AuctionSubmissionService, SubmissionError
+from . import events
+from django.db import transaction
 from django.db.models import Count, Sum
-from django.db.models import Prefetch
 
-BUDGET = 500
+logger = logging.getLogger(__name__)
 
 @method_decorator(login_required, name='dispatch')
 class TeamCreateView(View):
@@ -33,13 +37,8 @@ class TeamCreateView(View):
         league_auction = None
         if team:
             league_auction = LeagueAuction.get_latest_for_team_and_round(league, team, current_round)
-        # Cyclistes déjà attribués à une équipe (TeamCyclist)
-        team_cyclist_objs = TeamCyclist.objects.filter(league=league).select_related('cyclist', 'team', 'team__player')
-        locked_cyclists = {}
-        for tc in team_cyclist_objs:
-            locked_cyclists[tc.cyclist.id] = {'locked': True, 'assigned_to': tc.team.player.username}
-        # Tous les cyclistes (pour affichage à gauche)
-        cyclists = Cyclist.objects.all()
+        # Les coureurs déjà attribués ne sont pas chargés ici : la page rejoue le flux
+        # d'attributions (LeagueAssignmentsView) depuis la version gardée par le navigateur
         # Sélection du round en cours (TeamCyclistAuction du LeagueAuction courant)
         selected_cyclists = []
         if league_auction:
@@ -58,9 +57,9 @@ class TeamCreateView(View):
             ]
         # Cyclistes déjà dans la team (TeamCyclist pour ce team/league)
         team_cyclists = []
-        teamcyclist_total = 0
+        remaining_budget = BUDGET
         if team:
-            team_cyclists_qs = list(TeamCyclist.objects.filter(team=team, league=league).select_related('cyclist'))
+            team_cyclists_qs = TeamCyclist.objects.filter(team=team, league=league).select_related('cyclist')
             team_cyclists = [
                 {
                     'id': tc.cyclist.id,
@@ -71,16 +70,15 @@ class TeamCreateView(View):
                 }
                 for tc in team_cyclists_qs
             ]
-            teamcyclist_total = sum(tc.price for tc in team_cyclists_qs)
-        remaining_budget = BUDGET - teamcyclist_total
+            remaining_budget = team.remaining_budget
         editing_allowed = league.is_active
         return render(request, 'team_create.html', {
-            'cyclists': cyclists,
+            # Le catalogue des coureurs est chargé à part (CyclistCatalogueView)
+            'catalogue_url': catalogue_url(),
             'budget': BUDGET,
             'remaining_budget': remaining_budget,
             'league': league,
             'selected_cyclists': selected_cyclists or [],
-            'locked_cyclists': locked_cyclists,
             'editing_allowed': editing_allowed,
             'team_cyclists': team_cyclists,
             'auction_finished': league.auction_finished,
@@ -89,61 +87,78 @@ class TeamCreateView(View):
     @csrf_exempt
     def post(self, request, league_id, *args, **kwargs):
         league = get_object_or_404(League, id=league_id)
-        user = request.user
-        team = Team.objects.filter(player=user, league=league).first()
-        teamcyclist_total = 0
-        team_cyclists_qs = []
-        if team:
-            team_cyclists_qs = list(TeamCyclist.objects.filter(team=team, league=league).select_related('cyclist'))
-            teamcyclist_total = sum(tc.price for tc in team_cyclists_qs)
-        remaining_budget = BUDGET - teamcyclist_total
-        # Déterminer le round courant dynamiquement
-        current_round = LeagueRound.objects.filter(league=league).order_by('-round_number').first().round_number
+        return submit_auction(request, league, request.user)
+
+def submit_auction(request, league, player):
+    """Soumission des mises de `player` (joueur ou admin pour son compte) via AuctionSubmissionService."""
+    try:
+        data = json.loads(request.body)
+        selected = data.get('cyclists', [])
+    except Exception:
+        return JsonResponse({'error': 'Invalid data.'}, status=400)
+    try:
+        submission = AuctionSubmissionService(league, player).submit(selected)
+    except SubmissionError as exc:
+        return JsonResponse({'error': exc.message}, status=exc.status)
+    response = JsonResponse({'success': True})
+    response['Server-Timing'] = (
+        f'submit;dur={submission.metrics.duration_ms:.1f};desc="{submission.metrics.query_count} queries"'
+    )
+    return response
+
+def catalogue_url():
+    return f"{reverse('cyclist_catalogue')}?v={Cyclist.catalogue_version()}"
+
+class CyclistCatalogueView(LoginRequiredMixin, View):
+    """
+    Compact JSON catalogue of all riders for the team builder. Identical for every player,
+    it is cached per version and can be cached by the browser when requested with ?v=<version>.
+    """
+    def get(self, request, *args, **kwargs):
+        version = Cyclist.catalogue_version()
+        etag = f'"{version}"'
+        if request.headers.get('If-None-Match') == etag:
+            response = HttpResponseNotModified()
+        else:
+            response = JsonResponse(Cyclist.catalogue(version))
+        response['ETag'] = etag
+        if request.GET.get('v') == version:
+            patch_cache_control(response, private=True, max_age=60 * 60 * 24)
+        else:
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+class LeagueAssignmentsView(LoginRequiredMixin, View):
+    """
+    Incremental feed of rider assignments for a league: returns the assignments logged
+    after ?since=<version> and the new version to poll with.
+    """
+    def get(self, request, league_id, *args, **kwargs):
+        league = get_object_or_404(League, id=league_id)
+        if not request.user.is_superuser and not Team.objects.filter(player=request.user, league=league).exists():
+            return HttpResponseForbidden("You are not a member of this league.")
         try:
-            data = json.loads(request.body)
-            selected = data.get('cyclists', [])
-        except Exception:
-            return JsonResponse({'error': 'Invalid data.'}, status=400)
-        # Nouvelle règle : joueurs déjà dans l'équipe + sélection >= 12
-        total_cyclists = len(team_cyclists_qs)
-        if total_cyclists + len(selected) < 12:
-            return JsonResponse({'error': 'You must have at least 12 cyclists in total (current team + selection).'}, status=400)
-        cyclist_ids = [c['id'] for c in selected]
-        if len(set(cyclist_ids)) != len(cyclist_ids):
-            return JsonResponse({'error': 'Duplicate cyclists.'}, status=400)
-        cyclists = list(Cyclist.objects.filter(id__in=cyclist_ids))
-        cyclist_map = {cy.id: cy for cy in cyclists}
-        if len(cyclists) != len(selected):
-            return JsonResponse({'error': 'Invalid cyclist(s).'}, status=400)
-        total = 0
-        for c in selected:
-            cyclist = cyclist_map.get(c['id'])
-            if not cyclist:
-                return JsonResponse({'error': 'Cyclist not found.'}, status=400)
-            price = float(c['price'])
-            if price < cyclist.value:
-                return JsonResponse({'error': f'Price for {cyclist.name} below minimum.'}, status=400)
-            total += price
-        if total != remaining_budget:
-            return JsonResponse({'error': f'Total spent ({total}) does not match budget ({BUDGET}).'}, status=400)
-        # Créer une nouvelle LeagueAuction pour ce team/league/round
-        if not team:
-            team = Team.objects.create(player=user, league=league)
-        league_auction = LeagueAuction.objects.create(league=league, team=team, round_number=current_round)
-        # Créer les TeamCyclistAuction associés
-        cyclist_map = {cy.id: cy for cy in cyclists}
-        tca_objs = [
-            TeamCyclistAuction(
-                league_auction=league_auction,
-                cyclist=cyclist_map[c['id']],
-                price=float(c['price']),
-                status='pending'
-            )
-            for c in selected
-        ]
-        TeamCyclistAuction.objects.bulk_create(tca_objs)
-        league_auction.check_and_resolve_auction()
-        return JsonResponse({'success': True})
+            since = int(request.GET.get('since', 0))
+        except ValueError:
+            return JsonResponse({'error': 'Invalid version.'}, status=400)
+        version, assignments = LeagueAssignment.since(league, since)
+        return JsonResponse({'version': version, 'assignments': assignments})
+
+class LeagueEventsView(View):
+    """
+    Flux SSE des événements d'enchères d'une ligue (soumissions, résolutions, fin des enchères).
+    Vue asynchrone : une connexion ouverte ne coûte aucune requête entre deux événements.
+    """
+    async def get(self, request, league_id, *args, **kwargs):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return HttpResponseForbidden("Login required.")
+        if not user.is_superuser and not await Team.objects.filter(player=user, league_id=league_id).aexists():
+            return HttpResponseForbidden("You are not a member of this league.")
+        response = StreamingHttpResponse(events.stream(league_id), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
 
 @method_decorator(login_required, name='dispatch')
 class LeagueTeamStatusView(View):
@@ -153,49 +168,45 @@ class LeagueTeamStatusView(View):
         if not Team.objects.filter(player=request.user, league=league).exists():
             return HttpResponseForbidden("You are not a member of this league.")
         # Déterminer le round courant dynamiquement
-        current_round = LeagueRound.objects.filter(league=league).order_by('-round_number').first().round_number
-        # Get all teams (members) and prefetch cyclists
-        teams = Team.objects.filter(league=league).select_related('player').prefetch_related('team_cyclists')
-        # Prefetch all TeamCyclists for these teams in this league
-        teamcyclists = TeamCyclist.objects.filter(league=league)
-        teamcyclists_by_team = {}
-        for tc in teamcyclists:
-            teamcyclists_by_team.setdefault(tc.team_id, []).append(tc)
-        # Batch fetch latest auctions for all teams
-        auctions = {team.id: LeagueAuction.get_latest_for_team_and_round(league, team, current_round) for team in teams}
-        # Batch fetch all TeamCyclistAuctions for these auctions
-        auction_ids = [a.id for a in auctions.values() if a]
-        auction_cyclist_counts = {}
-        if auction_ids:
-            from django.db.models import Count as DJCount
-            counts = TeamCyclistAuction.objects.filter(league_auction_id__in=auction_ids).values('league_auction_id').annotate(count=DJCount('id'))
-            auction_cyclist_counts = {c['league_auction_id']: c['count'] for c in counts}
-        status_list = []
-        for team in teams:
-            user = team.player
-            league_auction = auctions.get(team.id)
-            team_cyclists = teamcyclists_by_team.get(team.id, [])
-            team_cyclist_count = len(team_cyclists)
-            teamcyclist_total = sum(tc.price for tc in team_cyclists)
-            remaining_budget = BUDGET - teamcyclist_total
-            if league_auction:
-                cyclist_count = auction_cyclist_counts.get(league_auction.id, 0)
-                submitted = cyclist_count > 0
-            else:
-                cyclist_count = 0
-                submitted = False
-            finished = False
-            if remaining_budget == 0 and team_cyclist_count >= 12:
-                finished = True
-            status_list.append({
-                'username': user.username,
-                'submitted': submitted,
-                'finished': finished,
-                'cyclist_count': cyclist_count,
-                'team_cyclist_count': team_cyclist_count,
-                'user_id': user.id,
-                'remaining_budget': remaining_budget,
-            })
+        league_round = LeagueRound.objects.filter(league=league).order_by('-round_number').first()
+        current_round = league_round.round_number
+        snapshot = AuctionSnapshot.for_league(league)
+        if snapshot is not None:
+            # Situation du dernier round, figée par AuctionSnapshot.build
+            status_list = [
+                {
+                    'team_id': team['team_id'],
+                    'username': team['player'],
+                    'submitted': team['submitted'],
+                    'finished': team['finished'],
+                    'cyclist_count': team['bid_count'],
+                    'team_cyclist_count': team['roster_count'],
+                    'user_id': team['player_id'],
+                    'remaining_budget': BUDGET - team['spent'],
+                }
+                for team in snapshot['teams']
+            ]
+            return snapshot_response(request, snapshot, lambda: render(request, 'league_team_status.html', {
+                'league': league,
+                'status_list': status_list,
+                'current_user_id': request.user.id,
+                'current_round': current_round,
+                'auction_finished': league.auction_finished,
+            }))
+        # Une seule requête pour le roster, le budget et la dernière soumission de chaque équipe
+        status_list = [
+            {
+                'team_id': team.team_id,
+                'username': team.username,
+                'submitted': team.submitted,
+                'finished': team.is_finished,
+                'cyclist_count': team.bid_count,
+                'team_cyclist_count': team.roster_count,
+                'user_id': team.player_id,
+                'remaining_budget': team.remaining_budget,
+            }
+            for team in league_round.readiness().teams
+        ]
         return render(request, 'league_team_status.html', {
             'league': league,
             'status_list': status_list,
@@ -220,11 +231,6 @@ class AdminTeamEditView(View):
         league_auction = None
         if team:
             league_auction = LeagueAuction.get_latest_for_team_and_round(league, team, current_round)
-        team_cyclist_objs = TeamCyclist.objects.filter(league=league)
-        locked_cyclists = {}
-        for tc in team_cyclist_objs.select_related('cyclist', 'team'):
-            locked_cyclists[tc.cyclist.id] = {'locked': True, 'assigned_to': tc.team.player.username}
-        cyclists = Cyclist.objects.all()
         selected_cyclists = []
         if league_auction:
             teamcyclists = TeamCyclistAuction.objects.select_related('cyclist').filter(league_auction=league_auction)
@@ -240,7 +246,7 @@ class AdminTeamEditView(View):
                 for tc in teamcyclists
             ]
         team_cyclists = []
-        teamcyclist_total = 0
+        remaining_budget = BUDGET
         if team:
             team_cyclists_qs = TeamCyclist.objects.filter(team=team, league=league).select_related('cyclist')
             team_cyclists = [
@@ -253,18 +259,17 @@ class AdminTeamEditView(View):
                 }
                 for tc in team_cyclists_qs
             ]
-            teamcyclist_total = sum(tc.price for tc in team_cyclists_qs)
-        remaining_budget = BUDGET - teamcyclist_total
+            remaining_budget = team.remaining_budget
         editing_allowed = True
         return render(request, 'team_create.html', {
-            'cyclists': cyclists,
+            # Le catalogue des coureurs est chargé à part (CyclistCatalogueView)
+            'catalogue_url': catalogue_url(),
             'budget': BUDGET,
             'remaining_budget': remaining_budget,
             'league': league,
             'selected_cyclists': selected_cyclists or [],
             'admin_mode': True,
             'target_user': self.target_user,
-            'locked_cyclists': locked_cyclists,
             'editing_allowed': editing_allowed,
             'team_cyclists': team_cyclists,
             'auction_finished': league.auction_finished,
@@ -272,79 +277,28 @@ class AdminTeamEditView(View):
 
     @csrf_exempt
     def post(self, request, league_id, user_id, *args, **kwargs):
-        league = self.league
-        team = Team.objects.filter(player=self.target_user, league=league).first()
-        teamcyclist_total = 0
-        if team:
-            team_cyclists_qs = TeamCyclist.objects.filter(team=team, league=league).select_related('cyclist')
-            teamcyclist_total = sum(tc.price for tc in team_cyclists_qs)
-        remaining_budget = BUDGET - teamcyclist_total
-        current_round = LeagueRound.objects.filter(league=league).order_by('-round_number').first().round_number
-        try:
-            data = json.loads(request.body)
-            selected = data.get('cyclists', [])
-        except Exception:
-            return JsonResponse({'error': 'Invalid data.'}, status=400)
-        # Nouvelle règle : joueurs déjà dans l'équipe + sélection >= 12
-        total_cyclists = teamcyclist_total and team_cyclists_qs.count() or 0
-        if total_cyclists + len(selected) < 12:
-            return JsonResponse({'error': 'You must have at least 12 cyclists in total (current team + selection).'}, status=400)
-        cyclist_ids = [c['id'] for c in selected]
-        if len(set(cyclist_ids)) != len(cyclist_ids):
-            return JsonResponse({'error': 'Duplicate cyclists.'}, status=400)
-        cyclists = Cyclist.objects.filter(id__in=cyclist_ids)
-        if cyclists.count() != len(selected):
-            return JsonResponse({'error': 'Invalid cyclist(s).'}, status=400)
-        total = 0
-        for c in selected:
-            cyclist = next((cy for cy in cyclists if cy.id == c['id']), None)
-            print(cyclist)
-            if not cyclist:
-                return JsonResponse({'error': 'Cyclist not found.'}, status=400)
-            print("----------")
-            price = float(c['price'])
-            print(price)
-            print(cyclist.value)
-            print("----------")
-            if price < cyclist.value:
-                return JsonResponse({'error': f'Price for {cyclist.name} below minimum.'}, status=400)
-            total += price
-        if total != remaining_budget:
-            return JsonResponse({'error': f'Total spent ({total}) does not match budget ({BUDGET}).'}, status=400)
-        if not team:
-            team = Team.objects.create(player=self.target_user, league=league)
-        league_auction = LeagueAuction.objects.create(league=league, team=team, round_number=current_round)
-        for c in selected:
-            cyclist = next((cy for cy in cyclists if cy.id == c['id']), None)
-            TeamCyclistAuction.objects.create(league_auction=league_auction, cyclist=cyclist, price=float(c['price']), status='pending')
-        logger = logging.getLogger(__name__)
-        logger.info(f"Admin {request.user} edited team for user {self.target_user} in league {league}")
-        league_auction.check_and_resolve_auction()
-        return JsonResponse({'success': True})
+        response = submit_auction(request, self.league, self.target_user)
+        if response.status_code == 200:
+            logger.info(f"Admin {request.user} edited team for user {self.target_user} in league {self.league}")
+        return response
 
 class LeagueTeamsListView(LoginRequiredMixin, View):
     def get(self, request, league_id, *args, **kwargs):
         league = get_object_or_404(League, id=league_id)
-        teams = Team.objects.filter(league=league).select_related('player')
-        teams_data = []
-        for team in teams:
-            cyclists = TeamCyclist.objects.filter(team=team, league=league).select_related('cyclist')
-            cyclists_data = [
-                {
-                    'name': tc.cyclist.name,
-                    'team': tc.cyclist.team,
-                    'price': tc.price,
-                    'min_value': tc.cyclist.value,
-                }
-                for tc in cyclists
-            ]
-            teams_data.append({
-                'player': team.player.username,
-                'cyclists': cyclists_data,
-            })
+        snapshot = AuctionSnapshot.for_league(league)
+        if snapshot is not None:
+            return snapshot_response(request, snapshot, lambda: render(request, 'league_teams_list.html', {
+                'league': league,
+                'roster_version': f"snapshot-{snapshot['build_id']}",
+                'teams_data': snapshot['teams'],
+                'auction_finished': league.auction_finished,
+            }))
+        # Le fragment rendu est mis en cache par version des effectifs : les effectifs ne sont
+        # chargés (Team.league_rosters, appelé par le template) qu'en cas d'absence du cache
         return render(request, 'league_teams_list.html', {
             'league': league,
-            'teams_data': teams_data,
+            'roster_version': Team.roster_version(league),
+            'teams_data': lambda: Team.league_rosters(league),
             'auction_finished': league.auction_finished,
         })
 
@@ -413,41 +367,59 @@ class HomepageView(LoginRequiredMixin, View):
             'leagues': leagues,
         })
 
+def encode_results_cursor(cursor):
+    return urlsafe_base64_encode(json.dumps(cursor).encode()) if cursor else ''
+
+def decode_results_cursor(value):
+    try:
+        top_price, name_key, cyclist_id = json.loads(urlsafe_base64_decode(value))
+        return float(top_price), str(name_key), int(cyclist_id)
+    except (TypeError, ValueError):
+        return None
+
+def snapshot_response(request, snapshot, render_page):
+    """
+    Page servie depuis le snapshot, validée par son build id comme le catalogue des coureurs :
+    le navigateur revalide à chaque affichage (304 sans rendu tant que le snapshot est le même),
+    et voit aussitôt la page en direct quand un admin rouvre les enchères.
+    """
+    etag = f'"snapshot-{snapshot["build_id"]}-{request.user.id}"'
+    if request.headers.get('If-None-Match') == etag:
+        response = HttpResponseNotModified()
+    else:
+        response = render_page()
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
 class LeagueAuctionResultsView(LoginRequiredMixin, View):
+    """
+    Résultats des enchères groupés par coureur (tri et regroupement en SQL), paginés par curseur :
+    le coût d'une page ne dépend pas de la longueur de l'historique affiché.
+    """
     def get(self, request, league_id):
         league = get_object_or_404(League, id=league_id)
         if not Team.objects.filter(player=request.user, league=league).exists():
             return HttpResponseForbidden("You are not a member of this league.")
-        # Récupérer toutes les enchères de la ligue, tous rounds confondus
-        all_bids = TeamCyclistAuction.objects.filter(
-            league_auction__league=league
-        ).select_related('cyclist', 'league_auction__team__player', 'league_auction')
-        # On prépare une liste à plat avec round, joueur, coureur, prix, statut
-        flat_bids = [
-            {
-                'round': bid.league_auction.round_number,
-                'player': bid.league_auction.team.player.username,
-                'cyclist': bid.cyclist,
-                'cyclist_id': bid.cyclist.id,
-                'price': bid.price,
-                'status': bid.status,
-            }
-            for bid in all_bids
-            if bid.status in ('won', 'lost', 'Won', 'Lost')
-        ]
-        # Pour chaque cycliste, trouver le prix d'achat max (enchère gagnante)
-        max_price_by_cyclist = defaultdict(float)
-        for b in flat_bids:
-            if b['status'] == 'won':
-                max_price_by_cyclist[b['cyclist_id']] = max(max_price_by_cyclist[b['cyclist_id']], b['price'])
-        # Ordonner : cycliste avec le prix d'achat max le plus élevé en premier, puis pour chaque cycliste, enchères décroissantes
-        # en cas d'égalité d'enchères, le gagnant en premier
-        flat_bids.sort(key=lambda b: (-max_price_by_cyclist.get(b['cyclist_id'], 0), b['cyclist'].name.lower(), -b['price'], -1 if b['status'] == 'won' else 1))
-        return render(request, 'auction_results.html', {
-            'league': league,
-            'flat_bids': flat_bids,
-            'auction_finished': league.auction_finished,
-        })
+        search = request.GET.get('q', '').strip()
+        after = decode_results_cursor(request.GET['after']) if request.GET.get('after') else None
+        snapshot = AuctionSnapshot.for_league(league)
+
+        def render_page():
+            if snapshot is not None:
+                riders, next_cursor = AuctionSnapshot.results_page(snapshot, after=after, search=search)
+            else:
+                riders, next_cursor = TeamCyclistAuction.results_page(league, after=after, search=search)
+            return render(request, 'auction_results.html', {
+                'league': league,
+                'riders': riders,
+                'search': search,
+                'is_first_page': after is None,
+                'next_cursor': encode_results_cursor(next_cursor),
+                'auction_finished': league.auction_finished,
+            })
+
+        return render_page() if snapshot is None else snapshot_response(request, snapshot, render_page)
 
 class CompetitionStagesView(LoginRequiredMixin, View):
     """
@@ -463,7 +435,7 @@ class CompetitionStagesView(LoginRequiredMixin, View):
 
 class StageSelectionView(LoginRequiredMixin, View):
     """
-    View for players to select up to 8 riders for a given stage. Selection is locked after 12:00 PM on the stage date.
+    View for players to select up to 8 riders for a given stage. Selection is locked at the stage's lock time (Stage.lock_at).
     Only riders from the validated team can be selected.
     """
     def get(self, request, stage_id, *args, **kwargs):
@@ -471,10 +443,7 @@ class StageSelectionView(LoginRequiredMixin, View):
         team = Team.objects.filter(player=request.user, league__competition=stage.competition).first()
         if not team:
             return HttpResponseForbidden("You do not have a team for this competition.")
-        # Lock selection after 12:00 PM on stage date
-        now = timezone.localtime()
-        lock_time = timezone.make_aware(datetime.combine(stage.date, dt_time(12, 0)))
-        locked = now >= lock_time
+        locked = stage.is_locked
         selection = StageSelection.objects.filter(team=team, stage=stage).first()
         form = StageSelectionForm(instance=selection, team=team)
         return render(request, 'stage_selection.html', {
@@ -489,10 +458,8 @@ class StageSelectionView(LoginRequiredMixin, View):
         team = Team.objects.filter(player=request.user, league__competition=stage.competition).first()
         if not team:
             return HttpResponseForbidden("You do not have a team for this competition.")
-        now = timezone.localtime()
-        lock_time = timezone.make_aware(datetime.combine(stage.date, dt_time(12, 0)))
-        if now >= lock_time:
-            return HttpResponseForbidden("Selection is locked for this stage (after 12:00 PM).")
+        if stage.is_locked:
+            return HttpResponseForbidden("Selection is locked for this stage.")
         selection, created = StageSelection.objects.get_or_create(team=team, stage=stage)
         form = StageSelectionForm(request.POST, instance=selection, team=team)
         if form.is_valid():
@@ -505,14 +472,18 @@ class StageSelectionView(LoginRequiredMixin, View):
             'selection': selection,
         })
 
-def get_current_stage(competition):
+def get_current_stage(competition, stages=None):
     """
     Returns the current stage of the competition.
     If there's a stage today, returns that stage.
     If not, returns the next upcoming stage.
     If no upcoming stages, returns the last stage.
+    With `stages` (the competition's stages ordered by date), it is picked without querying.
     """
     today = timezone.localtime().date()
+    if stages is not None:
+        upcoming = [stage for stage in stages if stage.date >= today]
+        return upcoming[0] if upcoming else (stages[-1] if stages else None)
     
     # Try to get today's stage
     stage = Stage.objects.filter(
@@ -540,122 +511,83 @@ class StageSelectionLeagueView(LoginRequiredMixin, View):
     """
     Page for selecting the team for a stage in a league. Shows a stage selector, available riders (left), and current selection (right).
     """
+    UNIQUE_ROLES = ('leader', 'sprinteur', 'grimpeur')
+
     def get(self, request, league_id, *args, **kwargs):
-        league = get_object_or_404(League, id=league_id)
-        stages = Stage.objects.filter(competition=league.competition).order_by('date')
+        league = get_object_or_404(League.objects.select_related('competition'), id=league_id)
+        stages = list(Stage.objects.filter(competition=league.competition).order_by('date'))
         stage_id = request.GET.get('stage')
-        
+
         if stage_id:
-            stage = get_object_or_404(Stage, id=stage_id)
+            stage = self.find_stage(stages, stage_id)
         else:
-            stage = get_current_stage(league.competition) or stages.first()
-            
+            stage = get_current_stage(league.competition, stages) or (stages[0] if stages else None)
+
         team = Team.objects.filter(player=request.user, league=league).first()
         if not team:
             return HttpResponseForbidden("You are not a member of this league.")
-
         roles = list(Role.objects.all().order_by('order'))
-        unique_role_ids = list(Role.objects.filter(name__in=['leader', 'sprinteur', 'grimpeur']).order_by('order').values_list('id', flat=True))
-        
-        # --- Default selection logic with optimized queries ---
-        default_selection = DefaultStageSelection.objects.prefetch_related(
-            Prefetch('riders', queryset=DefaultStageSelectionRider.objects.select_related('cyclist', 'role'))
-        ).filter(team=team).order_by('-created_at').first()
-        default_riders = []
-        default_roles = {}
-        if default_selection:
-            rider_role_order = {}
-            for sr in default_selection.riders.all():
-                default_roles[sr.cyclist.id] = sr.role.id if sr.role else ''
-                rider_role_order[sr.cyclist.id] = sr.role.order if sr.role else 999
-            default_riders = sorted(
-                [sr.cyclist for sr in default_selection.riders.all()],
-                key=lambda rider: rider_role_order.get(rider.id, 999)
-            )
-        # --- End default selection logic ---
-        # --- Stage selection logic with optimized queries ---
-        selection = None
-        initial_riders = []
-        initial_roles = {}
-        stage_selection_qs = StageSelection.objects.prefetch_related(
-            Prefetch('selection_riders', queryset=StageSelectionRider.objects.select_related('cyclist', 'role'))
-        ).filter(team=team, stage=stage).order_by('-validated', '-submitted_at')
-        selection = next(iter(stage_selection_qs), None)
-        if selection:
-            rider_role_order = {}
-            for sr in selection.selection_riders.all():
-                initial_roles[sr.cyclist.id] = sr.role.id if sr.role else ''
-                rider_role_order[sr.cyclist.id] = sr.role.order if sr.role else 999
-            initial_riders = sorted(
-                [sr.cyclist for sr in selection.selection_riders.all()],
-                key=lambda rider: rider_role_order.get(rider.id, 999)
-            )
-        form_initial = {'riders': initial_riders}
-        form = StageSelectionForm(initial=form_initial, team=team, stage=stage, competition=league.competition)
-        locked = False
-        if stage:
-            now = timezone.localtime()
-            lock_time = timezone.make_aware(datetime.combine(stage.date, dt_time(12, 0)))
-            locked = now >= lock_time
-        # --- Bonuses and validated selections optimized ---
+        return render(request, 'stage_selection_league.html', self.get_context(league, team, stages, stage, roles))
+
+    @staticmethod
+    def find_stage(stages, stage_id):
+        for stage in stages:
+            if str(stage.id) == str(stage_id):
+                return stage
+        return get_object_or_404(Stage, id=stage_id)
+
+    def get_context(self, league, team, stages, stage, roles):
+        """
+        Context of the page, shared by get and the post error fallback. Besides league, team,
+        stages and roles already loaded by the caller, it costs one bonus config query plus
+        StageSelection.page_data (ids cached per team until its next submission, riders read again).
+        """
+        if stage is not None and stage.competition_id == league.competition_id:
+            stage.competition = league.competition
         bonuses = list(BonusConfig.objects.filter(competition=league.competition))
-        used_bonuses = {bonus.id: [] for bonus in bonuses}
-        available_bonuses = {bonus.id: bonus.max_per_player for bonus in bonuses}
-        selections_validated = StageSelection.objects.filter(team=team, validated=True).prefetch_related(
-            Prefetch('stageselectionbonus_set', queryset=StageSelectionBonus.objects.select_related('bonus', 'stage_selection__stage'))
+        data = StageSelection.page_data(team, stage, roles, bonuses, stages)
+        available_bonuses = {
+            bonus.id: max(bonus.max_per_player - data.used_counts.get(bonus.id, 0), 0) for bonus in bonuses
+        }
+        used_bonuses = {bonus.id: data.used_bonuses.get(bonus.id, []) for bonus in bonuses}
+        form = StageSelectionForm(
+            initial={'riders': data.initial_riders}, team=team, stage=stage, competition=league.competition, bonuses=bonuses,
         )
-        for sel in selections_validated:
-            for sb in sel.stageselectionbonus_set.all():
-                used_bonuses[sb.bonus.id].append(sel.stage)
-                available_bonuses[sb.bonus.id] -= sb.count
-        for bonus in bonuses:
-            if available_bonuses[bonus.id] < 0:
-                available_bonuses[bonus.id] = 0
-        selected_bonuses_for_stage = []
-        if selection:
-            selected_bonuses_for_stage = list(selection.stageselectionbonus_set.select_related('bonus').all())
-        any_bonus_used = any(used_bonuses[bonus.id] for bonus in bonuses)
-        selected_bonus_ids_for_stage = [sb.bonus.id for sb in selected_bonuses_for_stage]
-        display_riders = initial_riders[:8] + [None] * (8 - len(initial_riders))
-        # Pass default selection to template
-        return render(request, 'stage_selection_league.html', {
+        initial_riders = data.initial_riders
+        return {
             'league': league,
             'stages': stages,
             'stage': stage,
             'form': form,
-            'locked': locked,
+            'locked': stage.is_locked if stage else False,
             'bonuses': bonuses,
             'used_bonuses': used_bonuses,
             'available_bonuses': available_bonuses,
             'roles': roles,
-            'initial_roles': initial_roles,
+            'initial_roles': data.initial_roles,
             'initial_riders': initial_riders,
-            'display_riders': display_riders,
-            'unique_role_ids': unique_role_ids,
-            'selected_bonuses_for_stage': selected_bonuses_for_stage,
-            'any_bonus_used': any_bonus_used,
-            'selected_bonus_ids_for_stage': selected_bonus_ids_for_stage,
-            'default_riders': default_riders,
-            'default_roles': default_roles,
+            'display_riders': initial_riders[:8] + [None] * (8 - len(initial_riders)),
+            'unique_role_ids': [role.id for role in roles if role.name in self.UNIQUE_ROLES],
+            'selected_bonuses_for_stage': data.selected_bonuses,
+            'any_bonus_used': any(used_bonuses.values()),
+            'selected_bonus_ids_for_stage': [sb.bonus_id for sb in data.selected_bonuses],
+            'default_riders': data.default_riders,
+            'default_roles': data.default_roles,
             'auction_finished': league.auction_finished,
-        })
+        }
 
     def post(self, request, league_id, *args, **kwargs):
-        league = get_object_or_404(League, id=league_id)
+        league = get_object_or_404(League.objects.select_related('competition'), id=league_id)
         team = Team.objects.filter(player=request.user, league=league).first()
         if not team:
             return HttpResponseForbidden("You are not a member of this league.")
         stages = list(Stage.objects.filter(competition=league.competition).order_by('date'))
         stage_id = request.POST.get('stage')
-        stage = get_object_or_404(Stage, id=stage_id) if stage_id else stages[0]
+        stage = self.find_stage(stages, stage_id) if stage_id else stages[0]
         roles = list(Role.objects.all().order_by('order'))
-        unique_role_ids = list(Role.objects.filter(name__in=['leader', 'sprinteur', 'grimpeur']).order_by('order').values_list('id', flat=True))
-        now = timezone.localtime()
-        lock_time = timezone.make_aware(datetime.combine(stage.date, dt_time(12, 0)))
-        if now >= lock_time:
-            return HttpResponseForbidden("Selection is locked for this stage (after 12:00 PM).")
+        if stage.is_locked:
+            return HttpResponseForbidden("Selection is locked for this stage.")
         action = request.POST.get('action')
-        from .models import DefaultStageSelection, DefaultStageSelectionRider
         if action == 'set_default':
             # Save a default selection using the new model
             rider_ids = request.POST.getlist('riders')
@@ -665,51 +597,34 @@ class StageSelectionLeagueView(LoginRequiredMixin, View):
                 if role_id:
                     role_map[int(rider_id)] = int(role_id)
             if len(rider_ids) == 8 and len(role_map) == len(roles):
-                DefaultStageSelection.objects.filter(team=team).delete()
-                selection = DefaultStageSelection.objects.create(team=team)
-                for rider_id in rider_ids:
-                    role_id = role_map.get(int(rider_id))
-                    DefaultStageSelectionRider.objects.create(
-                        default_selection=selection,
-                        cyclist_id=int(rider_id),
-                        role_id=role_id
-                    )
+                with transaction.atomic():
+                    DefaultStageSelection.objects.filter(team=team).delete()
+                    selection = DefaultStageSelection.objects.create(team=team)
+                    # bulk_create : la création de la sélection invalide déjà le cache de l'équipe
+                    DefaultStageSelectionRider.objects.bulk_create([
+                        DefaultStageSelectionRider(
+                            default_selection=selection,
+                            cyclist_id=int(rider_id),
+                            role_id=role_map.get(int(rider_id))
+                        )
+                        for rider_id in rider_ids
+                    ])
                 return redirect(f"{request.path}?stage={stage.id}")
         elif action == 'apply_default':
             # Apply default selection to this stage
-            default_selection = DefaultStageSelection.objects.filter(team=team).order_by('-created_at').first()
-            if default_selection:
-                StageSelection.objects.filter(team=team, stage=stage).delete()
-                selection = StageSelection.objects.create(
-                    team=team,
-                    stage=stage,
-                    validated=True,
-                )
-                for sr in default_selection.riders.select_related('cyclist', 'role').all():
-                    StageSelectionRider.objects.create(
-                        stage_selection=selection,
-                        cyclist=sr.cyclist,
-                        role=sr.role
-                    )
+            default_riders = DefaultStageSelection.riders_by_team([team.id]).get(team.id)
+            if default_riders:
+                StageSelection.bulk_validate([(team.id, stage.id, default_riders, [])])
                 return redirect(f"{request.path}?stage={stage.id}")
         elif action == 'apply_default_all':
-            # Apply default selection to all stages not yet set up
-            default_selection = DefaultStageSelection.objects.filter(team=team).order_by('-created_at').first()
-            if default_selection:
-                for s in stages:
-                    exists = StageSelection.objects.filter(team=team, stage=s, validated=True).exists()
-                    if not exists:
-                        selection = StageSelection.objects.create(
-                            team=team,
-                            stage=s,
-                            validated=True,
-                        )
-                        for sr in default_selection.riders.select_related('cyclist', 'role').all():
-                            StageSelectionRider.objects.create(
-                                stage_selection=selection,
-                                cyclist=sr.cyclist,
-                                role=sr.role
-                            )
+            # Apply default selection to all stages not yet set up (and not locked yet)
+            default_riders = DefaultStageSelection.riders_by_team([team.id]).get(team.id)
+            if default_riders:
+                open_stage_ids = [s.id for s in stages if not s.is_locked]
+                StageSelection.bulk_validate([
+                    (team.id, stage_id, default_riders, [])
+                    for stage_id in StageSelection.missing_stage_ids(team, open_stage_ids)
+                ], replace=False)
                 return redirect(f"{request.path}?stage={stage.id}")
         elif action is None or action == '' or action == 'validate' or action is None:
             # Normal selection logic (restored)
@@ -730,110 +645,16 @@ class StageSelectionLeagueView(LoginRequiredMixin, View):
                 errors.append("You must assign each role exactly once in your selection.")
             form = StageSelectionForm(request.POST, team=team, stage=stage, competition=league.competition)
             if form.is_valid() and not errors:
-                StageSelection.objects.filter(team=team, stage=stage).update(validated=False)
-                selection = StageSelection.objects.create(
-                    team=team,
-                    stage=stage,
-                    validated=True,
-                )
-                for rider_id in rider_ids:
-                    role_id = role_map.get(int(rider_id))
-                    StageSelectionRider.objects.create(
-                        stage_selection=selection,
-                        cyclist_id=int(rider_id),
-                        role_id=role_id
-                    )
                 selected_bonuses_str = request.POST.get('selected_bonuses', '')
                 selected_bonus_ids = [int(bid) for bid in selected_bonuses_str.split(',') if bid.strip()]
                 if len(selected_bonus_ids) > 1:
                     selected_bonus_ids = selected_bonus_ids[:1]
-                StageSelectionBonus.objects.filter(stage_selection=selection).delete()
-                for bonus_id in selected_bonus_ids:
-                    StageSelectionBonus.objects.create(stage_selection=selection, bonus_id=bonus_id, count=1)
+                riders = [(int(rider_id), role_map.get(int(rider_id))) for rider_id in rider_ids]
+                StageSelection.bulk_validate([(team.id, stage.id, riders, selected_bonus_ids)])
                 return redirect(f"{request.path}?stage={stage.id}")
             # If errors, fall through to fallback render
         # Fallback: always return a response
-        # Rebuild context as in get
-        # --- Default selection logic with optimized queries ---
-        default_selection = DefaultStageSelection.objects.prefetch_related(
-            Prefetch('riders', queryset=DefaultStageSelectionRider.objects.select_related('cyclist', 'role'))
-        ).filter(team=team).order_by('-created_at').first()
-        default_riders = []
-        default_roles = {}
-        if default_selection:
-            rider_role_order = {}
-            for sr in default_selection.riders.all():
-                default_roles[sr.cyclist.id] = sr.role.id if sr.role else ''
-                rider_role_order[sr.cyclist.id] = sr.role.order if sr.role else 999
-            default_riders = sorted(
-                [sr.cyclist for sr in default_selection.riders.all()],
-                key=lambda rider: rider_role_order.get(rider.id, 999)
-            )
-        # --- Stage selection logic with optimized queries ---
-        selection = None
-        initial_riders = []
-        initial_roles = {}
-        stage_selection_qs = StageSelection.objects.prefetch_related(
-            Prefetch('selection_riders', queryset=StageSelectionRider.objects.select_related('cyclist', 'role'))
-        ).filter(team=team, stage=stage).order_by('-validated', '-submitted_at')
-        selection = next(iter(stage_selection_qs), None)
-        if selection:
-            rider_role_order = {}
-            for sr in selection.selection_riders.all():
-                initial_roles[sr.cyclist.id] = sr.role.id if sr.role else ''
-                rider_role_order[sr.cyclist.id] = sr.role.order if sr.role else 999
-            initial_riders = sorted(
-                [sr.cyclist for sr in selection.selection_riders.all()],
-                key=lambda rider: rider_role_order.get(rider.id, 999)
-            )
-        form_initial = {'riders': initial_riders}
-        form = StageSelectionForm(initial=form_initial, team=team, stage=stage, competition=league.competition)
-        locked = False
-        if stage:
-            now = timezone.localtime()
-            lock_time = timezone.make_aware(datetime.combine(stage.date, dt_time(12, 0)))
-            locked = now >= lock_time
-        # --- Bonuses and validated selections optimized ---
-        bonuses = list(BonusConfig.objects.filter(competition=league.competition))
-        used_bonuses = {bonus.id: [] for bonus in bonuses}
-        available_bonuses = {bonus.id: bonus.max_per_player for bonus in bonuses}
-        selections_validated = StageSelection.objects.filter(team=team, validated=True).prefetch_related(
-            Prefetch('stageselectionbonus_set', queryset=StageSelectionBonus.objects.select_related('bonus', 'stage_selection__stage'))
-        )
-        for sel in selections_validated:
-            for sb in sel.stageselectionbonus_set.all():
-                used_bonuses[sb.bonus.id].append(sel.stage)
-                available_bonuses[sb.bonus.id] -= sb.count
-        for bonus in bonuses:
-            if available_bonuses[bonus.id] < 0:
-                available_bonuses[bonus.id] = 0
-        selected_bonuses_for_stage = []
-        if selection:
-            selected_bonuses_for_stage = list(selection.stageselectionbonus_set.select_related('bonus').all())
-        any_bonus_used = any(used_bonuses[bonus.id] for bonus in bonuses)
-        selected_bonus_ids_for_stage = [sb.bonus.id for sb in selected_bonuses_for_stage]
-        display_riders = initial_riders[:8] + [None] * (8 - len(initial_riders))
-        return render(request, 'stage_selection_league.html', {
-            'league': league,
-            'stages': stages,
-            'stage': stage,
-            'form': form,
-            'locked': locked,
-            'bonuses': bonuses,
-            'used_bonuses': used_bonuses,
-            'available_bonuses': available_bonuses,
-            'roles': roles,
-            'initial_roles': initial_roles,
-            'initial_riders': initial_riders,
-            'display_riders': display_riders,
-            'unique_role_ids': unique_role_ids,
-            'selected_bonuses_for_stage': selected_bonuses_for_stage,
-            'any_bonus_used': any_bonus_used,
-            'selected_bonus_ids_for_stage': selected_bonus_ids_for_stage,
-            'default_riders': default_riders,
-            'default_roles': default_roles,
-            'auction_finished': league.auction_finished,
-        })
+        return render(request, 'stage_selection_league.html', self.get_context(league, team, stages, stage, roles))
 
 class PelotonView(LoginRequiredMixin, View):
     def get(self, request, league_id, *args, **kwargs):
@@ -848,10 +669,8 @@ class PelotonView(LoginRequiredMixin, View):
             
         teams = Team.objects.filter(league=league)
 
-        # Check if we're past noon on race day
-        now = timezone.localtime()
-        lock_time = timezone.make_aware(datetime.combine(stage.date, dt_time(12, 0)))
-        locked = now >= lock_time
+        # Sélections visibles une fois l'étape verrouillée
+        locked = stage.is_locked
 
         selections = {}
         for team in teams:
@@ -107,6 +107,22 @@ DATABASES = {
     )
 }
 
+# Cache partagé entre les workers gunicorn (créé par `python manage.py createcachetable`)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'django_cache',
+    }
+}
+
+# Diffusion des événements d'enchères (SSE) : LISTEN/NOTIFY pour relayer le worker et
+# les autres workers uvicorn, diffusion en mémoire sinon
+AUCTION_EVENTS_BROKER = (
+    'app.events.PostgresBroker'
+    if DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql'
+    else 'app.events.InProcessBroker'
+)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators